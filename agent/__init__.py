@@ -1,6 +1,25 @@
-from .nlp_parser_agent import NLPParserAgent
-from .winauto_agent import WinAutoAgent
-from .notebook_agent import NotebookAgent
-from .calendar_agent import CalendarAgent
+import importlib
+
+# 延迟加载：只有在真正访问某个 agent 时才导入对应模块，
+# 避免启动时一次性拉起 langchain / pywinauto / win32gui / icalendar 等重量级依赖。
+_LAZY_ATTRS = {
+    "NLPParserAgent": ".nlp_parser_agent",
+    "WinAutoAgent": ".winauto_agent",
+    "NotebookAgent": ".notebook_agent",
+    "CalendarAgent": ".calendar_agent",
+}
 
 __all__ = ["NLPParserAgent", "WinAutoAgent", "NotebookAgent", "CalendarAgent"]
+
+
+def __getattr__(name):
+    module_name = _LAZY_ATTRS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value  # 缓存，后续访问不再经过 __getattr__
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,48 @@
+# 应用映射表：NLPParserAgent 的提示词和本地规则解析器共用这一份数据，
+# 修改后提示词随之变化，解析计划缓存会因指纹变化自动失效。
+
+# (关键词, 可执行文件名/应用名, 附加说明)
+APP_MAPPING = [
+    (("记事本", "notepad", "笔记"), "notepad.exe", ""),
+    (("计算器", "calc", "计算"), "calc.exe", ""),
+    (("任务管理器", "taskmgr"), "taskmgr.exe", ""),
+    (("资源管理器", "explorer"), "explorer.exe", ""),
+    (("控制面板", "control"), "control.exe", ""),
+    (("注册表编辑器", "regedit"), "regedit.exe", ""),
+    (("服务", "services"), "services.msc", ""),
+    (("系统信息", "msinfo32"), "msinfo32.exe", ""),
+    (("磁盘管理", "disk", "硬盘"), "diskmgmt.msc", ""),
+    (
+        ("创建日程", "添加日程", "安排会议", "创建会议", "导出日历", "添加到日历"),
+        "calendar",
+        '（将日历相关指令映射到"calendar"应用）',
+    ),
+]
+
+# app -> agent_type，未列出的应用使用 DEFAULT_AGENT_TYPE
+AGENT_TYPE_BY_APP = {
+    "notepad.exe": "notebook",
+    "calendar": "calendar",
+}
+DEFAULT_AGENT_TYPE = "default"
+
+
+def agent_type_for_app(app: str) -> str:
+    return AGENT_TYPE_BY_APP.get(app, DEFAULT_AGENT_TYPE)
+
+
+def keyword_table():
+    """返回 {关键词(小写): app}。"""
+    return {kw.lower(): app for keywords, app, _ in APP_MAPPING for kw in keywords}
+
+
+def render_app_mapping_rules() -> str:
+    """将映射表渲染为提示词中的“应用映射规则”列表。"""
+    lines = []
+    for keywords, app, note in APP_MAPPING:
+        line = f"- {'、'.join(keywords)} -> {app}"
+        if note:
+            line += f" {note}"
+        lines.append(line)
+    lines.append("- 如果未找到匹配应用，app字段请保持原样或为空字符串")
+    return "\n".join(lines)
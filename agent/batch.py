@@ -0,0 +1,182 @@
+import contextlib
+import json
+import sys
+import time
+from typing import IO, Any, Callable, Dict, Iterable, List, Optional, Union
+
+from .pipeline import PipelinedRunner
+from .stats import percentile
+
+# 统计延迟分位数的阶段
+STAGES = ("parse_time", "queue_wait", "execute_time", "total_time")
+
+
+def read_commands(path: str) -> List[str]:
+    """
+    读取批量指令。
+
+    - path 为 "-" 时从标准输入读取；
+    - `.jsonl` 文件每行一个 JSON，可以是字符串，或包含 command/instruction/text 字段的对象；
+    - 其他文件按纯文本处理，每行一条指令，忽略空行和以 # 开头的注释行。
+    """
+    if path == "-":
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+
+    is_jsonl = path.endswith(".jsonl")
+    commands = []
+    for lineno, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if not is_jsonl:
+            commands.append(line)
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            print(f"第 {lineno} 行不是合法的 JSON，已跳过: {e}")
+            continue
+        if isinstance(record, dict):
+            record = record.get("command") or record.get("instruction") or record.get("text")
+        if isinstance(record, str) and record.strip():
+            commands.append(record.strip())
+        else:
+            print(f"第 {lineno} 行缺少指令内容，已跳过")
+    return commands
+
+
+def summarize(records: List[Dict[str, Any]], wall_time: float) -> Dict[str, Any]:
+    """汇总吞吐量以及各阶段的 p50/p95/p99 延迟（秒）。"""
+    summary = {
+        "commands": len(records),
+        "succeeded": sum(1 for r in records if r["success"]),
+        "wall_time": wall_time,
+        "throughput": len(records) / wall_time if wall_time > 0 else 0.0,
+        "latency": {},
+    }
+    for stage in STAGES:
+        values = [r["timings"][stage] for r in records]
+        summary["latency"][stage] = {
+            "p50": percentile(values, 50),
+            "p95": percentile(values, 95),
+            "p99": percentile(values, 99),
+            "max": max(values) if values else 0.0,
+        }
+    return summary
+
+
+def format_summary(summary: Dict[str, Any]) -> str:
+    lines = [
+        f"共 {summary['commands']} 条指令，成功 {summary['succeeded']} 条，"
+        f"总耗时 {summary['wall_time']:.2f}s，吞吐 {summary['throughput']:.2f} 条/秒",
+        f"{'阶段':<14}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}",
+    ]
+    for stage, stats in summary["latency"].items():
+        lines.append(
+            f"{stage:<14}"
+            + "".join(f"{stats[k]:>9.3f}s" for k in ("p50", "p95", "p99", "max"))
+        )
+    return "\n".join(lines)
+
+
+class BatchRunner:
+    """
+    批量执行指令：解析阶段（不涉及 UI）按 parse_workers 并发，执行阶段按输入顺序串行，
+    每条指令完成后立即以 JSONL 形式写出结果（计划、使用的 agent、结果、各阶段耗时）。
+
+    Args:
+        parse_fn: 解析函数，输入指令，返回步骤列表
+        execute_fn: 执行函数，输入 (指令, 步骤列表)，返回 `StepScheduler.run` 的报告
+        parse_workers: 解析并发数
+        queue_size: 解析阶段最多领先执行阶段的指令数
+    """
+
+    def __init__(
+        self,
+        parse_fn: Callable[[str], Any],
+        execute_fn: Callable[[str, Any], Any],
+        parse_workers: int = 4,
+        queue_size: Optional[int] = None,
+    ):
+        self.runner = PipelinedRunner(
+            parse_fn,
+            execute_fn,
+            queue_size=queue_size or parse_workers * 2,
+            parse_workers=parse_workers,
+        )
+
+    @staticmethod
+    def to_record(item: Dict[str, Any]) -> Dict[str, Any]:
+        """将流水线结果转换为可写入 JSONL 的记录。"""
+        report = item.get("outcome") or {}
+        step_reports = report.get("steps", []) if isinstance(report, dict) else []
+        agents = []
+        for s in step_reports:
+            result = s.get("result")
+            agent = result.get("agent") if isinstance(result, dict) else None
+            if agent and agent not in agents:
+                agents.append(agent)
+
+        success = (
+            bool(item.get("steps"))
+            and not item.get("parse_error")
+            and not item.get("execute_error")
+            and all(s["status"] == "done" for s in step_reports)
+        )
+        return {
+            "index": item["index"],
+            "command": item["command"],
+            "plan": item.get("steps"),
+            "agents": agents,
+            "success": success,
+            "steps": [
+                {k: s[k] for k in ("step", "status", "error", "duration")} for s in step_reports
+            ],
+            "errors": [e for e in (item.get("parse_error"), item.get("execute_error")) if e],
+            "timings": {
+                "parse_time": item["parse_time"],
+                "queue_wait": item["queue_wait"],
+                "execute_time": item["execute_time"],
+                # 从开始解析到执行完成的端到端延迟（queue_wait 与 parse_time 有重叠，不能直接相加）
+                "total_time": item["finished"] - item["parse_started"],
+                "critical_path_time": report.get("critical_path_time") if report else None,
+            },
+        }
+
+    def run(self, commands: Iterable[str], output: Union[str, IO[str], None] = None) -> Dict[str, Any]:
+        """
+        执行全部指令。output 为 JSONL 输出路径或已打开的文本流，None 表示不写出。
+        "-" 表示标准输出：运行期间 print 的日志改写到标准错误，标准输出中只有 JSONL 记录。
+
+        Returns:
+            {"records": [...], "summary": {...}}
+        """
+        records = []
+        out, owned = None, False
+        redirect = contextlib.nullcontext()
+        if output == "-":
+            out = sys.stdout
+            redirect = contextlib.redirect_stdout(sys.stderr)
+        elif isinstance(output, str) and output:
+            out, owned = open(output, "w", encoding="utf-8"), True
+        elif output is not None and not isinstance(output, str):
+            out = output
+
+        def on_result(item):
+            record = self.to_record(item)
+            records.append(record)
+            if out is not None:
+                out.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+                out.flush()
+
+        start = time.perf_counter()
+        try:
+            with redirect:
+                self.runner.run(commands, on_result=on_result)
+        finally:
+            if owned:
+                out.close()
+        return {"records": records, "summary": summarize(records, time.perf_counter() - start)}
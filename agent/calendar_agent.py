@@ -4,11 +4,17 @@ from datetime import datetime, timedelta
 import pytz
 import uuid
 import os
+import re
 
-from langchain_ollama import ChatOllama
-from langchain_classic.agents import create_tool_calling_agent, AgentExecutor
+from langchain_classic.agents import create_tool_calling_agent
 from langchain_core.tools import StructuredTool
 
+from .dispatcher import CREATE_EVENT_RE, READ_ICS_RE
+from .guarded_executor import GuardedAgentExecutor, tools_goal
+from .llm_pool import get_cascade
+from .memory import memory_from_env
+from .tool_cache import tool_cache
+
 
 def _ensure_datetime(dt_str: str, tz_str: Optional[str] = None) -> datetime:
     """解析字符串为带时区的 datetime 对象，支持 ISO 格式或 'YYYY-MM-DD HH:MM' 类型的输入。
@@ -94,6 +100,7 @@ def write_calendar_to_file(cal: Calendar, filename: str = "meeting.ics") -> str:
         f.write(cal.to_ical())
     return os.path.abspath(filename)
 
+@tool_cache.memoize("current_utc_time", ttl=10)
 def current_utc_time() -> str:
     """获取当前 UTC 时间的 ISO 格式字符串"""
     return datetime.now(pytz.UTC).isoformat()
@@ -105,6 +112,8 @@ currentUTC = StructuredTool.from_function(
 )
 
 # StructuredTool: createICS
+# 写入文件后，同一路径的 readICS 缓存失效
+@tool_cache.invalidates("read_ics_file", args=lambda kw: {"filename": kw["filename"] or "meeting.ics"})
 def create_ics_tool(
     summary: str,
     dtstart: str,
@@ -170,6 +179,9 @@ importIcs = StructuredTool.from_function(
 from icalendar import Calendar as ICal
 
 
+@tool_cache.memoize(
+    "read_ics_file", ttl=30, normalize={"filename": os.path.abspath}, cache_if=lambda r: r.get("success")
+)
 def read_ics_file(filename: str = "meeting.ics") -> Dict[str, Any]:
     """读取 .ics 文件并返回内含事件的简要信息"""
     try:
@@ -201,15 +213,31 @@ readICS = StructuredTool.from_function(
 )
 
 
+def calendar_facts(text: str) -> Dict[str, str]:
+    """记录最近一次提到的 .ics 文件，历史被压缩后模型仍知道在操作哪个文件。"""
+    files = re.findall(r"[\w\-./\\:]+\.ics", text)
+    return {"日历文件": files[-1]} if files else {}
+
+
+CALENDAR_GOAL = tools_goal(
+    [
+        (CREATE_EVENT_RE, ["createICS"]),
+        (READ_ICS_RE, ["readICS"]),
+        (r"(导入|打开)(文件)?\s*\S+\.ics", ["openICS"]),
+    ]
+)
+
+
 class CalendarAgent:
     """一个用于创建和读取 ICS 文件的小 Agent，接口仿照 NotebookAgent 的实现风格。"""
 
-    def __init__(self):
+    def __init__(self, memory=None):
         from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 
-        self.chat_history = []
+        # 有 token 预算的对话历史（见 agent/memory.py）
+        self.chat_history = memory if memory is not None else memory_from_env(facts=calendar_facts)
 
-        llm = ChatOllama(base_url="http://localhost:11434", model="qwen3:4b")
+        llm = get_cascade("agent", label="calendar")
 
         prompt = ChatPromptTemplate.from_messages(
             [
@@ -246,8 +274,14 @@ class CalendarAgent:
 
         tools = [createICS, readICS, currentUTC, importIcs]
         agent = create_tool_calling_agent(llm=llm, tools=tools, prompt=prompt)
-        self.executor = AgentExecutor(
-            agent=agent, tools=tools, verbose=True, max_iterations=5, handle_parsing_errors=True
+        self.executor = GuardedAgentExecutor(
+            agent=agent,
+            tools=tools,
+            verbose=True,
+            max_iterations=5,
+            handle_parsing_errors=True,
+            label="calendar",
+            goal_check=CALENDAR_GOAL,
         )
 
     def execute(self, content: Optional[str] = None):
@@ -290,7 +324,7 @@ class CalendarAgent:
 
     def _execute_single_step(self, content: str):
         print(f"执行指令: {content}")
-        result = self.executor.invoke({"content": content, "chat_history": self.chat_history})
+        result = self.executor.invoke({"content": content, "chat_history": self.chat_history.messages()})
         print(f"执行结果: {result}")
         return result
 
@@ -0,0 +1,36 @@
+import contextlib
+import contextvars
+import threading
+
+# 记录中使用的标签。也可以通过 LangChain 的 run metadata 传入（如解析器的对话链
+# `.with_config(metadata={"agent": "parser"})`），metadata 中的值优先
+TAG_KEYS = ("agent", "step", "command")
+
+# 当前调用上下文的标签（agent、步骤、指令）以及该上下文内的调用计数
+_scope: contextvars.ContextVar = contextvars.ContextVar("llm_call_scope", default=None)
+
+
+@contextlib.contextmanager
+def tag_calls(**tags):
+    """
+    为上下文中发生的模型调用打标签，可以嵌套，内层标签覆盖外层同名标签。
+
+        with tag_calls(agent="notebook", step=2):
+            agent.execute(...)  # AgentExecutor 的每次迭代都会记录 agent=notebook, step=2
+
+    标签保存在 contextvar 中，随 LangChain 的 batch 线程池和 StepScheduler 自动传递；
+    其他自行创建的线程需要在线程内重新打标签。本模块不依赖 LangChain，入口处可以直接导入。
+    """
+    parent = _scope.get()
+    merged = dict(parent["tags"]) if parent else {}
+    merged.update({k: v for k, v in tags.items() if v is not None})
+    token = _scope.set({"tags": merged, "calls": 0, "lock": threading.Lock()})
+    try:
+        yield merged
+    finally:
+        _scope.reset(token)
+
+
+def current_scope():
+    """返回当前标签范围 {"tags", "calls", "lock"}，没有打标签时返回 None。"""
+    return _scope.get()
@@ -0,0 +1,225 @@
+import importlib
+import re
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+# 工具名 -> (模块, 函数)。模块只在真正执行时导入，匹配逻辑不依赖 pywinauto / win32 / icalendar
+TOOLS = {
+    "open_app": (".winauto_agent", "open_app"),
+    "open_notebook": (".notebook_agent", "open_notebook"),
+    "keyboard_input": (".winauto_agent", "keyboard_input"),
+    "notepad_input": (".notebook_agent", "keyboard_input"),
+    "execute_hotkey": ("utils.hotkey", "execute_hotkey"),
+    "create_ics": (".calendar_agent", "create_ics_tool"),
+    "read_ics": (".calendar_agent", "read_ics_file"),
+}
+
+OPEN_ACTION_RE = re.compile(r"^(打开|启动|运行|开启)(应用|应用程序|程序|软件)?$")
+# 只有明确写出“输入文本/文字/内容”或用引号括起的文本才直接输入；“输入今天的日期”“写入一段日记”
+# 这类需要理解或生成内容的动作交给 agent
+INPUT_ACTION_RE = re.compile(
+    r"^(输入|键入|写入|录入)(?:(文本|文字|内容)\s*[:：]?\s*(?P<text>.+)"
+    r"|\s*[:：]?\s*(?P<quoted>“[^”]*”|\"[^\"]*\"|'[^']*'|「[^」]*」))$",
+    re.S,
+)
+HOTKEY_ACTION_RE = re.compile(r"^(按下|按键|快捷键|组合键|按)\s*[:：]?\s*(?P<keys>[A-Za-z0-9]+(\s*\+\s*[A-Za-z0-9]+)*)$")
+CREATE_EVENT_RE = re.compile(r"^(创建事件|创建日程|新建事件|新建日程)\s*[:：]\s*(?P<fields>.+)$", re.S)
+READ_ICS_RE = re.compile(r"^(读取|查看)(文件)?\s*(?P<filename>\S+\.ics)(\s*(并)?列出事件)?$", re.IGNORECASE)
+
+# 可执行文件名：只有这种 app 才能直接交给 open_app，自然语言描述交给 agent
+EXECUTABLE_RE = re.compile(r"^[\w.\-]+\.(exe|msc|cpl)$", re.IGNORECASE)
+# pyautogui 支持的修饰键和常用功能键；单字符键另行判断
+HOTKEY_NAMES = {
+    "ctrl", "alt", "shift", "win", "winleft", "winright", "cmd", "tab", "enter", "esc", "escape",
+    "space", "backspace", "delete", "del", "home", "end", "pageup", "pagedown", "up", "down",
+    "left", "right", "insert", "printscreen",
+} | {f"f{i}" for i in range(1, 13)}
+EVENT_FIELDS = ("summary", "dtstart", "dtend", "tz", "description", "location", "filename")
+# 直接执行成功后写入对应 agent 对话历史的说明
+TOOL_NOTES = {
+    "open_app": "已打开 {app}",
+    "open_notebook": "已打开记事本",
+    "keyboard_input": "已在当前窗口输入文本：{text}",
+    "notepad_input": "已在记事本中输入文本：{text}",
+    "execute_hotkey": "已按下快捷键 {hotkey_str}",
+    "create_ics": "已创建事件 {summary}",
+    "read_ics": "已读取 {filename}",
+}
+QUOTES = {"“": "”", '"': '"', "'": "'", "「": "」"}
+
+
+def input_text(match: re.Match) -> str:
+    """INPUT_ACTION_RE 匹配到的待输入文本，去掉成对的引号。"""
+    text = (match.group("text") or match.group("quoted")).strip()
+    if len(text) >= 2 and QUOTES.get(text[0]) == text[-1]:
+        text = text[1:-1]
+    return text
+
+
+def _absolute_time(value: str) -> bool:
+    """与 calendar_agent._ensure_datetime 相同的两种格式；“下周五 下午2点”这类相对时间需要 agent 推算。"""
+    try:
+        datetime.fromisoformat(value)
+        return True
+    except ValueError:
+        pass
+    try:
+        datetime.strptime(value, "%Y-%m-%d %H:%M")
+        return True
+    except ValueError:
+        return False
+
+
+def _event_fields(text: str) -> Optional[Dict[str, str]]:
+    fields = {}
+    for part in re.split(r"[;；]", text):
+        if not part.strip():
+            continue
+        key, sep, value = part.partition("=")
+        key = key.strip().lower()
+        if not sep or key not in EVENT_FIELDS:
+            return None
+        fields[key] = value.strip()
+    return fields
+
+
+def plan_tool_call(step: Dict[str, Any]) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """
+    判断步骤是否足够明确，可以不经过 LLM 直接调用工具。
+
+    Returns:
+        (工具名, 参数)；步骤有歧义（自然语言应用名、相对时间、未知动作等）时返回 None，交给 agent
+    """
+    action = str(step.get("action") or "").strip()
+    app = str(step.get("app") or "").strip()
+    agent_type = step.get("agent_type", "default")
+
+    if OPEN_ACTION_RE.match(action):
+        if agent_type == "notebook" or app.lower() == "notepad.exe":
+            return "open_notebook", {}
+        if agent_type == "default" and EXECUTABLE_RE.match(app):
+            return "open_app", {"app": app}
+        return None
+
+    m = INPUT_ACTION_RE.match(action)
+    if m:
+        text = input_text(m)
+        if agent_type == "notebook":
+            return "notepad_input", {"text": text}
+        if agent_type == "default":
+            return "keyboard_input", {"text": text}
+        return None
+
+    m = HOTKEY_ACTION_RE.match(action)
+    if m:
+        keys = [k.strip().lower() for k in m.group("keys").split("+")]
+        if all(len(k) == 1 or k in HOTKEY_NAMES for k in keys):
+            return "execute_hotkey", {"hotkey_str": "+".join(keys)}
+        return None
+
+    if agent_type != "calendar":
+        return None
+
+    m = CREATE_EVENT_RE.match(action)
+    if m:
+        fields = _event_fields(m.group("fields"))
+        if not fields or not fields.get("summary") or not fields.get("dtstart"):
+            return None
+        if not all(_absolute_time(fields[k]) for k in ("dtstart", "dtend") if fields.get(k)):
+            return None
+        return "create_ics", fields
+
+    m = READ_ICS_RE.match(action)
+    if m:
+        return "read_ics", {"filename": m.group("filename")}
+    return None
+
+
+def _succeeded(result: Any) -> bool:
+    if isinstance(result, dict):
+        return bool(result.get("success", True))
+    return result is not False
+
+
+def dispatch_note(step: Dict[str, Any], dispatched: Dict[str, Any]) -> str:
+    """直接执行结果的简短说明，供调用方写入 agent 的对话历史。"""
+    note = TOOL_NOTES[dispatched["tool"]].format(**dispatched["args"])
+    return f"{note}（步骤 {step.get('step')} 已直接调用 {dispatched['tool']} 完成）"
+
+
+class StepDispatcher:
+    """
+    直接执行结构完整的步骤（打开应用、输入文本、快捷键、创建/读取 ICS），不调用 LLM；
+    其余步骤返回 None，由调用方交给对应的 agent。
+    """
+
+    def __init__(self):
+        self._funcs = {}
+        self._lock = threading.Lock()
+        self.dispatched = Counter()
+        self.fallbacks = 0
+
+    def _tool(self, name: str):
+        with self._lock:
+            func = self._funcs.get(name)
+            if func is None:
+                module_name, attr = TOOLS[name]
+                module = importlib.import_module(module_name, __package__)
+                func = self._funcs[name] = getattr(module, attr)
+            return func
+
+    def dispatch(self, step: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Returns:
+            None 表示需要交给 agent；否则为 {"success", "tool", "output", "elapsed"}
+        """
+        call = plan_tool_call(step)
+        if call is None:
+            self.fallbacks += 1
+            return None
+        name, kwargs = call
+        start = time.perf_counter()
+        try:
+            output = self._tool(name)(**kwargs)
+        except Exception as e:
+            output = {"success": False, "message": f"{type(e).__name__}: {e}"}
+        self.dispatched[name] += 1
+        return {
+            "success": _succeeded(output),
+            "tool": name,
+            "args": kwargs,
+            "output": output,
+            "elapsed": time.perf_counter() - start,
+        }
+
+    def stats(self):
+        direct = sum(self.dispatched.values())
+        total = direct + self.fallbacks
+        return {
+            "direct": direct,
+            "agent": self.fallbacks,
+            "direct_rate": direct / total if total else 0.0,
+            "by_tool": dict(self.dispatched),
+        }
+
+
+if __name__ == "__main__":
+    examples = [
+        {"step": 1, "action": "打开应用", "app": "notepad.exe", "agent_type": "notebook"},
+        {"step": 2, "action": "输入文本123", "app": "notepad.exe", "agent_type": "notebook"},
+        {"step": 3, "action": "打开应用", "app": "diskmgmt.msc", "agent_type": "default"},
+        {"step": 4, "action": "按下 ctrl+s", "app": "notepad.exe", "agent_type": "notebook"},
+        {"step": 5, "action": "创建事件: summary=团建; dtstart=2026-02-13 14:00; dtend=2026-02-13 17:00; "
+                              "tz=Asia/Shanghai; filename=meeting.ics", "app": "calendar", "agent_type": "calendar"},
+        {"step": 6, "action": "创建事件: summary=团建; dtstart=下周五 下午14:00", "app": "calendar",
+         "agent_type": "calendar"},
+        {"step": 7, "action": "读取文件 test_meeting.ics", "app": "calendar", "agent_type": "calendar"},
+        {"step": 8, "action": "输入今天的日期", "app": "notepad.exe", "agent_type": "notebook"},
+        {"step": 9, "action": "输入“你好，世界”", "app": "notepad.exe", "agent_type": "notebook"},
+        {"step": 10, "action": "打开浏览器访问百度", "app": "chrome.exe", "agent_type": "default"},
+    ]
+    for example in examples:
+        print(f"{example['action']!r:70} -> {plan_tool_call(example)}")
@@ -0,0 +1,174 @@
+import json
+import re
+import threading
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from langchain_classic.agents import AgentExecutor
+from langchain_core.agents import AgentAction, AgentFinish
+
+# 提前结束的原因，写入返回结果的 stopped_reason 字段
+STOP_GOAL = "goal"  # 指令要求的工具都已成功执行
+STOP_REPEAT = "repeat"  # 重复相同的工具调用（工具名和参数都相同）
+STOP_DEADLINE = "deadline"  # 超过单次运行的墙钟时限（max_execution_time）
+
+# 目标检查：根据输入和已执行的步骤判断指令是否已完成，完成时返回最终输出，否则返回 None
+GoalCheck = Callable[[Dict[str, Any], List[Tuple[AgentAction, Any]]], Optional[str]]
+
+
+def observation_ok(observation: Any) -> bool:
+    """工具返回值是否表示成功：True、success 为真的 dict，或不是 False/错误信息的字符串。"""
+    if isinstance(observation, dict):
+        return bool(observation.get("success"))
+    if isinstance(observation, str):
+        text = observation.strip()
+        return bool(text) and text.lower() not in ("false", "none") and not text.startswith("Error")
+    return observation is True
+
+
+def step_action(inputs: Dict[str, Any]) -> str:
+    """取出步骤 JSON 中的 action 字段；不是 JSON 时返回原文（自然语言指令）。"""
+    content = inputs.get("content", "")
+    try:
+        parsed = json.loads(content)
+    except (json.JSONDecodeError, TypeError):
+        return str(content)
+    if isinstance(parsed, dict):
+        return str(parsed.get("action") or content)
+    return str(content)
+
+
+def tools_goal(rules: Sequence[Tuple]) -> GoalCheck:
+    """
+    action 整体匹配某条规则时，对应的工具成功执行过即视为完成，不再调用模型生成确认语。
+
+    只认可能被完整解释的单一动作（如 dispatcher.OPEN_ACTION_RE / INPUT_ACTION_RE）：
+    “打开记事本写一段日记”“打开计算器并计算1+1”这类一条规则都无法完整匹配的指令不做判断，
+    仍由模型决定何时结束，避免只完成了前半句就提前结束。
+
+    Args:
+        rules: [(正则, 任一工具名即可[, 参数])]，正则对整个 action 做 fullmatch；
+               参数为 match -> {参数名: 值}，给出时工具调用的这些参数必须与之相同（如输入的文本）
+    """
+    compiled = [
+        (re.compile(rule[0]) if isinstance(rule[0], str) else rule[0], set(rule[1]), rule[2] if len(rule) > 2 else None)
+        for rule in rules
+    ]
+
+    def called_with(action: AgentAction, expected: Optional[Dict[str, str]]) -> bool:
+        if expected is None:
+            return True
+        args = action.tool_input if isinstance(action.tool_input, dict) else {}
+        return all(str(args.get(name, "")).strip() == value for name, value in expected.items())
+
+    def check(inputs, steps):
+        action = step_action(inputs).strip()
+        for pattern, required, args in compiled:
+            m = pattern.fullmatch(action)
+            if m:
+                break
+        else:
+            return None
+        expected = args(m) if args else None
+        done = [
+            (a.tool, obs) for a, obs in steps if a.tool in required and observation_ok(obs) and called_with(a, expected)
+        ]
+        if not done:
+            return None
+        return "操作完成：" + "；".join(f"{tool} -> {obs}" for tool, obs in done)
+
+    return check
+
+
+def _call_key(action: AgentAction) -> str:
+    return action.tool + json.dumps(action.tool_input, ensure_ascii=False, sort_keys=True, default=str)
+
+
+class GuardStats:
+    """按 agent 统计提前结束的次数和原因。"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Counter] = {}
+
+    def record(self, label: str, reason: str):
+        with self._lock:
+            self._stats.setdefault(label, Counter())[reason] += 1
+
+    def summary(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {label: dict(c) for label, c in sorted(self._stats.items())}
+
+
+guard_stats = GuardStats()
+
+
+class GuardedAgentExecutor(AgentExecutor):
+    """
+    带循环检测的 AgentExecutor：
+
+    - goal_check 判断指令已完成时直接结束，省去最后一次“操作完成”的模型调用；
+    - 相同的工具调用（工具名 + 参数）超过 max_repeats 次时结束；参数不同的调用（如依次输入两段文本）
+      即使返回相同的结果（True）也不算重复；
+    - 墙钟时限使用 AgentExecutor 自带的 max_execution_time（默认 60 秒），超时计入统计。
+
+    提前结束时返回 {"output", "stopped_reason", "tool_calls"}，output 中包含最后的工具结果，
+    调用方无需区分是模型给出的回答还是提前结束。
+
+    Args:
+        label: 统计时使用的 agent 名称
+        goal_check: 目标检查函数，见 `tools_goal`
+        max_repeats: 允许的重复次数
+    """
+
+    label: str = "agent"
+    goal_check: Optional[Callable] = None
+    max_repeats: int = 1
+    max_execution_time: Optional[float] = 60.0
+
+    def _should_continue(self, iterations: int, time_elapsed: float) -> bool:
+        if super()._should_continue(iterations, time_elapsed):
+            return True
+        if self.max_execution_time is not None and time_elapsed >= self.max_execution_time:
+            guard_stats.record(self.label, STOP_DEADLINE)
+            print(f"[{self.label}] 超过 {self.max_execution_time:g} 秒时限，已提前结束")
+        return False
+
+    def _finish(self, reason: str, output: str, steps) -> AgentFinish:
+        guard_stats.record(self.label, reason)
+        print(f"[{self.label}] 提前结束（{reason}）: {output}")
+        return AgentFinish(
+            return_values={"output": output, "stopped_reason": reason, "tool_calls": len(steps)},
+            log=f"stopped: {reason}",
+        )
+
+    def _repeated(self, steps) -> Optional[str]:
+        calls = Counter(_call_key(action) for action, _ in steps)
+        action, observation = steps[-1]
+        if calls[_call_key(action)] > self.max_repeats:
+            return f"重复调用 {action.tool}，已提前结束。上次结果: {observation}"
+        return None
+
+    def _take_next_step(self, name_to_tool_map, color_mapping, inputs, intermediate_steps, run_manager=None):
+        result = super()._take_next_step(name_to_tool_map, color_mapping, inputs, intermediate_steps, run_manager)
+        if isinstance(result, AgentFinish) or not result:
+            return result
+
+        steps = list(intermediate_steps) + list(result)
+        if self.goal_check is not None:
+            output = self.goal_check(inputs, steps)
+            if output is not None:
+                return self._finish(STOP_GOAL, output, steps)
+        output = self._repeated(steps)
+        if output is not None:
+            return self._finish(STOP_REPEAT, output, steps)
+        return result
+
+
+def format_guard_stats(summary: Dict[str, Dict[str, int]]) -> str:
+    if not summary:
+        return "执行器提前结束统计: 无"
+    return "执行器提前结束统计: " + "；".join(
+        f"{label} " + "，".join(f"{reason} x{n}" for reason, n in reasons.items())
+        for label, reasons in summary.items()
+    )
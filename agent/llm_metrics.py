@@ -0,0 +1,179 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from .call_tags import TAG_KEYS, current_scope
+from .stats import percentile
+
+# Ollama 响应中的耗时字段（纳秒），记录时换算为秒
+OLLAMA_DURATIONS = ("load_duration", "prompt_eval_duration", "eval_duration", "total_duration")
+
+class LLMMetrics(BaseCallbackHandler):
+    """
+    记录每次模型调用的耗时与 token 数，作为 LangChain 回调挂在 llm_pool 创建的每个客户端上，
+    因此解析器、checkMode 以及 AgentExecutor 的每次迭代都会被记录。
+
+    每条记录包含：标签（agent/step/command）、模型、该标签范围内的第几次调用、墙钟耗时、
+    首 token 耗时（流式调用）、输入/输出 token 数，以及 Ollama 返回的加载、prompt 评估、
+    生成耗时。
+
+    Args:
+        sink: JSONL 输出路径，None 表示只保存在内存中
+        max_records: 内存中最多保留的记录数
+    """
+
+    def __init__(self, sink: Optional[str] = None, max_records: int = 100_000):
+        self.records = deque(maxlen=max_records)
+        self._pending: Dict[Any, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._sink = None
+        if sink:
+            self.open_sink(sink)
+
+    def open_sink(self, path: str):
+        with self._lock:
+            if self._sink is not None:
+                self._sink.close()
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._sink = open(path, "a", encoding="utf-8")
+
+    def close(self):
+        with self._lock:
+            if self._sink is not None:
+                self._sink.close()
+                self._sink = None
+
+    def clear(self):
+        with self._lock:
+            self.records.clear()
+
+    # ---- LangChain 回调 ----
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, invocation_params=None, **kwargs):
+        scope = current_scope()
+        iteration = None
+        if scope is not None:
+            with scope["lock"]:
+                scope["calls"] += 1
+                iteration = scope["calls"]
+        params = invocation_params or {}
+        metadata = metadata or {}
+        record = dict(scope["tags"]) if scope else {}
+        record.update({k: metadata[k] for k in TAG_KEYS if metadata.get(k) is not None})
+        record.update(
+            {
+                "model": metadata.get("ls_model_name") or params.get("model"),
+                "iteration": iteration,
+                "started_at": time.time(),
+                "_start": time.perf_counter(),
+            }
+        )
+        with self._lock:
+            self._pending[run_id] = record
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        record = self._pending.get(run_id)
+        if record is not None and "ttft" not in record:
+            record["ttft"] = time.perf_counter() - record["_start"]
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        with self._lock:
+            record = self._pending.pop(run_id, None)
+        if record is None:
+            return
+        message = None
+        if response.generations and response.generations[0]:
+            message = getattr(response.generations[0][0], "message", None)
+        usage = (getattr(message, "usage_metadata", None) or {}) if message is not None else {}
+        meta = (getattr(message, "response_metadata", None) or {}) if message is not None else {}
+        record["prompt_tokens"] = usage.get("input_tokens", meta.get("prompt_eval_count"))
+        record["completion_tokens"] = usage.get("output_tokens", meta.get("eval_count"))
+        for field in OLLAMA_DURATIONS:
+            if meta.get(field) is not None:
+                record[field.replace("_duration", "_s")] = meta[field] / 1e9
+        self._finish(record)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        with self._lock:
+            record = self._pending.pop(run_id, None)
+        if record is not None:
+            record["error"] = f"{type(error).__name__}: {error}"
+            self._finish(record)
+
+    def _finish(self, record: Dict[str, Any]):
+        record["wall_s"] = time.perf_counter() - record.pop("_start")
+        with self._lock:
+            self.records.append(record)
+            if self._sink is not None:
+                self._sink.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+                self._sink.flush()
+
+    # ---- 汇总 ----
+
+    def summary(self, by: str = "agent") -> Dict[str, Dict[str, Any]]:
+        """按标签（默认 agent）分组汇总：调用次数、墙钟耗时分位数、token 数、prompt 评估与生成耗时。"""
+        with self._lock:
+            records = list(self.records)
+        groups: Dict[str, List[Dict[str, Any]]] = {}
+        for record in records:
+            groups.setdefault(str(record.get(by, "untagged")), []).append(record)
+
+        def total(rows, field):
+            return sum(r.get(field) or 0 for r in rows)
+
+        result = {}
+        for name, rows in sorted(groups.items()):
+            walls = [r["wall_s"] for r in rows]
+            eval_s = total(rows, "eval_s")
+            completion = total(rows, "completion_tokens")
+            result[name] = {
+                "calls": len(rows),
+                "errors": sum(1 for r in rows if r.get("error")),
+                "models": sorted({r["model"] for r in rows if r.get("model")}),
+                "wall_total": sum(walls),
+                "wall_p50": percentile(walls, 50),
+                "wall_p95": percentile(walls, 95),
+                "prompt_tokens": total(rows, "prompt_tokens"),
+                "completion_tokens": completion,
+                "load_s": total(rows, "load_s"),
+                "prompt_eval_s": total(rows, "prompt_eval_s"),
+                "eval_s": eval_s,
+                "tokens_per_s": completion / eval_s if eval_s > 0 else 0.0,
+            }
+        return result
+
+
+def format_llm_summary(summary: Dict[str, Dict[str, Any]]) -> str:
+    if not summary:
+        return "模型调用统计: 无调用"
+    lines = [
+        "模型调用统计（耗时单位为秒）:",
+        f"{'分组':<10}{'calls':>6}{'wall':>9}{'p50':>8}{'p95':>8}{'in_tok':>8}{'out_tok':>8}"
+        f"{'load':>8}{'prompt':>8}{'eval':>8}{'tok/s':>8}",
+    ]
+    for name, s in summary.items():
+        lines.append(
+            f"{name:<12}{s['calls']:>6}{s['wall_total']:>9.2f}{s['wall_p50']:>8.2f}{s['wall_p95']:>8.2f}"
+            f"{s['prompt_tokens']:>8}{s['completion_tokens']:>8}"
+            + "".join(f"{s[k]:>8.2f}" for k in ("load_s", "prompt_eval_s", "eval_s", "tokens_per_s"))
+            + (f"  ({s['errors']} 次出错)" if s["errors"] else "")
+        )
+    return "\n".join(lines)
+
+
+_metrics: Optional[LLMMetrics] = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics() -> LLMMetrics:
+    """全局共享的统计实例；设置了 PYAUTOGUI_AGENT_LLM_METRICS 时同时写入该 JSONL 文件。"""
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = LLMMetrics(sink=os.environ.get("PYAUTOGUI_AGENT_LLM_METRICS") or None)
+        return _metrics
@@ -0,0 +1,245 @@
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+# 各角色默认使用的模型：解析与模式判断用小模型，执行 agent 需要工具调用能力，用 4b
+ROLE_MODELS = {
+    "parser": "qwen3:0.6b",
+    "mode": "qwen3:0.6b",
+    "agent": "qwen3:4b",
+}
+
+# 级联路由（见 agent/model_router.py）：先用小模型，输出不合格时升级到后面的模型。
+# 某个角色单独指定了模型（PARSER_MODEL 等）而没有指定级联时，只使用指定的模型。
+# agent 默认不级联：还没有 0.6b 能稳定完成工具调用的测量数据，需要时用
+# PYAUTOGUI_AGENT_AGENT_CASCADE=qwen3:0.6b,qwen3:4b 开启，并对照 main.py 输出的级联统计评估升级率
+ROLE_CASCADES = {
+    "parser": ("qwen3:0.6b", "qwen3:4b"),
+}
+
+DEFAULT_BASE_URL = "http://localhost:11434"
+# 让模型常驻 Ollama，避免不同 agent 的调用之间模型被卸载后重新加载
+DEFAULT_KEEP_ALIVE = "30m"
+DEFAULT_TIMEOUT = 120.0
+BACKENDS = ("ollama", "record", "replay")
+DEFAULT_CASSETTE = "llm_cassette.jsonl"
+
+# 环境变量配置，例如：
+#   PYAUTOGUI_AGENT_OLLAMA_URL=http://192.168.1.10:11434   所有角色的默认地址
+#   PYAUTOGUI_AGENT_AGENT_OLLAMA_URL=...                     只修改某个角色的地址
+#   PYAUTOGUI_AGENT_PARSER_MODEL=qwen3:1.7b                  修改某个角色的模型
+#   PYAUTOGUI_AGENT_AGENT_CASCADE=qwen3:1.7b,qwen3:8b         修改某个角色的级联模型，off 表示不级联
+#   PYAUTOGUI_AGENT_KEEP_ALIVE=1h / PYAUTOGUI_AGENT_LLM_TIMEOUT=60
+#   PYAUTOGUI_AGENT_LLM_BACKEND=record|replay                 录制/回放（见 agent/llm_replay.py）
+#   PYAUTOGUI_AGENT_CASSETTE=cassettes/run.jsonl             录制文件路径
+#   PYAUTOGUI_AGENT_REPLAY_LATENCY=0.2|recorded               回放时的人为延迟
+ENV_PREFIX = "PYAUTOGUI_AGENT_"
+
+_overrides: Dict[str, object] = {}
+_clients: Dict[Tuple[str, str], object] = {}
+_lock = threading.Lock()
+
+
+def _setting(name: str, role: Optional[str], default):
+    """按 configure() > 角色环境变量 > 全局环境变量 > 默认值 的顺序取配置。"""
+    keys = [f"{role.upper()}_{name}", name] if role else [name]
+    for key in keys:
+        if key in _overrides:
+            return _overrides[key]
+    for key in keys:
+        value = os.environ.get(ENV_PREFIX + key)
+        if value:
+            return value
+    return default
+
+
+def model_for(role: str) -> str:
+    if role not in ROLE_MODELS:
+        raise ValueError(f"未知的 LLM 角色: {role}，可选: {', '.join(ROLE_MODELS)}")
+    return _setting("MODEL", role, ROLE_MODELS[role])
+
+
+def cascade_for(role: str) -> Tuple[str, ...]:
+    """返回角色的级联模型列表（从小到大）；不级联时只有一个模型。"""
+    value = _setting("CASCADE", role, None)
+    if value is None:
+        if role in ROLE_CASCADES and _setting("MODEL", role, None) is None:
+            return ROLE_CASCADES[role]
+        return (model_for(role),)
+    if value == "off":
+        return (model_for(role),)
+    if isinstance(value, str):
+        value = [m.strip() for m in value.split(",") if m.strip()]
+    return tuple(value)
+
+
+def base_url_for(role: Optional[str] = None) -> str:
+    return _setting("OLLAMA_URL", role, DEFAULT_BASE_URL)
+
+
+def configure(
+    base_url: Optional[str] = None,
+    keep_alive=None,
+    timeout: Optional[float] = None,
+    backend: Optional[str] = None,
+    cassette: Optional[str] = None,
+    replay_latency=None,
+    cascade=None,
+    **role_models,
+):
+    """
+    在代码中覆盖配置（优先级高于环境变量），并清空已创建的客户端。
+
+    Args:
+        base_url: 所有角色使用的 Ollama 地址
+        keep_alive: 模型在 Ollama 中的驻留时间，如 "30m"、-1（永久）
+        timeout: 单次请求超时（秒）
+        backend: ollama（默认）/ record（调用真实模型并录制）/ replay（只从录制文件回放）
+        cassette: 录制文件路径
+        replay_latency: 回放延迟，秒数或 "recorded"
+        cascade: "off" 关闭所有角色的级联，或 {角色: [模型, ...]}
+        role_models: 按角色指定模型，如 parser="qwen3:1.7b"
+    """
+    with _lock:
+        if base_url is not None:
+            _overrides["OLLAMA_URL"] = base_url
+        if keep_alive is not None:
+            _overrides["KEEP_ALIVE"] = keep_alive
+        if timeout is not None:
+            _overrides["LLM_TIMEOUT"] = timeout
+        if backend is not None:
+            if backend not in BACKENDS:
+                raise ValueError(f"未知的 LLM 后端: {backend}，可选: {', '.join(BACKENDS)}")
+            _overrides["LLM_BACKEND"] = backend
+        if cassette is not None:
+            _overrides["CASSETTE"] = cassette
+        if replay_latency is not None:
+            _overrides["REPLAY_LATENCY"] = replay_latency
+        if isinstance(cascade, dict):
+            for role, models in cascade.items():
+                _overrides[f"{role.upper()}_CASCADE"] = tuple(models)
+        elif cascade is not None:
+            _overrides["CASCADE"] = cascade
+        for role, model in role_models.items():
+            if role not in ROLE_MODELS:
+                raise ValueError(f"未知的 LLM 角色: {role}")
+            _overrides[f"{role.upper()}_MODEL"] = model
+        _clients.clear()
+
+
+def _keep_alive():
+    value = _setting("KEEP_ALIVE", None, DEFAULT_KEEP_ALIVE)
+    # 环境变量中的纯数字（如 -1、3600）按秒数传给 Ollama
+    if isinstance(value, str) and value.lstrip("-").isdigit():
+        return int(value)
+    return value
+
+
+def _replay_latency():
+    value = _setting("REPLAY_LATENCY", None, 0.0)
+    return value if value == "recorded" else float(value)
+
+
+def _create(base_url: str, model: str):
+    # 所有客户端都挂上调用统计回调（见 agent/llm_metrics.py）
+    from .llm_metrics import get_metrics
+
+    callbacks = [get_metrics()]
+    backend = _setting("LLM_BACKEND", None, "ollama")
+    if backend not in BACKENDS:
+        raise ValueError(f"未知的 LLM 后端: {backend}，可选: {', '.join(BACKENDS)}")
+    if backend == "replay":
+        from .llm_replay import ReplayChatModel, get_cassette
+
+        return ReplayChatModel(
+            cassette=get_cassette(_setting("CASSETTE", None, DEFAULT_CASSETTE)),
+            model=model,
+            latency=_replay_latency(),
+            callbacks=callbacks,
+        )
+
+    from langchain_ollama import ChatOllama
+
+    client = ChatOllama(
+        base_url=base_url,
+        model=model,
+        keep_alive=_keep_alive(),
+        client_kwargs={"timeout": float(_setting("LLM_TIMEOUT", None, DEFAULT_TIMEOUT))},
+        # 录制时回调挂在外层包装器上，内层模型由包装器直接调用，不会重复记录
+        callbacks=None if backend == "record" else callbacks,
+    )
+    if backend == "record":
+        from .llm_replay import RecordingChatModel, get_cassette
+
+        return RecordingChatModel(
+            inner=client,
+            cassette=get_cassette(_setting("CASSETTE", None, DEFAULT_CASSETTE)),
+            model=model,
+            callbacks=callbacks,
+        )
+    return client
+
+
+def get_llm(role: str = "agent", model: Optional[str] = None, base_url: Optional[str] = None):
+    """
+    返回共享的 ChatOllama 客户端（录制/回放后端下为对应的包装模型）。
+
+    相同 (base_url, model) 的调用方共用同一个实例，因而共用其 HTTP 连接池；
+    超时和 keep_alive 在这里统一设置。ChatOllama 的 invoke/stream 不修改实例状态，
+    可以在线程间共享。
+
+    Args:
+        role: 调用方角色（parser / mode / agent），决定默认模型和地址
+        model: 显式指定模型，覆盖角色默认值
+        base_url: 显式指定地址，覆盖配置
+    """
+    model = model or model_for(role)
+    base_url = base_url or base_url_for(role)
+    key = (base_url, model)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _create(base_url, model)
+            _clients[key] = client
+        return client
+
+
+def get_cascade(role: str = "agent", validator=None, label: Optional[str] = None):
+    """
+    返回角色的级联模型（`CascadingChatModel`），各级模型都来自 get_llm，共用连接池。
+    角色不级联时直接返回 get_llm(role)。
+
+    Args:
+        role: 调用方角色
+        validator: 输出校验函数，默认校验工具调用
+        label: 级联统计中的 agent 名称
+    """
+    models = cascade_for(role)
+    if len(models) == 1:
+        return get_llm(role, model=models[0])
+    from .model_router import CascadingChatModel
+
+    return CascadingChatModel(
+        models=[get_llm(role, model=m) for m in models], validator=validator, label=label
+    )
+
+
+def clear():
+    """丢弃所有已创建的客户端（下次 get_llm 时重新创建）。"""
+    with _lock:
+        _clients.clear()
+
+
+def stats():
+    return {"clients": [f"{model}@{url}" for url, model in _clients]}
+
+
+if __name__ == "__main__":
+    for name in ROLE_MODELS:
+        llm = get_llm(name)
+        print(f"{name}: {type(llm).__name__} {llm.model}，级联: {' > '.join(cascade_for(name))}")
+    assert get_llm("parser") is get_llm("mode")
+    print(stats())
@@ -0,0 +1,318 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+_ROLE_BY_TYPE = {
+    "human": "user",
+    "ai": "assistant",
+    "system": "system",
+    "tool": "tool",
+    # agent 中间步骤里的模型输出是流式合并后的消息块
+    "HumanMessageChunk": "user",
+    "AIMessageChunk": "assistant",
+    "SystemMessageChunk": "system",
+    "ToolMessageChunk": "tool",
+}
+# 回放流式输出时每个分块的字符数
+STREAM_CHUNK_CHARS = 8
+
+
+def _content_text(content) -> str:
+    if isinstance(content, str):
+        return content
+    parts = []
+    for part in content or []:
+        if isinstance(part, str):
+            parts.append(part)
+        elif isinstance(part, dict) and part.get("type") == "text":
+            parts.append(part["text"])
+    return "\n".join(parts)
+
+
+def normalize_messages(messages: List[BaseMessage]) -> List[dict]:
+    """LangChain 消息 -> 与 Ollama /api/chat 请求相同的归一化结构，供计算请求键。"""
+    normalized = []
+    for message in messages:
+        entry = {
+            "role": _ROLE_BY_TYPE.get(message.type, getattr(message, "role", message.type)),
+            "content": _content_text(message.content),
+        }
+        tool_calls = getattr(message, "tool_calls", None)
+        if tool_calls:
+            entry["tool_calls"] = [{"name": c["name"], "args": c["args"]} for c in tool_calls]
+        normalized.append(entry)
+    return normalized
+
+
+def normalize_ollama_messages(messages: List[dict]) -> List[dict]:
+    """Ollama /api/chat 请求中的 messages -> 归一化结构。"""
+    normalized = []
+    for message in messages:
+        entry = {"role": message.get("role", ""), "content": message.get("content") or ""}
+        tool_calls = message.get("tool_calls")
+        if tool_calls:
+            entry["tool_calls"] = [
+                {"name": c["function"]["name"], "args": c["function"].get("arguments") or {}}
+                for c in tool_calls
+            ]
+        normalized.append(entry)
+    return normalized
+
+
+def tool_names(tools: Optional[List[dict]]) -> List[str]:
+    return sorted(t.get("function", t).get("name", "") for t in tools or [])
+
+
+def request_keys(model: str, messages: List[dict], tools: List[str]):
+    """
+    计算请求的精确键和宽松键。
+
+    宽松键忽略工具返回内容（当前时间、窗口状态等每次运行都会变化），
+    精确键未命中时用它匹配同一轮对话中相同位置的请求。
+    """
+    def digest(payload) -> str:
+        text = json.dumps(payload, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()[:24]
+
+    loose = [
+        {"role": m["role"]} if m["role"] == "tool" else m
+        for m in messages
+    ]
+    return digest([model, tools, messages]), digest([model, tools, loose])
+
+
+def message_to_dict(message: AIMessage, elapsed: float) -> dict:
+    return {
+        "content": _content_text(message.content),
+        "tool_calls": [
+            {"name": c["name"], "args": c["args"], "id": c.get("id")} for c in message.tool_calls
+        ],
+        "usage_metadata": dict(message.usage_metadata or {}),
+        "response_metadata": {
+            k: v for k, v in (message.response_metadata or {}).items()
+            if isinstance(v, (str, int, float, bool)) or v is None
+        },
+        "elapsed": elapsed,
+    }
+
+
+def dict_to_message(response: dict) -> AIMessage:
+    return AIMessage(
+        content=response.get("content", ""),
+        tool_calls=[
+            {"name": c["name"], "args": c["args"], "id": c.get("id"), "type": "tool_call"}
+            for c in response.get("tool_calls", [])
+        ],
+        usage_metadata=response.get("usage_metadata") or None,
+        response_metadata=dict(response.get("response_metadata", {})),
+    )
+
+
+class CassetteMiss(KeyError):
+    """回放时找不到与请求匹配的录制记录。"""
+
+
+class Cassette:
+    """
+    录制的 LLM 请求/响应对，JSONL 文件，每行一条：
+    {"key", "loose_key", "model", "tools", "messages", "response"}。
+
+    同一个键录制了多条响应时按调用顺序循环返回，保证回放结果确定。
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._exact: Dict[str, List[dict]] = {}
+        self._loose: Dict[str, List[dict]] = {}
+        self._served: Dict[str, int] = {}
+        self.records = 0
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        self._index(json.loads(line))
+
+    def _index(self, record: dict):
+        self._exact.setdefault(record["key"], []).append(record)
+        self._loose.setdefault(record["loose_key"], []).append(record)
+        self.records += 1
+
+    def append(self, model: str, messages: List[dict], tools: List[str], response: dict):
+        key, loose_key = request_keys(model, messages, tools)
+        record = {
+            "key": key,
+            "loose_key": loose_key,
+            "model": model,
+            "tools": tools,
+            "messages": messages,
+            "response": response,
+        }
+        with self._lock:
+            self._index(record)
+            if self.path:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def models(self) -> List[str]:
+        with self._lock:
+            return sorted({r["model"] for records in self._exact.values() for r in records})
+
+    def lookup(self, model: str, messages: List[dict], tools: List[str]) -> dict:
+        key, loose_key = request_keys(model, messages, tools)
+        with self._lock:
+            for index, k in ((self._exact, key), (self._loose, loose_key)):
+                candidates = index.get(k)
+                if candidates:
+                    n = self._served.get(k, 0)
+                    self._served[k] = n + 1
+                    return candidates[n % len(candidates)]["response"]
+        last = messages[-1]["content"][:60] if messages else ""
+        raise CassetteMiss(f"录制文件中没有匹配的请求（模型 {model}，最后一条消息: {last!r}）")
+
+
+_cassettes: Dict[str, Cassette] = {}
+_cassettes_lock = threading.Lock()
+
+
+def get_cassette(path: str) -> Cassette:
+    """同一路径共用一个 Cassette 实例，多个客户端并发录制时写入同一个文件。"""
+    path = os.path.abspath(path)
+    with _cassettes_lock:
+        if path not in _cassettes:
+            _cassettes[path] = Cassette(path)
+        return _cassettes[path]
+
+
+def replay_delay(response: dict, latency) -> float:
+    """latency 为秒数时固定延迟；为 "recorded" 时按录制时的耗时延迟。"""
+    if latency == "recorded":
+        return float(response.get("elapsed") or 0.0)
+    return float(latency or 0.0)
+
+
+def iter_chunks(response: dict, delay: float = 0.0, run_manager=None) -> Iterator[ChatGenerationChunk]:
+    """把一条响应切分为流式分块，delay 平均分摊到各个分块；最后一个分块携带工具调用和用量信息。"""
+    content = response.get("content", "")
+    pieces = [content[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(content), STREAM_CHUNK_CHARS)]
+    delay = delay / (len(pieces) + 1)
+    for piece in pieces:
+        if delay > 0:
+            time.sleep(delay)
+        chunk = ChatGenerationChunk(message=AIMessageChunk(content=piece))
+        if run_manager:
+            run_manager.on_llm_new_token(piece, chunk=chunk)
+        yield chunk
+    if delay > 0:
+        time.sleep(delay)
+    yield ChatGenerationChunk(
+        message=AIMessageChunk(
+            content="",
+            tool_call_chunks=[
+                {"name": c["name"], "args": json.dumps(c["args"], ensure_ascii=False), "id": c.get("id"), "index": i}
+                for i, c in enumerate(response.get("tool_calls", []))
+            ],
+            usage_metadata=response.get("usage_metadata") or None,
+            response_metadata=dict(response.get("response_metadata", {})),
+            chunk_position="last",
+        )
+    )
+
+
+class _ToolBindingMixin:
+    def bind_tools(self, tools, **kwargs):
+        # 与 ChatOllama 一样把工具转换为 OpenAI 格式，通过 kwargs["tools"] 传给 _generate/_stream
+        return self.bind(tools=[convert_to_openai_tool(t) for t in tools], **kwargs)
+
+
+class RecordingChatModel(_ToolBindingMixin, BaseChatModel):
+    """
+    包装真实模型（通常是 ChatOllama），把每次请求和响应（包括工具调用）追加到录制文件。
+
+    Args:
+        inner: 被包装的模型
+        cassette: 录制文件
+        model: 模型名，参与请求键的计算
+    """
+
+    inner: Any
+    cassette: Any
+    model: str
+
+    @property
+    def _llm_type(self) -> str:
+        return "recording"
+
+    def _record(self, messages, tools, message: AIMessage, elapsed: float):
+        self.cassette.append(
+            self.model, normalize_messages(messages), tool_names(tools), message_to_dict(message, elapsed)
+        )
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        start = time.perf_counter()
+        result = self.inner._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        self._record(messages, kwargs.get("tools"), result.generations[0].message, time.perf_counter() - start)
+        return result
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        if type(self.inner)._stream is BaseChatModel._stream:
+            # 被包装的模型不支持流式输出：整体生成后作为一个响应切块返回
+            result = self._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+            yield from iter_chunks(message_to_dict(result.generations[0].message, 0.0))
+            return
+        start = time.perf_counter()
+        merged = None
+        for chunk in self.inner._stream(messages, stop=stop, run_manager=run_manager, **kwargs):
+            merged = chunk if merged is None else merged + chunk
+            yield chunk
+        if merged is not None:
+            message = AIMessage(
+                content=merged.message.content,
+                tool_calls=merged.message.tool_calls,
+                usage_metadata=merged.message.usage_metadata,
+                response_metadata=merged.message.response_metadata,
+            )
+            self._record(messages, kwargs.get("tools"), message, time.perf_counter() - start)
+
+
+class ReplayChatModel(_ToolBindingMixin, BaseChatModel):
+    """
+    按请求内容从录制文件中返回响应，不需要 Ollama 服务。
+
+    Args:
+        cassette: 录制文件
+        model: 模型名，参与请求键的计算
+        latency: 人为延迟，秒数或 "recorded"（使用录制时的实际耗时）；
+                 流式输出时延迟平均分摊到各个分块
+    """
+
+    cassette: Any
+    model: str
+    latency: Any = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "replay"
+
+    def _lookup(self, messages, kwargs) -> dict:
+        return self.cassette.lookup(self.model, normalize_messages(messages), tool_names(kwargs.get("tools")))
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        response = self._lookup(messages, kwargs)
+        delay = replay_delay(response, self.latency)
+        if delay > 0:
+            time.sleep(delay)
+        return ChatResult(generations=[ChatGeneration(message=dict_to_message(response))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        response = self._lookup(messages, kwargs)
+        yield from iter_chunks(response, replay_delay(response, self.latency), run_manager)
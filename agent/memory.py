@@ -0,0 +1,198 @@
+import os
+import re
+import threading
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+# 默认预算：对话历史（含状态摘要）最多占用的 token 数，以及其中状态摘要的上限
+DEFAULT_MAX_TOKENS = 600
+DEFAULT_SUMMARY_TOKENS = 160
+# 每条消息在聊天模板中的额外开销（角色标记、换行等）
+MESSAGE_OVERHEAD = 4
+# 压缩时每条旧消息保留的字符数
+SUMMARY_LINE_CHARS = 40
+SUMMARY_PREFIX = "[状态摘要] 较早的对话已压缩。"
+
+_CJK_RE = re.compile(r"[\u3000-\u303f\u3400-\u9fff\uf900-\ufaff\uff00-\uffef]")
+_THINK_RE = re.compile(r"<think>.*?</think>", re.S)
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估计 qwen 分词后的 token 数：中日文字符约 1 个 token，其余字符约 4 个一个 token。"""
+    text = text or ""
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def _message_text(message) -> str:
+    content = getattr(message, "content", message)
+    if isinstance(content, str):
+        return content
+    return "\n".join(p if isinstance(p, str) else str(p.get("text", "")) for p in content or [])
+
+
+def _summary_line(text: str) -> str:
+    text = " ".join(_THINK_RE.sub("", text).split()).rstrip("。.；;")
+    return text if len(text) <= SUMMARY_LINE_CHARS else text[:SUMMARY_LINE_CHARS] + "…"
+
+
+class TokenBudgetMemory:
+    """
+    有 token 预算的对话历史，替代 agent 中无限增长的 chat_history 列表。
+
+    - 最新的消息保留在滑动窗口中，总 token 数超过预算时从最旧的消息开始移出；
+    - compact=True 时移出的消息被压缩为一条状态摘要（facts 提取的状态 + 每条旧消息的前几十个字），
+      摘要本身也有上限，超出时丢弃最旧的条目；
+    - `messages()` 返回实际发送给模型的消息（摘要在前），同时累计节省的 token 数。
+
+    与列表相同支持 append/clear/len，registry.reset_history 可以直接清空。
+
+    Args:
+        max_tokens: 窗口与摘要合计的 token 预算，None 表示不限制（等同原来的列表）
+        summary_tokens: 状态摘要的 token 上限
+        compact: 是否把移出窗口的消息压缩为摘要；False 时直接丢弃
+        facts: 从消息文本中提取状态的函数，返回 {名称: 状态}，后出现的同名状态覆盖旧值
+        count_tokens: token 计数函数，默认 `estimate_tokens`
+    """
+
+    def __init__(
+        self,
+        max_tokens: Optional[int] = DEFAULT_MAX_TOKENS,
+        summary_tokens: int = DEFAULT_SUMMARY_TOKENS,
+        compact: bool = True,
+        facts: Optional[Callable[[str], Dict[str, str]]] = None,
+        count_tokens: Callable[[str], int] = estimate_tokens,
+    ):
+        self.max_tokens = max_tokens
+        if not compact:
+            summary_tokens = 0
+        elif max_tokens is not None:
+            # 摘要最多占预算的一半，窗口至少留一半给最近的消息
+            summary_tokens = min(summary_tokens, max_tokens // 2)
+        self.summary_tokens = summary_tokens
+        self.compact = compact
+        self.facts = facts
+        self.count_tokens = count_tokens
+
+        self._lock = threading.Lock()
+        self._window = deque()  # (message, tokens)
+        self._window_tokens = 0
+        self._state: Dict[str, str] = {}
+        self._lines = deque()  # 被压缩的旧消息摘要
+        self._history_tokens = 0  # 不做限制时需要发送的 token 数
+        self.turns = 0
+        self.evicted = 0
+        self.renders = 0
+        self.tokens_sent = 0
+        self.tokens_saved = 0
+
+    def _tokens(self, message) -> int:
+        return self.count_tokens(_message_text(message)) + MESSAGE_OVERHEAD
+
+    def append(self, message):
+        tokens = self._tokens(message)
+        with self._lock:
+            self.turns += 1
+            self._history_tokens += tokens
+            self._window.append((message, tokens))
+            self._window_tokens += tokens
+            if self.facts is not None:
+                self._state.update(self.facts(_message_text(message)) or {})
+            if self.max_tokens is None:
+                return
+            # 至少保留最新的一条消息
+            budget = self.max_tokens - self.summary_tokens
+            while len(self._window) > 1 and self._window_tokens > budget:
+                old, old_tokens = self._window.popleft()
+                self._window_tokens -= old_tokens
+                self.evicted += 1
+                if self.compact:
+                    self._lines.append(_summary_line(_message_text(old)))
+            while self._lines and self.count_tokens(self._summary_text()) > self.summary_tokens:
+                self._lines.popleft()
+
+    def note(self, name: str, state: str):
+        """显式记录一条状态（例如 "记事本": "已打开"），压缩后仍保留在摘要中。"""
+        with self._lock:
+            self._state[name] = state
+
+    def _summary_text(self) -> str:
+        parts = []
+        if self._state:
+            parts.append("当前状态：" + "；".join(f"{k}={v}" for k, v in self._state.items()) + "。")
+        if self._lines:
+            parts.append("较早的步骤结果：" + "；".join(self._lines) + "。")
+        return SUMMARY_PREFIX + "".join(parts) if parts else ""
+
+    def messages(self) -> List:
+        """返回本次调用要发送的历史消息：[状态摘要] + 滑动窗口。"""
+        from langchain_core.messages import AIMessage
+
+        with self._lock:
+            result = [message for message, _ in self._window]
+            sent = self._window_tokens
+            compacted = self._lines or (self._state and self.evicted)
+            summary = self._summary_text() if self.compact and compacted else ""
+            if summary:
+                result.insert(0, AIMessage(content=summary))
+                sent += self.count_tokens(summary) + MESSAGE_OVERHEAD
+            self.renders += 1
+            self.tokens_sent += sent
+            self.tokens_saved += max(self._history_tokens - sent, 0)
+            return result
+
+    def clear(self):
+        """清空历史和状态，累计统计保留。"""
+        with self._lock:
+            self._window.clear()
+            self._window_tokens = 0
+            self._state.clear()
+            self._lines.clear()
+            self._history_tokens = 0
+
+    def __len__(self):
+        return len(self._window)
+
+    def stats(self):
+        with self._lock:
+            total = self.tokens_sent + self.tokens_saved
+            return {
+                "turns": self.turns,
+                "window": len(self._window),
+                "window_tokens": self._window_tokens,
+                "evicted": self.evicted,
+                "summary_lines": len(self._lines),
+                "tokens_sent": self.tokens_sent,
+                "tokens_saved": self.tokens_saved,
+                "saved_rate": self.tokens_saved / total if total else 0.0,
+            }
+
+
+def memory_from_env(facts: Optional[Callable[[str], Dict[str, str]]] = None) -> TokenBudgetMemory:
+    """
+    按环境变量创建 agent 的对话历史：
+      PYAUTOGUI_AGENT_MEMORY_TOKENS=600    预算，0 表示不限制
+      PYAUTOGUI_AGENT_MEMORY_COMPACT=0     关闭摘要压缩，只保留滑动窗口
+    """
+    max_tokens = int(os.environ.get("PYAUTOGUI_AGENT_MEMORY_TOKENS") or DEFAULT_MAX_TOKENS)
+    compact = os.environ.get("PYAUTOGUI_AGENT_MEMORY_COMPACT", "1").lower() not in ("0", "false", "off")
+    return TokenBudgetMemory(max_tokens=max_tokens or None, compact=compact, facts=facts)
+
+
+if __name__ == "__main__":
+    from langchain_core.messages import AIMessage
+
+    def notepad_facts(text):
+        return {"记事本": "已打开"} if "记事本" in text and "打开" in text else {}
+
+    memory = TokenBudgetMemory(max_tokens=120, summary_tokens=60, facts=notepad_facts)
+    unbounded = TokenBudgetMemory(max_tokens=None)
+    outputs = ["记事本已成功打开，可以开始输入。"] + [f"已在记事本中输入第 {i} 段文本，共 30 个字符。" for i in range(1, 30)]
+    for i, output in enumerate(outputs, 1):
+        for m in (memory, unbounded):
+            m.append(AIMessage(content=output))
+            m.messages()
+        if i in (1, 10, 30):
+            print(f"第 {i} 步: 预算内 {memory.stats()['window_tokens']} tokens / 不限制 {unbounded.stats()['window_tokens']} tokens")
+    print(memory.messages()[0].content)
+    print(memory.stats())
@@ -0,0 +1,172 @@
+import json
+import math
+import os
+import random
+import time
+from collections import Counter
+from typing import List, Tuple
+
+import numpy as np
+
+from .text_features import DEFAULT_NGRAM_RANGE, hash_matrix, ngram_hashes
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+DEFAULT_CORPUS = os.path.join(DATA_DIR, "mode_corpus.jsonl")
+DEFAULT_ARTIFACT = os.path.join(DATA_DIR, "mode_classifier.npz")
+
+# 标签含义与 checkMode 一致：1 = 浏览器操作，0 = 直接操作电脑软件
+BROWSER = 1
+DESKTOP = 0
+
+
+def load_corpus(path: str = DEFAULT_CORPUS) -> Tuple[List[str], List[int]]:
+    """读取标注语料，每行一个 {"text": ..., "label": 0|1}。"""
+    texts, labels = [], []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            texts.append(record["text"])
+            labels.append(int(record["label"]))
+    return texts, labels
+
+
+class ModeClassifier:
+    """
+    浏览器/桌面软件二分类器：字符 n-gram 哈希特征 + 逻辑回归。
+
+    权重保存为很小的 .npz 文件，预测时只需查表求和，单次预测耗时为微秒级。
+
+    Args:
+        weights: 形状为 (dim,) 的权重
+        bias: 偏置
+        ngram_range: 训练时使用的 n-gram 范围
+    """
+
+    def __init__(self, weights: np.ndarray, bias: float, ngram_range=DEFAULT_NGRAM_RANGE):
+        self.weights = np.asarray(weights, dtype=np.float32)
+        self.bias = float(bias)
+        self.ngram_range = tuple(ngram_range)
+        self.dim = len(self.weights)
+        self._weights = self.weights.tolist()  # 预测时逐个查表，Python 列表比 ndarray 下标更快
+
+    @classmethod
+    def train(
+        cls,
+        texts: List[str],
+        labels: List[int],
+        dim: int = 1024,
+        ngram_range=DEFAULT_NGRAM_RANGE,
+        epochs: int = 2000,
+        lr: float = 4.0,
+        l2: float = 1e-4,
+    ) -> "ModeClassifier":
+        """全量梯度下降训练逻辑回归。"""
+        x = hash_matrix(texts, ngram_range, dim)
+        y = np.asarray(labels, dtype=np.float32)
+        w = np.zeros(dim, dtype=np.float32)
+        b = 0.0
+        for _ in range(epochs):
+            p = 1.0 / (1.0 + np.exp(-(x @ w + b)))
+            grad = p - y
+            w -= lr * (x.T @ grad / len(y) + l2 * w)
+            b -= lr * float(grad.mean())
+        return cls(w, b, ngram_range)
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_ARTIFACT) -> "ModeClassifier":
+        data = np.load(path)
+        return cls(data["weights"], float(data["bias"]), tuple(int(n) for n in data["ngram_range"]))
+
+    def save(self, path: str = DEFAULT_ARTIFACT):
+        np.savez(
+            path,
+            weights=self.weights,
+            bias=np.float32(self.bias),
+            ngram_range=np.asarray(self.ngram_range, dtype=np.int32),
+        )
+
+    def predict_proba(self, text: str) -> float:
+        """返回属于浏览器操作的概率。"""
+        counts = Counter(ngram_hashes(text, self.ngram_range, self.dim))
+        if not counts:
+            return 0.5
+        norm = math.sqrt(sum(c * c for c in counts.values()))
+        score = sum(self._weights[b] * c for b, c in counts.items()) / norm + self.bias
+        return 1.0 / (1.0 + math.exp(-score))
+
+    def predict(self, text: str) -> Tuple[int, float]:
+        """
+        Returns:
+            (标签, 置信度)，置信度为预测标签对应的概率（0.5~1）
+        """
+        p = self.predict_proba(text)
+        return (BROWSER, p) if p >= 0.5 else (DESKTOP, 1.0 - p)
+
+
+_default_classifier = None
+
+
+def get_classifier() -> ModeClassifier:
+    """返回共享的分类器：优先加载随代码提供的权重文件，不存在时用内置语料现场训练。"""
+    global _default_classifier
+    if _default_classifier is None:
+        if os.path.exists(DEFAULT_ARTIFACT):
+            _default_classifier = ModeClassifier.load(DEFAULT_ARTIFACT)
+        else:
+            _default_classifier = ModeClassifier.train(*load_corpus(DEFAULT_CORPUS))
+    return _default_classifier
+
+
+def evaluate(texts: List[str], labels: List[int], folds: int = 5, seed: int = 0, threshold: float = 0.8):
+    """k 折交叉验证，返回准确率、高置信度覆盖率及高置信度部分的准确率。"""
+    order = list(range(len(texts)))
+    random.Random(seed).shuffle(order)
+    correct = confident = confident_correct = 0
+    for k in range(folds):
+        test_idx = set(order[k::folds])
+        model = ModeClassifier.train(
+            [texts[i] for i in order if i not in test_idx],
+            [labels[i] for i in order if i not in test_idx],
+        )
+        for i in test_idx:
+            label, confidence = model.predict(texts[i])
+            correct += label == labels[i]
+            if confidence >= threshold:
+                confident += 1
+                confident_correct += label == labels[i]
+    return {
+        "accuracy": correct / len(texts),
+        "coverage": confident / len(texts),
+        "confident_accuracy": confident_correct / confident if confident else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    arg_parser = argparse.ArgumentParser(description="训练/评估 checkMode 使用的本地分类器")
+    arg_parser.add_argument("command", choices=["train", "eval"])
+    arg_parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="标注语料（JSONL）")
+    arg_parser.add_argument("--out", default=DEFAULT_ARTIFACT, help="训练结果保存路径")
+    arg_parser.add_argument("--threshold", type=float, default=0.8, help="高置信度阈值")
+    args = arg_parser.parse_args()
+
+    corpus_texts, corpus_labels = load_corpus(args.corpus)
+    if args.command == "eval":
+        report = evaluate(corpus_texts, corpus_labels, threshold=args.threshold)
+        print(f"{len(corpus_texts)} 条语料，5 折交叉验证: {report}")
+    else:
+        classifier = ModeClassifier.train(corpus_texts, corpus_labels)
+        classifier.save(args.out)
+        start = time.perf_counter()
+        for text in corpus_texts:
+            classifier.predict(text)
+        per_call = (time.perf_counter() - start) / len(corpus_texts) * 1e6
+        train_acc = sum(classifier.predict(t)[0] == y for t, y in zip(corpus_texts, corpus_labels))
+        print(
+            f"已保存到 {args.out}，训练集准确率 {train_acc / len(corpus_texts):.2%}，"
+            f"单次预测 {per_call:.1f} µs"
+        )
@@ -0,0 +1,245 @@
+import json
+import re
+import threading
+from collections import Counter
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from .call_tags import current_scope
+
+_THINK_RE = re.compile(r"<think>.*?</think>", re.S)
+
+# 校验函数：输入模型输出和本次绑定的工具（OpenAI 格式），合格返回 None，否则返回原因
+Validator = Callable[[AIMessage, List[dict]], Optional[str]]
+
+
+def validate_tool_message(message: AIMessage, tools: List[dict]) -> Optional[str]:
+    """
+    默认校验：工具调用必须指向已绑定的工具且带齐必填参数；没有工具调用时必须是非空的文本回答，
+    且不能是把工具调用写进正文的情况（小模型常见的失败方式）。
+    """
+    specs = {t["function"]["name"]: t["function"] for t in tools or [] if "function" in t}
+    if message.invalid_tool_calls:
+        return "工具调用参数无法解析"
+    for call in message.tool_calls:
+        spec = specs.get(call["name"])
+        if spec is None:
+            return f"调用了不存在的工具 {call['name']}"
+        if not isinstance(call.get("args"), dict):
+            return f"工具 {call['name']} 的参数不是对象"
+        required = spec.get("parameters", {}).get("required", [])
+        missing = [name for name in required if name not in call["args"]]
+        if missing:
+            return f"工具 {call['name']} 缺少参数 {', '.join(missing)}"
+    if message.tool_calls:
+        return None
+
+    text = _THINK_RE.sub("", message.content if isinstance(message.content, str) else "").strip()
+    if not text:
+        return "空响应"
+    if "{" in text and any(name in text for name in specs):
+        return "工具调用写在了正文中"
+    return None
+
+
+def _as_chunk(message) -> AIMessageChunk:
+    """不支持流式输出的模型在 stream() 中返回完整的 AIMessage，转换为可以合并的消息块。"""
+    if isinstance(message, AIMessageChunk):
+        return message
+    return AIMessageChunk(
+        content=message.content,
+        tool_call_chunks=[
+            {"name": c["name"], "args": json.dumps(c["args"], ensure_ascii=False), "id": c.get("id"), "index": i}
+            for i, c in enumerate(message.tool_calls)
+        ],
+        usage_metadata=message.usage_metadata,
+        response_metadata=message.response_metadata,
+        id=message.id,
+    )
+
+
+class RouterStats:
+    """按 agent 统计级联路由的调用次数、升级次数、最终仍不合格的次数以及失败原因。"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, Any]] = {}
+
+    def record(self, label: str, tier: int, reasons: List[str], valid: bool):
+        with self._lock:
+            stats = self._stats.setdefault(
+                label, {"calls": 0, "escalations": 0, "unresolved": 0, "by_tier": Counter(), "reasons": Counter()}
+            )
+            stats["calls"] += 1
+            stats["by_tier"][tier] += 1
+            stats["escalations"] += tier > 0
+            stats["unresolved"] += not valid
+            stats["reasons"].update(reasons)
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {
+                label: {
+                    "calls": s["calls"],
+                    "escalations": s["escalations"],
+                    "escalation_rate": s["escalations"] / s["calls"] if s["calls"] else 0.0,
+                    "unresolved": s["unresolved"],
+                    "by_tier": dict(s["by_tier"]),
+                    "reasons": dict(s["reasons"].most_common(5)),
+                }
+                for label, s in sorted(self._stats.items())
+            }
+
+    def clear(self):
+        with self._lock:
+            self._stats.clear()
+
+
+router_stats = RouterStats()
+
+
+def format_router_stats(summary: Dict[str, Dict[str, Any]]) -> str:
+    if not summary:
+        return "模型级联统计: 无调用"
+    lines = ["模型级联统计:"]
+    for label, s in summary.items():
+        line = (
+            f"  {label}: {s['calls']} 次调用，升级 {s['escalations']} 次"
+            f"（{s['escalation_rate']:.0%}），大模型仍不合格 {s['unresolved']} 次"
+        )
+        if s["reasons"]:
+            line += "；升级原因: " + "，".join(f"{r} x{n}" for r, n in s["reasons"].items())
+        lines.append(line)
+    return "\n".join(lines)
+
+
+class CascadingChatModel(BaseChatModel):
+    """
+    级联模型：先用小模型回答，输出未通过校验时依次升级到更大的模型。
+
+    - 每次调用（例如 AgentExecutor 的每次迭代）独立决定使用哪一级模型；
+    - 某一级抛出异常也视为不合格并升级，最后一级的异常照常抛出；
+    - 所有级别都不合格时返回最后一级的输出，由调用方按原有逻辑处理；
+    - 流式调用时非最后一级的输出需要校验后才能产出，因此会先缓冲，最后一级直接流式输出；
+      需要尽早拿到 token 的调用方（如 NLPParserAgent.parse_instruction_stream）不应经过级联。
+
+    Args:
+        models: 从小到大排列的模型（通常来自 llm_pool.get_llm，共用连接）
+        validator: 校验函数，默认 `validate_tool_message`
+        label: 统计时使用的 agent 名称，None 时取调用标签中的 agent
+        model: 模型名（各级模型名用 ">" 连接），供计划缓存指纹等使用
+    """
+
+    models: List[Any]
+    validator: Optional[Callable] = None
+    label: Optional[str] = None
+    model: str = ""
+
+    def __init__(self, **data):
+        super().__init__(**data)
+        if not self.model:
+            self.model = ">".join(getattr(m, "model", type(m).__name__) for m in self.models)
+
+    @property
+    def _llm_type(self) -> str:
+        return "cascade"
+
+    def bind_tools(self, tools, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(t) for t in tools], **kwargs)
+
+    def _label(self, run_manager) -> str:
+        if self.label:
+            return self.label
+        metadata = getattr(run_manager, "metadata", None) or {}
+        if metadata.get("agent"):
+            return str(metadata["agent"])
+        scope = current_scope()
+        return str(scope["tags"].get("agent", "untagged")) if scope else "untagged"
+
+    def _tier_runnable(self, model, kwargs):
+        tools = kwargs.get("tools")
+        extra = {k: v for k, v in kwargs.items() if k != "tools"}
+        runnable = model.bind_tools(tools) if tools else model
+        return runnable.bind(**extra) if extra else runnable
+
+    @staticmethod
+    def _child_config(run_manager):
+        # 把上层的 metadata（如 agent 标签）传给各级模型，模型调用统计按原标签记录
+        metadata = getattr(run_manager, "metadata", None) or {}
+        return {"metadata": {k: v for k, v in metadata.items() if not k.startswith("ls_")}}
+
+    def _check(self, message: AIMessage, kwargs) -> Optional[str]:
+        validator = self.validator or validate_tool_message
+        return validator(message, kwargs.get("tools") or [])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        reasons = []
+        config = self._child_config(run_manager)
+        last = len(self.models) - 1
+        for tier, model in enumerate(self.models):
+            runnable = self._tier_runnable(model, kwargs)
+            try:
+                message = runnable.invoke(messages, config=config, stop=stop)
+            except Exception as e:
+                if tier == last:
+                    router_stats.record(self._label(run_manager), tier, reasons, False)
+                    raise
+                reasons.append(f"调用失败: {type(e).__name__}")
+                continue
+            reason = self._check(message, kwargs)
+            if reason is None or tier == last:
+                router_stats.record(self._label(run_manager), tier, reasons, reason is None)
+                return ChatResult(generations=[ChatGeneration(message=message)])
+            reasons.append(reason)
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        reasons = []
+        config = self._child_config(run_manager)
+        last = len(self.models) - 1
+        for tier, model in enumerate(self.models):
+            runnable = self._tier_runnable(model, kwargs)
+            if tier == last:
+                merged = None
+                try:
+                    for chunk in runnable.stream(messages, config=config, stop=stop):
+                        chunk = _as_chunk(chunk)
+                        merged = chunk if merged is None else merged + chunk
+                        yield self._emit(chunk, run_manager)
+                except GeneratorExit:
+                    # 调用方拿到需要的内容后提前结束（如解析器读完 JSON 数组），按合格统计
+                    router_stats.record(self._label(run_manager), tier, reasons, True)
+                    raise
+                except Exception:
+                    router_stats.record(self._label(run_manager), tier, reasons, False)
+                    raise
+                valid = merged is not None and self._check(merged, kwargs) is None
+                router_stats.record(self._label(run_manager), tier, reasons, valid)
+                return
+
+            chunks = []
+            try:
+                chunks = [_as_chunk(c) for c in runnable.stream(messages, config=config, stop=stop)]
+            except Exception as e:
+                reasons.append(f"调用失败: {type(e).__name__}")
+                continue
+            merged = chunks[0] if chunks else AIMessageChunk(content="")
+            for chunk in chunks[1:]:
+                merged = merged + chunk
+            reason = self._check(merged, kwargs)
+            if reason is None:
+                router_stats.record(self._label(run_manager), tier, reasons, True)
+                for chunk in chunks:
+                    yield self._emit(chunk, run_manager)
+                return
+            reasons.append(reason)
+
+    @staticmethod
+    def _emit(chunk: AIMessageChunk, run_manager) -> ChatGenerationChunk:
+        generation = ChatGenerationChunk(message=chunk)
+        if run_manager and isinstance(chunk.content, str) and chunk.content:
+            run_manager.on_llm_new_token(chunk.content, chunk=generation)
+        return generation
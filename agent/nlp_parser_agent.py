@@ -1,31 +1,21 @@
-from langchain_ollama import ChatOllama
 import json
 
+from .app_mapping import render_app_mapping_rules
+from .llm_pool import cascade_for, get_cascade, get_llm
+from .plan_cache import PlanCache, plan_fingerprint, DEFAULT_CACHE_PATH
+from .rule_parser import RuleParser
+from .stream_json import IncrementalArrayParser
 
-class NLPParserAgent:
-    def __init__(self):
-        from langchain_core.prompts import ChatPromptTemplate
-
-        self.llm = ChatOllama(base_url="http://localhost:11434", model="qwen3:0.6b")
+# 计划中每个步骤必须包含的字段
+REQUIRED_STEP_FIELDS = ("step", "action", "app", "agent_type")
 
-        self.prompt = ChatPromptTemplate.from_template(
-            """你是一个专业的电脑操作指令解析器。请将用户的自然语言指令解析为一个JSON数组，每个数组项都是一个操作步骤。
+PARSER_PROMPT_TEMPLATE = """你是一个专业的电脑操作指令解析器。请将用户的自然语言指令解析为一个JSON数组，每个数组项都是一个操作步骤。
 
 输入要求：用户描述电脑操作的句子
 输出要求：返回一个JSON数组，格式为 [{{"step": 1, "action": "具体的动作描述（包含参数）", "app": "应用可执行文件名", "agent_type": "代理类型"}}]
 
 应用映射规则（请严格使用以下对应的可执行文件名作为app字段的值）：
-- 记事本、notepad、笔记 -> notepad.exe
-- 计算器、calc、计算 -> calc.exe
-- 任务管理器、taskmgr -> taskmgr.exe
-- 资源管理器、explorer -> explorer.exe
-- 控制面板、control -> control.exe
-- 注册表编辑器、regedit -> regedit.exe
-- 服务、services -> services.msc
-- 系统信息、msinfo32 -> msinfo32.exe
-- 磁盘管理、disk、硬盘 -> diskmgmt.msc
-- 创建日程、添加日程、安排会议、创建会议、导出日历、添加到日历 -> calendar （将日历相关指令映射到"calendar"应用）
-- 如果未找到匹配应用，app字段请保持原样或为空字符串
+""" + render_app_mapping_rules() + """
 
 代理类型(agent_type)判断规则：
 - 如果 app 为 notepad.exe，则 agent_type 为 "notebook"
@@ -40,11 +30,15 @@ class NLPParserAgent:
    - 若时间是相对描述（如“下周五下午2点”），保留原始文本，不要尝试解析为具体日期。
 4. 根据映射规则确定app字段的值。
 5. 根据app字段确定agent_type字段的值。
-6. 只有step, action, app, agent_type字段。
+6. 只有step, action, app, agent_type字段，以及可选的depends_on字段。
+7. depends_on（可选）：该步骤必须等待完成的前置步骤编号列表。对不同应用的互不相关的操作（如"启动硬盘管理，再打开计算器"）请给出空列表，以便并行执行；同一应用上的连续操作会自动按顺序执行，可以省略。
 
 示例：
 输入："帮我打开记事本输入123"
-输出: [{{"step": 1, "action": "打开应用", "app": "notepad.exe", "agent_type": "notebook"}}, {{"step": 2, "action": "输入文本123", "app": "notepad.exe", "agent_type": "notebook"}}]
+输出: [{{"step": 1, "action": "打开应用", "app": "notepad.exe", "agent_type": "notebook"}}, {{"step": 2, "action": "输入文本123", "app": "notepad.exe", "agent_type": "notebook", "depends_on": [1]}}]
+
+输入："启动硬盘管理，再打开计算器"
+输出: [{{"step": 1, "action": "打开应用", "app": "diskmgmt.msc", "agent_type": "default", "depends_on": []}}, {{"step": 2, "action": "打开应用", "app": "calc.exe", "agent_type": "default", "depends_on": []}}]
 
 输入："创建下周五公司团建活动，下午2点到5点，在市中心公园举行，导出为 meeting.ics"
 输出: [{{"step": 1, "action": "创建事件: summary=公司团建活动; dtstart=下周五 下午14:00; dtend=下周五 下午17:00; tz=Asia/Shanghai; location=市中心公园; filename=meeting.ics", "app": "calendar", "agent_type": "calendar"}}]
@@ -56,28 +50,263 @@ class NLPParserAgent:
 {instruction}
 
 请只返回JSON数组，不要包含任何其他文本。"""
-        )
+
+
+def step_error(step):
+    """检查单个步骤，合法时返回 None，否则返回原因。流式解析在产出每个步骤前调用。"""
+    if not isinstance(step, dict):
+        return "步骤不是对象"
+    missing = [field for field in REQUIRED_STEP_FIELDS if field not in step]
+    if missing:
+        return f"步骤缺少字段 {', '.join(missing)}"
+    if not isinstance(step["action"], str) or not step["action"].strip():
+        return "步骤的 action 为空"
+    depends_on = step.get("depends_on")
+    if depends_on is not None and not isinstance(depends_on, list):
+        return "步骤的 depends_on 不是列表"
+    return None
+
+
+def validate_plan(steps) -> bool:
+    """检查解析结果是否为合法计划：非空列表，每一步都是包含必需字段的字典。"""
+    if not isinstance(steps, list) or not steps:
+        return False
+    return all(step_error(step) is None for step in steps)
+
+
+def _checked(step):
+    error = step_error(step)
+    if error is not None:
+        raise ValueError(f"模型输出的{error}: {json.dumps(step, ensure_ascii=False)}")
+    return step
+
+
+def _check_finished(parser: IncrementalArrayParser):
+    if not parser.finished:
+        raise ValueError("模型输出的 JSON 数组不完整")
+    if not parser.items:
+        raise ValueError("模型输出的计划为空")
+
+
+def plan_message_error(message, tools=None):
+    """级联路由的校验函数：模型输出必须是能直接 json.loads 的合法计划，否则升级到更大的模型。"""
+    try:
+        steps = json.loads(message.content)
+    except (TypeError, ValueError):
+        return "计划不是合法的 JSON"
+    if not validate_plan(steps):
+        return "计划缺少必需字段"
+    return None
+
+
+class NLPParserAgent:
+    def __init__(self, cache=True, rules=True, rule_threshold: float = 0.85, similarity=False):
+        """
+        Args:
+            cache: 计划缓存。True 使用默认路径的持久化缓存，False/None 关闭缓存，
+                   也可以直接传入 PlanCache 实例
+            rules: 是否启用本地规则解析（“打开 X 并输入 Y”等指令不经过 LLM）
+            rule_threshold: 规则解析结果的最低置信度，低于该值时回退到 LLM
+            similarity: 近似指令缓存（需要 NumPy）。True 使用默认参数创建，
+                        也可以直接传入 SimilarityPlanCache 实例
+        """
+        from langchain_core.prompts import ChatPromptTemplate
+
+        # 先用 0.6b 解析，计划不合格时才升级到 4b（见 agent/model_router.py）
+        self.llm = get_cascade("parser", validator=plan_message_error, label="parser")
+
+        self.prompt = ChatPromptTemplate.from_template(PARSER_PROMPT_TEMPLATE)
+        # 对话链只构建一次，所有解析调用共用
+        self.chain = (self.prompt | self.llm).with_config(metadata={"agent": "parser"})
+        # 流式解析不经过级联：级联需要缓冲完整输出才能校验。改为用最小的模型逐 token 输出，
+        # 每个步骤产出前单独校验；还没有产出任何步骤就不合格时，换最大的模型重新生成
+        tiers = cascade_for("parser")
+        self.stream_chains = [
+            (model, (self.prompt | get_llm("parser", model=model)).with_config(metadata={"agent": "parser"}))
+            for model in dict.fromkeys((tiers[0], tiers[-1]))
+        ]
+
+        if cache is True:
+            cache = PlanCache(
+                plan_fingerprint(PARSER_PROMPT_TEMPLATE, self.llm.model), path=DEFAULT_CACHE_PATH
+            )
+        self.cache = cache or None
+
+        self.rule_parser = RuleParser() if rules else None
+        self.rule_threshold = rule_threshold
+        self.rule_hits = 0
+
+        if similarity is True:
+            from .similarity_cache import SimilarityPlanCache
+
+            similarity = SimilarityPlanCache()
+            # 用持久化缓存中已验证的计划预热
+            if self.cache is not None:
+                for instruction, plan in self.cache.entries():
+                    if validate_plan(plan):
+                        similarity.add(instruction, plan)
+        # 注意：SimilarityPlanCache 定义了 __len__，空缓存为假值，不能用 `or` 判断
+        self.similarity = similarity if similarity not in (None, False) else None
+
+    def _local_plan(self, instruction: str):
+        """不经过 LLM 的解析：依次尝试规则解析、计划缓存、近似指令缓存。都未命中时返回 None。"""
+        if self.rule_parser is not None:
+            steps, confidence = self.rule_parser.parse(instruction)
+            if steps is not None and confidence >= self.rule_threshold:
+                self.rule_hits += 1
+                return steps
+
+        if self.cache is not None:
+            cached = self.cache.get(instruction)
+            if cached is not None:
+                return cached
+
+        if self.similarity is not None:
+            return self.similarity.lookup(instruction)
+        return None
+
+    def _remember(self, instruction: str, steps):
+        """只缓存通过校验的计划。"""
+        if not validate_plan(steps):
+            return
+        if self.cache is not None:
+            self.cache.put(instruction, steps)
+        if self.similarity is not None:
+            self.similarity.add(instruction, steps)
+
+    def _parse_response(self, instruction: str, response_text: str):
+        """解析模型输出的 JSON，合法计划写入缓存。JSON 不合法时抛出异常。"""
+        parsed_steps = json.loads(response_text)
+        self._remember(instruction, parsed_steps)
+        return parsed_steps
 
     def parse_instruction(self, instruction: str):
-        try:
-            # 创建对话链，将提示词与语言模型连接起来
-            chain = self.prompt | self.llm
+        local = self._local_plan(instruction)
+        if local is not None:
+            return local
 
+        try:
             # 调用链并生成回答，传入指令作为参数
-            result = chain.invoke({"instruction": instruction})
+            result = self.chain.invoke({"instruction": instruction})
 
             # 提取并解析JSON内容
-            response_text = result.content
-
-            # 尝试解析JSON
-            parsed_steps = json.loads(response_text)
-
-            return parsed_steps
+            return self._parse_response(instruction, result.content)
 
         except Exception as e:
             print(f"解析过程中出现错误: {e}")
             return ""
 
+    def parse_many(self, instructions, max_concurrency: int = 4):
+        """
+        批量解析多条指令。规则/缓存命中的指令直接返回，其余指令通过 `chain.batch`
+        以不超过 max_concurrency 的并发调用模型，相同指令只解析一次。
+
+        Returns:
+            与输入顺序一致的列表，每项为
+            {"instruction": 指令, "steps": 步骤列表或 None, "error": 错误信息或 None,
+             "source": "local" | "llm"}
+        """
+        instructions = list(instructions)
+        results = [None] * len(instructions)
+        pending = {}  # 指令 -> 输入中的下标列表
+        for i, instruction in enumerate(instructions):
+            local = self._local_plan(instruction)
+            if local is not None:
+                results[i] = {"instruction": instruction, "steps": local, "error": None, "source": "local"}
+            else:
+                pending.setdefault(instruction, []).append(i)
+
+        if pending:
+            unique = list(pending)
+            responses = self.chain.batch(
+                [{"instruction": instruction} for instruction in unique],
+                config={"max_concurrency": max_concurrency},
+                return_exceptions=True,
+            )
+            for instruction, response in zip(unique, responses):
+                steps, error = None, None
+                if isinstance(response, Exception):
+                    error = f"模型调用失败: {response}"
+                else:
+                    try:
+                        steps = self._parse_response(instruction, response.content)
+                        if not validate_plan(steps):
+                            steps, error = None, f"计划格式不合法: {response.content}"
+                    except Exception as e:
+                        error = f"JSON 解析失败: {e}"
+                for i in pending[instruction]:
+                    results[i] = {
+                        "instruction": instruction,
+                        # 重复指令各自持有一份副本，避免调用方修改时互相影响
+                        "steps": json.loads(json.dumps(steps)) if steps is not None else None,
+                        "error": error,
+                        "source": "llm",
+                    }
+        return results
+
+    def parse_instruction_stream(self, instruction: str):
+        """
+        流式解析：消费模型的 token 流，数组中每个步骤一旦完整就立即产出，
+        调用方可以在后续步骤仍在生成时先执行第一个步骤。
+
+        Yields:
+            步骤字典
+        """
+        local = self._local_plan(instruction)
+        if local is not None:
+            yield from local
+            return
+
+        for tier, (_, chain) in enumerate(self.stream_chains):
+            parser = IncrementalArrayParser()
+            yielded = 0
+            try:
+                for chunk in chain.stream({"instruction": instruction}):
+                    for step in parser.feed(chunk.content):
+                        step = _checked(step)
+                        yielded += 1
+                        yield step
+                    if parser.finished:
+                        break
+                _check_finished(parser)
+            except ValueError as e:
+                self._stream_retry(tier, yielded, e)
+                continue
+            self._remember(instruction, parser.items)
+            return
+
+    async def aparse_instruction_stream(self, instruction: str):
+        """`parse_instruction_stream` 的异步版本，返回异步迭代器。"""
+        local = self._local_plan(instruction)
+        if local is not None:
+            for step in local:
+                yield step
+            return
+
+        for tier, (_, chain) in enumerate(self.stream_chains):
+            parser = IncrementalArrayParser()
+            yielded = 0
+            try:
+                async for chunk in chain.astream({"instruction": instruction}):
+                    for step in parser.feed(chunk.content):
+                        step = _checked(step)
+                        yielded += 1
+                        yield step
+                    if parser.finished:
+                        break
+                _check_finished(parser)
+            except ValueError as e:
+                self._stream_retry(tier, yielded, e)
+                continue
+            self._remember(instruction, parser.items)
+            return
+
+    def _stream_retry(self, tier: int, yielded: int, error: Exception):
+        """流式输出不合格：已产出的步骤可能已经在执行，只能抛出；否则换下一个模型重新生成。"""
+        if yielded or tier + 1 >= len(self.stream_chains):
+            raise error
+        print(f"流式解析: {self.stream_chains[tier][0]} 的输出不合格（{error}），改用 {self.stream_chains[tier + 1][0]} 重新生成")
+
 
 # 使用示例
 if __name__ == "__main__":
@@ -1,11 +1,19 @@
-from langchain_ollama import ChatOllama
-from langchain_classic.agents import create_tool_calling_agent, AgentExecutor
+from langchain_classic.agents import create_tool_calling_agent
 from langchain_core.tools import StructuredTool
-import win32gui
-import win32process
-import time
+
+from utils.launcher import get_launcher
+from utils.text_input import get_injector
+from utils.ui_driver import get_driver
+
+from .dispatcher import INPUT_ACTION_RE, OPEN_ACTION_RE, input_text
+from .guarded_executor import GuardedAgentExecutor, tools_goal
+from .llm_pool import get_cascade
+from .memory import memory_from_env
+from .tool_cache import tool_cache
 
 """open notepad.exe"""
+@tool_cache.memoize("open_notebook", ttl=3, cache_if=bool)
+@tool_cache.invalidates("check_notepad_opened")
 def open_notebook():
     """
     打开应用:打开记事本。
@@ -14,19 +22,14 @@ def open_notebook():
         bool: 是否成功打开（或已打开）记事本
     """
     try:
-        import psutil
-        processes = psutil.process_iter()
-        for process in processes:
-            process_name = process.name().lower()
-            if process_name == "notepad.exe":
-                return True
-                
-        hwnd = win32gui.GetForegroundWindow()
-        _, pid = win32process.GetWindowThreadProcessId(hwnd)
-        from pywinauto.application import Application
-        Application(backend="uia").start("notepad.exe")
+        if get_driver().find_processes("notepad.exe"):
+            return True
+
+        handle = get_launcher().launch("notepad.exe", timeout=2) # 等待窗口出现
+        if not handle.ok:
+            print(f"启动记事本失败: {handle.error}")
+            return False
         print("成功启动记事本应用程序。")
-        time.sleep(2) # 等待启动
         return True
 
     except Exception as e:
@@ -44,39 +47,24 @@ openNotebook = StructuredTool.from_function(
 def keyboard_input(
     text: str,
 ):
-    from pywinauto.application import Application
-    from pywinauto.keyboard import send_keys
+    driver = get_driver()
     print(f"输入文本: {text}")
     pid = None
     try:
-        import psutil
-        processes = psutil.process_iter()
-        for process in processes:
-            try:
-                process_name = process.name().lower()
-                if process_name == "notepad.exe":
-                    pid = process.pid
-            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                print("记事本已打开")
-                pass
+        pids = driver.find_processes("notepad.exe")
+        pid = pids[0] if pids else None
     except Exception as e:
         print(f"检查记事本状态时出现错误: {e}")
-        hwnd = win32gui.GetForegroundWindow()
-        _, pid = win32process.GetWindowThreadProcessId(hwnd)
+        pid = driver.foreground_pid()
     print(f"Foreground PID: {pid}")
     if pid is None:
         print("未检测到记事本进程")
         return False
-    try:
-        Application().connect(process=pid)
-    except Exception as e:
-        print(
-            f"Warning: Could not connect to process {pid}: {e}. Trying to send keys anyway."
-        )
 
-    send_keys(text, with_spaces=True)
-
-    return True
+    # 长文本和含特殊字符的文本通过剪贴板粘贴（见 utils/text_input.py）
+    result = get_injector().inject(text, pid=pid)
+    print(f"输入方式: {result.strategy}，{result.chars} 字符，{result.elapsed:.2f}s，校验: {result.verified}")
+    return result.ok
 
 
 keyboardInput = StructuredTool.from_function(
@@ -89,6 +77,7 @@ keyboardInput = StructuredTool.from_function(
 )
 
 """check notepad.exe is opened"""
+@tool_cache.memoize("check_notepad_opened", ttl=2)
 def check_notepad_opened():
     """
     检查记事本是否已打开
@@ -97,17 +86,10 @@ def check_notepad_opened():
         bool: 是否已打开记事本
     """
     try:
-        import psutil
-        processes = psutil.process_iter()
-        for process in processes:
-            try:
-                process_name = process.name().lower()
-                if process_name == "notepad.exe":
-                    print("记事本已打开")
-                    return True
-            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                print("记事本已打开")
-                pass
+        if get_driver().find_processes("notepad.exe"):
+            print("记事本已打开")
+            return True
+        return False
     except Exception as e:
         print(f"检查记事本状态时出现错误: {e}")
         return False
@@ -119,13 +101,32 @@ checkNotepadOpened = StructuredTool.from_function(
 )
 
 
+def notebook_facts(text: str):
+    """从 agent 输出中提取记事本状态，历史被压缩后仍能提醒模型不要重复打开。"""
+    if "记事本" in text and any(w in text for w in ("已打开", "已经打开", "成功打开", "启动")):
+        if not any(w in text for w in ("失败", "错误")):
+            return {"记事本": "已打开"}
+    return {}
+
+
+NOTEBOOK_GOAL = tools_goal(
+    [
+        (OPEN_ACTION_RE, ["openNotebook"]),
+        (r"(打开|启动|运行|开启)记事本(应用|应用程序|程序)?", ["openNotebook"]),
+        (INPUT_ACTION_RE, ["keyboardInput"], lambda m: {"text": input_text(m)}),
+        (r"检查记事本(是否)?(已)?(打开|开启)", ["checkNotepadOpened"]),
+    ]
+)
+
+
 class NotebookAgent:
-    def __init__(self):
+    def __init__(self, memory=None):
         from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 
-        self.chat_history = []
+        # 有 token 预算的对话历史（见 agent/memory.py）
+        self.chat_history = memory if memory is not None else memory_from_env(facts=notebook_facts)
 
-        llm = ChatOllama(base_url="http://localhost:11434", model="qwen3:4b")
+        llm = get_cascade("agent", label="notebook")
         prompt_chat_custom_1 = ChatPromptTemplate.from_messages(
             [
                 (
@@ -167,12 +168,14 @@ class NotebookAgent:
         agent_custom_chat_1 = create_tool_calling_agent(
             llm=llm, tools=tools, prompt=prompt_chat_custom_1
         )
-        self.agent_custom_chat_executor_1 = AgentExecutor(
+        self.agent_custom_chat_executor_1 = GuardedAgentExecutor(
             agent=agent_custom_chat_1,
             tools=tools,
             verbose=True,
             max_iterations=5,          # 限制最大迭代次数，防止死循环
-            handle_parsing_errors=True # 自动处理解析错误
+            handle_parsing_errors=True, # 自动处理解析错误
+            label="notebook",
+            goal_check=NOTEBOOK_GOAL,  # 工具已完成指令时直接结束，重复调用时提前结束
         )
 
     def execute(self, content: str):
@@ -199,6 +202,10 @@ class NotebookAgent:
                 result = self._execute_single_step(step_str)
                 # chat history
                 self.chat_history.append(AIMessage(content=result["output"]))
+                # 记事本状态写入历史摘要，较早的对话被压缩后模型仍知道记事本已打开
+                pids = get_driver().find_processes("notepad.exe")
+                if pids:
+                    self.chat_history.note("记事本", f"已打开，pid {pids[0]}")
                 results.append(result)
             return results
         except (json.JSONDecodeError, TypeError):
@@ -208,7 +215,7 @@ class NotebookAgent:
     def _execute_single_step(self, content: str):
         print(f"正在执行指令: {content}")
         result = self.agent_custom_chat_executor_1.invoke(
-            {"content": content, "chat_history": self.chat_history}
+            {"content": content, "chat_history": self.chat_history.messages()}
         )
         print(f"执行结果: {result}")
         return result
@@ -0,0 +1,199 @@
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .llm_replay import (
+    STREAM_CHUNK_CHARS,
+    Cassette,
+    CassetteMiss,
+    normalize_ollama_messages,
+    replay_delay,
+    tool_names,
+)
+
+DEFAULT_PORT = 11435
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _ollama_message(response: dict) -> dict:
+    message = {"role": "assistant", "content": response.get("content", "")}
+    if response.get("tool_calls"):
+        message["tool_calls"] = [
+            {"function": {"name": c["name"], "arguments": c["args"]}} for c in response["tool_calls"]
+        ]
+    return message
+
+
+def _final_fields(response: dict, elapsed: float) -> dict:
+    """done 消息中的统计字段：优先使用录制时 Ollama 返回的数值。"""
+    meta = response.get("response_metadata", {})
+    usage = response.get("usage_metadata", {})
+    total = int(elapsed * 1e9)
+    return {
+        "done": True,
+        "done_reason": meta.get("done_reason", "stop"),
+        "total_duration": meta.get("total_duration", total),
+        "load_duration": meta.get("load_duration", 0),
+        "prompt_eval_count": usage.get("input_tokens", 0),
+        "prompt_eval_duration": meta.get("prompt_eval_duration", 0),
+        "eval_count": usage.get("output_tokens", 0),
+        "eval_duration": meta.get("eval_duration", total),
+    }
+
+
+class OllamaStubServer:
+    """
+    模拟 Ollama HTTP 接口的本地服务，用录制文件应答 /api/chat（支持流式与非流式），
+    另外提供 /api/tags、/api/version。把 PYAUTOGUI_AGENT_OLLAMA_URL 指向它即可在没有
+    Ollama 的机器上跑完整流程（包括 ChatOllama 自身的请求/响应处理）。
+
+    Args:
+        cassette: 录制文件
+        host / port: 监听地址，port=0 表示随机端口
+        latency: 人为延迟，秒数或 "recorded"
+    """
+
+    def __init__(self, cassette: Cassette, host: str = "127.0.0.1", port: int = DEFAULT_PORT, latency=0.0):
+        self.cassette = cassette
+        self.latency = latency
+        self.requests = 0
+        self.misses = 0
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # 支持 keep-alive，与真实 Ollama 一致
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status: int, payload: dict):
+                body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if self.path == "/api/version":
+                    self._send_json(200, {"version": "0.0.0-stub"})
+                elif self.path == "/api/tags":
+                    models = [{"name": m, "model": m} for m in server.cassette.models()]
+                    self._send_json(200, {"models": models})
+                else:
+                    self._send_json(404, {"error": "not found"})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                request = json.loads(self.rfile.read(length) or b"{}")
+                if self.path != "/api/chat":
+                    self._send_json(404, {"error": "not found"})
+                    return
+                server.requests += 1
+                model = request.get("model", "")
+                try:
+                    response = server.cassette.lookup(
+                        model,
+                        normalize_ollama_messages(request.get("messages", [])),
+                        tool_names(request.get("tools")),
+                    )
+                except CassetteMiss as e:
+                    server.misses += 1
+                    self._send_json(404, {"error": str(e)})
+                    return
+                if request.get("stream", True):
+                    self._stream(model, response)
+                else:
+                    start = time.perf_counter()
+                    delay = replay_delay(response, server.latency)
+                    if delay > 0:
+                        time.sleep(delay)
+                    payload = {"model": model, "created_at": _now(), "message": _ollama_message(response)}
+                    payload.update(_final_fields(response, time.perf_counter() - start))
+                    self._send_json(200, payload)
+
+            def _stream(self, model: str, response: dict):
+                """按 Ollama 的 NDJSON 流式格式逐块返回，最后一条携带工具调用和统计信息。"""
+                start = time.perf_counter()
+                content = response.get("content", "")
+                pieces = [content[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(content), STREAM_CHUNK_CHARS)]
+                delay = replay_delay(response, server.latency) / (len(pieces) + 1)
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+
+                def write(payload: dict):
+                    line = (json.dumps(payload, ensure_ascii=False) + "\n").encode("utf-8")
+                    self.wfile.write(f"{len(line):x}\r\n".encode("ascii") + line + b"\r\n")
+                    self.wfile.flush()
+
+                for piece in pieces:
+                    if delay > 0:
+                        time.sleep(delay)
+                    write({
+                        "model": model,
+                        "created_at": _now(),
+                        "message": {"role": "assistant", "content": piece},
+                        "done": False,
+                    })
+                if delay > 0:
+                    time.sleep(delay)
+                final = _ollama_message(response)
+                final["content"] = ""
+                payload = {"model": model, "created_at": _now(), "message": final}
+                payload.update(_final_fields(response, time.perf_counter() - start))
+                write(payload)
+                self.wfile.write(b"0\r\n\r\n")
+
+        return Handler
+
+    def start(self) -> "OllamaStubServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    arg_parser = argparse.ArgumentParser(description="用录制文件模拟 Ollama /api/chat 接口")
+    arg_parser.add_argument("cassette", help="录制文件（JSONL）")
+    arg_parser.add_argument("--host", default="127.0.0.1")
+    arg_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    arg_parser.add_argument("--latency", default="0", help='人为延迟（秒）或 "recorded"')
+    args = arg_parser.parse_args()
+
+    latency = args.latency if args.latency == "recorded" else float(args.latency)
+    stub = OllamaStubServer(Cassette(args.cassette), args.host, args.port, latency)
+    print(f"Ollama 模拟服务已启动: {stub.url}（{stub.cassette.records} 条录制记录）")
+    print(f"使用方法: PYAUTOGUI_AGENT_OLLAMA_URL={stub.url} python main.py")
+    try:
+        stub._httpd.serve_forever()
+    except KeyboardInterrupt:
+        stub.stop()
@@ -0,0 +1,164 @@
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+# 解析线程结束时放入队列的哨兵
+_DONE = object()
+
+
+class PipelinedRunner:
+    """解析/执行两阶段流水线。
+
+    解析线程提前解析后续指令并放入有界队列，主线程按顺序取出并执行当前指令的步骤，
+    这样解析器的 LLM 延迟可以隐藏在 UI 执行时间之后。UI 操作仍然只在调用 `run` 的线程中执行。
+
+    Args:
+        parse_fn: 解析函数，输入指令字符串，返回步骤列表
+        execute_fn: 执行函数，输入 (指令, 步骤列表)，返回执行结果
+        queue_size: 解析结果队列容量，即最多领先执行阶段几条指令
+        parse_workers: 并发解析的线程数（解析阶段不涉及 UI，可以并发），结果仍按输入顺序执行
+    """
+
+    def __init__(
+        self,
+        parse_fn: Callable[[str], Any],
+        execute_fn: Callable[[str, Any], Any],
+        queue_size: int = 2,
+        parse_workers: int = 1,
+    ):
+        if queue_size < 1:
+            raise ValueError("queue_size 必须大于 0")
+        if parse_workers < 1:
+            raise ValueError("parse_workers 必须大于 0")
+        self.parse_fn = parse_fn
+        self.execute_fn = execute_fn
+        self.queue_size = queue_size
+        self.parse_workers = parse_workers
+
+    def _parse_one(self, index: int, command: str) -> Dict[str, Any]:
+        start = time.perf_counter()
+        steps, error = None, None
+        try:
+            steps = self.parse_fn(command)
+        except Exception as e:
+            error = str(e)
+        return {
+            "index": index,
+            "command": command,
+            "steps": steps,
+            "parse_error": error,
+            "parse_time": time.perf_counter() - start,
+            "parse_started": start,
+        }
+
+    def _parse_worker(self, commands: List[str], out: queue.Queue, stop: threading.Event):
+        # 按输入顺序把 future 放入有界队列，队列容量同时限制了同时在解析的指令数
+        pool = ThreadPoolExecutor(max_workers=self.parse_workers, thread_name_prefix="plan-parser")
+        try:
+            for index, command in enumerate(commands):
+                if stop.is_set():
+                    break
+                self._put(out, pool.submit(self._parse_one, index, command), stop)
+            self._put(out, _DONE, stop)
+        finally:
+            # 正常结束时已提交的解析仍需完成；执行阶段提前退出时取消尚未开始的解析
+            pool.shutdown(wait=False, cancel_futures=stop.is_set())
+
+    @staticmethod
+    def _put(out: queue.Queue, item, stop: threading.Event):
+        # 队列满时阻塞，但仍定期检查 stop，避免执行阶段退出后解析线程卡住
+        while not stop.is_set():
+            try:
+                out.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def run(
+        self,
+        commands: Iterable[str],
+        on_result: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ) -> Dict[str, Any]:
+        """
+        以流水线方式处理全部指令。
+
+        Args:
+            commands: 指令列表
+            on_result: 每条指令执行完成后的回调，参数为该指令的结果字典
+
+        Returns:
+            {"results": [每条指令的结果], "timing": 各阶段耗时汇总}
+        """
+        commands = list(commands)
+        out = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+        worker = threading.Thread(
+            target=self._parse_worker, args=(commands, out, stop), name="plan-parser", daemon=True
+        )
+
+        results = []
+        wall_start = time.perf_counter()
+        worker.start()
+        try:
+            while True:
+                wait_start = time.perf_counter()
+                future = out.get()
+                if future is _DONE:
+                    break
+                item = future.result()
+                # 执行阶段等待解析结果的时间：流水线理想情况下应接近 0
+                item["queue_wait"] = time.perf_counter() - wait_start
+
+                exec_start = time.perf_counter()
+                item["outcome"], item["execute_error"] = None, None
+                try:
+                    item["outcome"] = self.execute_fn(item["command"], item["steps"])
+                except Exception as e:
+                    item["execute_error"] = str(e)
+                item["execute_time"] = time.perf_counter() - exec_start
+                item["finished"] = time.perf_counter()
+                results.append(item)
+                if on_result is not None:
+                    on_result(item)
+        finally:
+            stop.set()
+            worker.join(timeout=1)
+
+        wall_time = time.perf_counter() - wall_start
+        parse_total = sum(r["parse_time"] for r in results)
+        execute_total = sum(r["execute_time"] for r in results)
+        wait_total = sum(r["queue_wait"] for r in results)
+        timing = {
+            "commands": len(results),
+            "wall_time": wall_time,
+            "parse_total": parse_total,
+            "execute_total": execute_total,
+            "queue_wait_total": wait_total,
+            # 与串行执行相比被流水线隐藏掉的解析时间
+            "overlap_saved": max(0.0, parse_total + execute_total - wall_time),
+        }
+        return {"results": results, "timing": timing}
+
+
+def format_timing(timing: Dict[str, Any]) -> str:
+    return (
+        f"共 {timing['commands']} 条指令，总耗时 {timing['wall_time']:.2f}s | "
+        f"解析 {timing['parse_total']:.2f}s，执行 {timing['execute_total']:.2f}s，"
+        f"等待解析 {timing['queue_wait_total']:.2f}s，流水线节省 {timing['overlap_saved']:.2f}s"
+    )
+
+
+if __name__ == "__main__":
+    # 模拟：解析 0.3s/条，执行 0.5s/条
+    def fake_parse(command):
+        time.sleep(0.3)
+        return [{"step": 1, "action": command}]
+
+    def fake_execute(command, steps):
+        time.sleep(0.5)
+        return True
+
+    report = PipelinedRunner(fake_parse, fake_execute).run([f"指令{i}" for i in range(5)])
+    print(format_timing(report["timing"]))
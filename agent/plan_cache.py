@@ -0,0 +1,202 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".pyautogui-agent", "plan_cache.sqlite3")
+
+# 归一化时去掉的语气前缀
+_POLITE_PREFIXES = ("请帮我", "帮我", "请你", "麻烦", "请")
+
+
+def normalize_instruction(instruction: str) -> str:
+    """
+    归一化指令文本：合并空白、去掉“请/帮我”等前缀。
+
+    不转换大小写和全半角、不去掉标点：这些可能属于要输入的文字，
+    “输入ABC”与“输入abc”、“输入Hello World!”与“输入hello world”必须得到不同的缓存键。
+    """
+    text = re.sub(r"\s+", " ", instruction or "").strip()
+    for prefix in _POLITE_PREFIXES:
+        if text.startswith(prefix):
+            text = text[len(prefix):].lstrip()
+            break
+    return text
+
+
+def plan_fingerprint(prompt_template: str, model: str) -> str:
+    """根据提示词模板（含应用映射规则）和模型名计算指纹，任一变化都会使旧缓存失效。"""
+    digest = hashlib.sha256()
+    digest.update(model.encode("utf-8"))
+    digest.update(b"\x00")
+    digest.update(prompt_template.encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+class PlanCache:
+    """
+    解析计划缓存：内存 LRU 作为前端，SQLite 作为持久化后端。
+
+    缓存键由归一化后的指令和指纹（提示词模板 + 模型名）组成；打开缓存时会删除指纹不一致
+    或已过期的条目，因此修改提示词或应用映射规则后旧计划会自动失效。
+
+    Args:
+        fingerprint: `plan_fingerprint` 的结果
+        path: SQLite 文件路径，None 表示只使用内存缓存
+        memory_entries: 内存 LRU 容量
+        max_entries: 磁盘中最多保留的条目数，超出时按最近访问时间淘汰
+        ttl: 条目有效期（秒），None 表示不过期
+    """
+
+    def __init__(
+        self,
+        fingerprint: str,
+        path: Optional[str] = DEFAULT_CACHE_PATH,
+        memory_entries: int = 256,
+        max_entries: int = 5000,
+        ttl: Optional[float] = 7 * 24 * 3600,
+    ):
+        self.fingerprint = fingerprint
+        self.path = path
+        self.memory_entries = memory_entries
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+        self._memory = OrderedDict()  # key -> (plan, created_at)
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._db = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                """CREATE TABLE IF NOT EXISTS plans (
+                    key TEXT PRIMARY KEY,
+                    fingerprint TEXT NOT NULL,
+                    instruction TEXT NOT NULL,
+                    plan TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )"""
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS plans_last_access ON plans(last_access)")
+            # 提示词或模型变化后，旧指纹的条目全部失效
+            cur = self._db.execute("DELETE FROM plans WHERE fingerprint != ?", (fingerprint,))
+            self.evictions += cur.rowcount
+            self._purge_expired()
+            self._db.commit()
+
+    def _key(self, instruction: str) -> str:
+        text = f"{self.fingerprint}\x00{normalize_instruction(instruction)}"
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _expired(self, created_at: float) -> bool:
+        return self.ttl is not None and time.time() - created_at > self.ttl
+
+    def _purge_expired(self):
+        if self.ttl is not None:
+            cur = self._db.execute("DELETE FROM plans WHERE created_at < ?", (time.time() - self.ttl,))
+            self.evictions += cur.rowcount
+
+    def _remember(self, key: str, plan: Any, created_at: float):
+        self._memory[key] = (plan, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, instruction: str):
+        """返回缓存的计划（每次返回副本），未命中时返回 None。"""
+        key = self._key(instruction)
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                plan, created_at = entry
+                if not self._expired(created_at):
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return json.loads(json.dumps(plan))
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT plan, created_at FROM plans WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    plan, created_at = json.loads(row[0]), row[1]
+                    if not self._expired(created_at):
+                        self._db.execute(
+                            "UPDATE plans SET last_access = ? WHERE key = ?", (time.time(), key)
+                        )
+                        self._db.commit()
+                        self._remember(key, plan, created_at)
+                        self.disk_hits += 1
+                        return json.loads(row[0])
+                    self._db.execute("DELETE FROM plans WHERE key = ?", (key,))
+                    self._db.commit()
+                    self.evictions += 1
+
+            self.misses += 1
+            return None
+
+    def put(self, instruction: str, plan: Any):
+        key = self._key(instruction)
+        now = time.time()
+        with self._lock:
+            self._remember(key, json.loads(json.dumps(plan)), now)
+            if self._db is None:
+                return
+            self._db.execute(
+                "INSERT OR REPLACE INTO plans VALUES (?, ?, ?, ?, ?, ?)",
+                (key, self.fingerprint, instruction, json.dumps(plan, ensure_ascii=False), now, now),
+            )
+            # 超出容量时按最近访问时间淘汰
+            cur = self._db.execute(
+                """DELETE FROM plans WHERE key IN (
+                    SELECT key FROM plans ORDER BY last_access DESC LIMIT -1 OFFSET ?
+                )""",
+                (self.max_entries,),
+            )
+            self.evictions += cur.rowcount
+            self._db.commit()
+
+    def entries(self):
+        """返回当前指纹下全部未过期的 (原始指令, 计划)，用于预热其他缓存。"""
+        with self._lock:
+            if self._db is None:
+                return []
+            rows = self._db.execute("SELECT instruction, plan, created_at FROM plans").fetchall()
+        return [(row[0], json.loads(row[1])) for row in rows if not self._expired(row[2])]
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM plans")
+                self._db.commit()
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def stats(self):
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        hits = self.memory_hits + self.disk_hits
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "memory_entries": len(self._memory),
+        }
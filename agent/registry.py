@@ -0,0 +1,185 @@
+import importlib
+import threading
+from pathlib import Path
+
+
+# 常见别名映射（agent_type -> 模块前缀）
+DEFAULT_ALIASES = {
+    "notebook": "notebook",
+    "calendar": "calendar",
+    "winauto": "winauto",
+    "win_auto": "winauto",
+    "default": "winauto",
+}
+
+# chat_history 的回收策略
+HISTORY_KEEP = "keep"  # 跨指令保留对话历史
+HISTORY_PER_COMMAND = "per_command"  # 每条新指令开始时清空对话历史
+
+
+def _append_history(instance, message):
+    history = getattr(instance, "chat_history", None)
+    if history is not None:
+        history.append(message)
+
+
+class AgentRegistry:
+    """常驻的 agent 注册表。
+
+    - 启动时扫描一次 `agent/` 目录中所有以 `_agent.py` 结尾的文件，建立名称/别名索引；
+    - 已构造的 agent 实例在多个步骤、多条指令之间复用，避免重复创建 LLM、提示词和 AgentExecutor；
+    - 通过 `history_policy` 控制实例 `chat_history` 的清理时机，`evict`/`clear` 可显式回收实例；
+    - `stats()` 返回实例缓存的命中/未命中计数。
+    """
+
+    def __init__(self, agent_dir=None, aliases=None, history_policy: str = HISTORY_PER_COMMAND):
+        if history_policy not in (HISTORY_KEEP, HISTORY_PER_COMMAND):
+            raise ValueError(f"未知的 history_policy: {history_policy}")
+
+        self.agent_dir = Path(agent_dir) if agent_dir else Path(__file__).parent
+        self.history_policy = history_policy
+
+        files = [p for p in self.agent_dir.glob("*_agent.py") if p.is_file()]
+        self.candidates = sorted(f.name[: -len("_agent.py")] for f in files)
+        self.aliases = {
+            k: v for k, v in (aliases or DEFAULT_ALIASES).items() if v in self.candidates
+        }
+
+        self._resolved = {}  # normalized agent_type -> 模块前缀（或 None）
+        self._instances = {}  # 模块前缀 -> agent 实例
+        self._pending = {}  # 模块前缀 -> 实例构造前待写入 chat_history 的消息
+        self._lock = threading.RLock()  # 并发执行步骤时，保证每种 agent 只构造一次
+        self.hits = 0
+        self.misses = 0
+
+    def resolve(self, agent_type: str):
+        """将 agent_type 解析为模块前缀，结果会被缓存。找不到时返回 None。"""
+        normalized = (agent_type or "").lower().strip()
+        if normalized in self._resolved:
+            return self._resolved[normalized]
+
+        # 1) 精确匹配
+        mod_key = normalized if normalized in self.candidates else None
+
+        # 2) 别名映射
+        if mod_key is None:
+            mod_key = self.aliases.get(normalized)
+
+        # 3) 包含/前缀匹配（更宽松的匹配规则）
+        if mod_key is None and normalized:
+            for c in self.candidates:
+                if c.startswith(normalized) or normalized in c or c in normalized:
+                    mod_key = c
+                    break
+
+        self._resolved[normalized] = mod_key
+        return mod_key
+
+    def get(self, agent_type: str, default_agent=None):
+        """返回 agent_type 对应的常驻实例，首次使用时才构造。失败时返回 default_agent。"""
+        if not agent_type:
+            return default_agent
+
+        mod_key = self.resolve(agent_type)
+        if mod_key is None:
+            print(f"未找到匹配的 agent (type={agent_type})，回退到 WinAutoAgent。候选: {self.candidates}")
+            return default_agent
+
+        with self._lock:
+            return self._get_or_create(mod_key, default_agent)
+
+    def _get_or_create(self, mod_key: str, default_agent):
+        instance = self._instances.get(mod_key)
+        if instance is not None:
+            self.hits += 1
+            return instance
+
+        self.misses += 1
+        module_name = f"agent.{mod_key}_agent"
+        try:
+            module = importlib.import_module(module_name)
+            # 将 snake_case 转为 PascalCase 作为类名
+            class_name = "".join(part.capitalize() for part in mod_key.split("_")) + "Agent"
+            AgentClass = getattr(module, class_name, None)
+            if AgentClass is None:
+                print(f"模块 '{module_name}' 中未找到类 '{class_name}'，回退到 WinAutoAgent。")
+                return default_agent
+            instance = AgentClass()
+        except Exception as e:
+            print(f"加载 agent '{module_name}' 失败: {e}. 回退到 WinAutoAgent。")
+            return default_agent
+
+        self._instances[mod_key] = instance
+        for message in self._pending.pop(mod_key, []):
+            _append_history(instance, message)
+        return instance
+
+    def register(self, agent_type: str, instance):
+        """将已构造好的实例登记为 agent_type 对应的常驻实例（例如复用 main 中的默认 agent）。"""
+        mod_key = self.resolve(agent_type) or agent_type
+        self._instances[mod_key] = instance
+
+    def remember(self, agent_type: str, message):
+        """
+        把不经过 agent 完成的操作（如 StepDispatcher 直接调用工具）写入 agent_type 对应实例的对话历史，
+        后续交给该 agent 的步骤能知道记事本已打开、已输入了什么。实例尚未构造时暂存，构造后写入；
+        没有 chat_history 的 agent（如 WinAutoAgent）忽略。
+        """
+        mod_key = self.resolve(agent_type)
+        if mod_key is None:
+            return
+        with self._lock:
+            instance = self._instances.get(mod_key)
+            if instance is None:
+                self._pending.setdefault(mod_key, []).append(message)
+            else:
+                _append_history(instance, message)
+
+    def begin_command(self):
+        """在处理一条新指令前调用，按 history_policy 清理各实例的对话历史。"""
+        if self.history_policy == HISTORY_PER_COMMAND:
+            self.reset_history()
+
+    def reset_history(self, agent_type: str = None):
+        """清空指定（或全部）常驻实例的 chat_history（列表或 TokenBudgetMemory），实例本身保留。"""
+        if agent_type is None:
+            self._pending.clear()
+            instances = list(self._instances.values())
+        else:
+            self._pending.pop(self.resolve(agent_type), None)
+            instance = self._instances.get(self.resolve(agent_type))
+            instances = [instance] if instance is not None else []
+        for instance in instances:
+            history = getattr(instance, "chat_history", None)
+            if history is not None:
+                history.clear()
+
+    def evict(self, agent_type: str):
+        """回收指定 agent 实例，下次使用时重新构造。返回是否确有实例被回收。"""
+        return self._instances.pop(self.resolve(agent_type), None) is not None
+
+    def clear(self):
+        """回收全部实例并重置计数。"""
+        self._instances.clear()
+        self._pending.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "loaded": sorted(self._instances),
+            "memory": self.memory_stats(),
+        }
+
+    def memory_stats(self):
+        """各实例对话历史的 token 统计（只统计使用 TokenBudgetMemory 的实例）。"""
+        result = {}
+        for name, instance in sorted(self._instances.items()):
+            history = getattr(instance, "chat_history", None)
+            if hasattr(history, "stats"):
+                result[name] = history.stats()
+        return result
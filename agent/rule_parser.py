@@ -0,0 +1,198 @@
+import re
+import unicodedata
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+from .app_mapping import agent_type_for_app, keyword_table
+
+# 子句分隔：标点以及“并/再/然后”等连接词
+CLAUSE_SPLIT_RE = re.compile(r"[，,；;。]|并且|然后|接着|之后|并|再")
+POLITE_PREFIX_RE = re.compile(r"^(请帮我|帮我|请你|麻烦|请|先|我要|我想)")
+OPEN_RE = re.compile(r"^(打开|启动|运行|开启|open|start)\s*", re.IGNORECASE)
+INPUT_RE = re.compile(
+    r"^(输入|键入|写入|录入|type)\s*(文字|文本|内容)?\s*[:：]?\s*(?P<text>.+)$", re.IGNORECASE
+)
+# 应用名之后允许出现的修饰词
+APP_SUFFIX_RE = re.compile(r"^(应用程序|应用|程序|软件|工具|窗口|管理)")
+
+# 指令末尾的句号属于最后一句要输入的文字，不作为子句分隔符
+TRAILING_STOP = "。"
+
+# 按关键词长度给出的置信度：短关键词（如“计算”“笔记”）更容易误匹配
+SHORT_KEYWORD_CONFIDENCE = 0.9
+
+
+def fold(text: str) -> Tuple[str, List[int]]:
+    """
+    逐字符做 NFKC 归一化并转小写，只用于关键词匹配。
+    返回 (折叠后的文本, 折叠文本每个位置对应的原文位置)，末尾附加 len(text)，用于从原文中取出要输入的文字。
+    """
+    chars, offsets = [], []
+    for i, ch in enumerate(text):
+        folded = unicodedata.normalize("NFKC", ch).lower()
+        chars.append(folded)
+        offsets.extend([i] * len(folded))
+    offsets.append(len(text))
+    return "".join(chars), offsets
+
+
+class AhoCorasick:
+    """多模式串匹配自动机，用于在指令中一次性找出所有应用关键词。"""
+
+    def __init__(self, patterns: Dict[str, str]):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output: List[List[str]] = [[]]
+        for pattern in patterns:
+            node = 0
+            for ch in pattern:
+                if ch not in self.goto[node]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                    self.goto[node][ch] = len(self.goto) - 1
+                node = self.goto[node][ch]
+            self.output[node].append(pattern)
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self.goto[node].items():
+                queue.append(child)
+                f = self.fail[node]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                target = self.goto[f].get(ch, 0)
+                self.fail[child] = target if target != child else 0
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+
+    def find_all(self, text: str) -> List[Tuple[int, str]]:
+        """返回 [(起始位置, 关键词), ...]。"""
+        matches = []
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(ch, 0)
+            for pattern in self.output[node]:
+                matches.append((i - len(pattern) + 1, pattern))
+        return matches
+
+
+class RuleParser:
+    """
+    基于应用映射表的本地规则解析器，覆盖“打开 X（并）输入 Y”这类常见指令。
+
+    只有当指令的每个子句都能被规则完整解释时才返回计划，否则返回 None，
+    由调用方回退到 LLM 解析。日历类指令需要抽取时间地点等字段，始终交给 LLM。
+    """
+
+    def __init__(self):
+        self.keywords = keyword_table()
+        self.matcher = AhoCorasick(self.keywords)
+
+    def _app_prefix(self, text: str) -> Optional[str]:
+        """返回 text 开头处匹配到的最长应用关键词。"""
+        best = None
+        for pos, kw in self.matcher.find_all(text.lower()):
+            if pos == 0 and (best is None or len(kw) > len(best)):
+                best = kw
+        return best
+
+    def parse(self, instruction: str) -> Tuple[Optional[List[dict]], float]:
+        """
+        解析指令。
+
+        Returns:
+            (步骤列表, 置信度)。无法完整覆盖时返回 (None, 0.0)
+        """
+        # 关键词匹配使用折叠后的文本（全角转半角、小写），要输入的文字从原文中截取，保持原样
+        text = (instruction or "").strip()
+        if not text:
+            return None, 0.0
+        tail = ""
+        if text.endswith(TRAILING_STOP):
+            text, tail = text[: -len(TRAILING_STOP)], TRAILING_STOP
+
+        # 日历相关指令交给 LLM
+        lowered = fold(text)[0]
+        for _, kw in self.matcher.find_all(lowered):
+            if self.keywords[kw] == "calendar":
+                return None, 0.0
+        if "日历" in lowered or "日程" in lowered or ".ics" in lowered:
+            return None, 0.0
+
+        steps: List[dict] = []
+        confidence = 1.0
+        current_app = None
+        for raw in CLAUSE_SPLIT_RE.split(text):
+            raw = raw.rstrip()
+            folded, offsets = fold(raw)
+            # 以下处理只去掉 clause 的前缀，start 记录 clause 在 folded 中的起始位置
+            clause = POLITE_PREFIX_RE.sub("", folded.lstrip()).lstrip()
+            start = len(folded) - len(clause)
+            if not clause:
+                continue
+
+            m = OPEN_RE.match(clause)
+            if m:
+                rest = clause[m.end():]
+                start += m.end()
+                kw = self._app_prefix(rest)
+                if kw is None:
+                    return None, 0.0
+                app = self.keywords[kw]
+                if len(kw) <= 2:
+                    confidence *= SHORT_KEYWORD_CONFIDENCE
+                steps.append(
+                    {
+                        "step": len(steps) + 1,
+                        "action": "打开应用",
+                        "app": app,
+                        "agent_type": agent_type_for_app(app),
+                        "depends_on": [],
+                    }
+                )
+                current_app = (app, len(steps))
+                clause = APP_SUFFIX_RE.sub("", rest[len(kw):].lstrip()).lstrip()
+                start += len(rest) - len(clause)
+                if not clause:
+                    continue
+
+            m = INPUT_RE.match(clause)
+            if m and current_app is not None:
+                app, open_step = current_app
+                typed = raw[offsets[start + m.start("text")]:].strip()
+                steps.append(
+                    {
+                        "step": len(steps) + 1,
+                        "action": f"输入文本{typed}",
+                        "app": app,
+                        "agent_type": agent_type_for_app(app),
+                        "depends_on": [open_step],
+                    }
+                )
+                continue
+
+            # 无法解释的子句：置信度不足，交给 LLM
+            return None, 0.0
+
+        if not steps:
+            return None, 0.0
+        if tail and steps[-1]["action"].startswith("输入文本"):
+            steps[-1]["action"] += tail
+        return steps, confidence
+
+
+if __name__ == "__main__":
+    parser = RuleParser()
+    for instruction in [
+        "帮我打开记事本并输入文字123",
+        "打开记事本输入Hello World",
+        "打开记事本输入ＡＢＣ１２３",
+        "打开记事本输入今天天气很好。",
+        "启动硬盘管理，再打开计算器",
+        "打开记事本写一段日记",
+        "创建下周五公司团建活动，下午2点到5点，在市中心公园举行，导出为 meeting.ics并打开",
+    ]:
+        print(instruction, "->", parser.parse(instruction))
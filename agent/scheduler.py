@@ -0,0 +1,297 @@
+import contextvars
+import queue
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# 前台窗口的占用方式：非日历步骤默认独占前台窗口（输入、快捷键以及 agent 自行理解的自然语言动作都可能发送按键）；
+# 只有单纯的打开/启动动作可以彼此共享，但不能与其他动作并行
+LAUNCH_ACTION_RE = re.compile(r"^(打开|启动|运行|开启|open|start|launch)\s*(应用程序|应用|程序|软件)?\s*[\w.\-]*$", re.I)
+FOREGROUND_EXCLUSIVE_KEYWORDS = ("输入", "键入", "写", "粘贴", "快捷键", "按键", "按下", "点击", "hotkey", "type")
+# 动作中出现连接词说明包含多个操作，不是单纯的打开动作
+COMPOUND_ACTION_RE = re.compile(r"[，,；;。]|并且|然后|接着|之后|并|再|\band\b|\bthen\b", re.I)
+# 日历步骤只读写 .ics 文件，不占用前台窗口；导入/打开 .ics 会拉起日历应用，与打开类动作相同
+CALENDAR_FOREGROUND_KEYWORDS = ("打开", "导入", "open", "import")
+
+# 持有对话历史（有状态）的 agent，同一实例上的步骤需要串行
+STATEFUL_AGENTS = ("notebook", "calendar")
+
+SHARED = "shared"
+EXCLUSIVE = "exclusive"
+
+
+def step_resources(step: Dict[str, Any], stateful_agents=STATEFUL_AGENTS) -> Dict[str, str]:
+    """
+    计算步骤占用的资源及占用方式。
+
+    计划中可以通过可选的 `resources` 字段显式声明（列表，均视为独占）；
+    未声明时根据 app、agent_type 和动作关键字推断：
+    - 同一应用 `app:<exe>` 独占；
+    - 有状态 agent `agent:<type>` 独占；
+    - 前台窗口 `foreground`：非日历步骤默认独占，只有单纯的打开/启动动作共享（见 `is_launch_action`）。
+
+    Returns:
+        {资源名: "shared" | "exclusive"}
+    """
+    if step.get("resources"):
+        return {str(r): EXCLUSIVE for r in step["resources"]}
+
+    resources = {}
+    app = (step.get("app") or "").lower().strip()
+    agent_type = (step.get("agent_type") or "default").lower().strip()
+    resources[f"app:{app}" if app else f"agent:{agent_type}"] = EXCLUSIVE
+    if agent_type in stateful_agents:
+        resources[f"agent:{agent_type}"] = EXCLUSIVE
+
+    action = str(step.get("action") or "").strip().lower()
+    if agent_type == "calendar":
+        if any(k in action for k in CALENDAR_FOREGROUND_KEYWORDS):
+            resources["foreground"] = SHARED
+    else:
+        resources["foreground"] = SHARED if is_launch_action(action) else EXCLUSIVE
+    return resources
+
+
+def is_launch_action(action: str) -> bool:
+    """只打开/启动一个应用、不包含其他操作的动作，如“打开应用”“启动计算器”。"""
+    return (
+        bool(LAUNCH_ACTION_RE.match(action))
+        and not COMPOUND_ACTION_RE.search(action)
+        and not any(k in action for k in FOREGROUND_EXCLUSIVE_KEYWORDS)
+    )
+
+
+def _conflicts(a: Dict[str, str], b: Dict[str, str]) -> bool:
+    for name, mode in a.items():
+        other = b.get(name)
+        if other is not None and EXCLUSIVE in (mode, other):
+            return True
+    return False
+
+
+def _step_dependencies(
+    i: int, steps: List[Dict[str, Any]], resources: List[Dict[str, str]], index_by_step: Dict
+) -> Tuple[List[int], List[int]]:
+    """
+    计算第 i 个步骤依赖的前置步骤下标，只会依赖前面的步骤，因此可以在步骤逐个到达时增量计算。
+
+    Returns:
+        (全部依赖, 硬依赖)。硬依赖为显式 depends_on 以及操作同一应用的步骤，它们失败时本步骤跳过；
+        其余依赖只因资源冲突而存在，只决定执行顺序
+    """
+    step = steps[i]
+    parents, hard = set(), set()
+    for ref in step.get("depends_on") or []:
+        j = index_by_step.get(ref)
+        if j is None or j >= i:
+            # 只允许依赖前面的步骤，避免出现环
+            print(f"忽略无效的依赖: 步骤 {step.get('step', i + 1)} -> {ref}")
+            continue
+        parents.add(j)
+        hard.add(j)
+    app = (step.get("app") or "").lower().strip()
+    for j in range(i):
+        if _conflicts(resources[j], resources[i]):
+            parents.add(j)
+            if app and (steps[j].get("app") or "").lower().strip() == app:
+                hard.add(j)
+    return sorted(parents), sorted(hard)
+
+
+def build_step_graph(steps: List[Dict[str, Any]]) -> List[List[int]]:
+    """
+    构建步骤依赖图，返回每个步骤（按列表下标）所依赖的前置步骤下标。
+
+    依赖来源：
+    1. 计划中的可选字段 `depends_on`（步骤编号 step 的列表）；
+    2. 资源冲突：占用同一资源且至少一方独占的两个步骤，按计划顺序串行。
+    """
+    index_by_step = {}
+    resources = []
+    deps = []
+    for i, step in enumerate(steps):
+        index_by_step.setdefault(step.get("step", i + 1), i)
+        resources.append(step_resources(step))
+        deps.append(_step_dependencies(i, steps, resources, index_by_step)[0])
+    return deps
+
+
+def critical_path(deps: List[List[int]], durations: List[float]):
+    """根据实际耗时计算关键路径，返回 (路径上的步骤下标列表, 路径总耗时)。"""
+    if not durations:
+        return [], 0.0
+    finish = [0.0] * len(durations)
+    prev: List[Optional[int]] = [None] * len(durations)
+    # 依赖只指向前面的步骤，因此列表顺序即拓扑序
+    for i, parents in enumerate(deps):
+        start = 0.0
+        for j in parents:
+            if finish[j] > start:
+                start, prev[i] = finish[j], j
+        finish[i] = start + durations[i]
+    end = max(range(len(finish)), key=lambda i: finish[i])
+    path = []
+    node = end
+    while node is not None:
+        path.append(node)
+        node = prev[node]
+    return path[::-1], finish[end]
+
+
+class StepScheduler:
+    """
+    基于依赖图的步骤调度器：互不依赖的步骤并发执行，冲突的步骤按计划顺序串行，
+    执行完成后报告关键路径。某一步骤失败时，显式依赖它或操作同一应用的步骤会被跳过；
+    只因占用同一资源（前台窗口、agent）而排在它之后的步骤照常执行。
+    步骤可以来自流式解析，边生成边调度。
+
+    Args:
+        execute_fn: 执行单个步骤的函数，返回 False、{"success": False, ...} 或抛出异常时视为失败
+        max_workers: 最大并发数，设为 1 时退化为按计划顺序串行执行
+    """
+
+    def __init__(self, execute_fn: Callable[[Dict[str, Any]], Any], max_workers: int = 4):
+        self.execute_fn = execute_fn
+        self.max_workers = max(1, max_workers)
+
+    def _run_step(self, step):
+        start = time.perf_counter()
+        result, error = None, None
+        try:
+            result = self.execute_fn(step)
+            ok = result is not False and not (
+                isinstance(result, dict) and result.get("success") is False
+            )
+        except Exception as e:
+            ok, error = False, str(e)
+        return ok, result, error, start, time.perf_counter()
+
+    def run(self, steps: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        执行步骤。steps 可以是列表，也可以是逐个产出步骤的迭代器（例如流式解析结果），
+        迭代器产出的步骤只要依赖已满足就会立即开始执行，不必等待整个计划生成完毕。
+        """
+        source = steps if steps is not None else []
+        events = queue.Queue()
+
+        def produce():
+            try:
+                for step in source:
+                    events.put(("step", step))
+            except Exception as e:
+                events.put(("error", str(e)))
+            finally:
+                events.put(("end", None))
+
+        steps: List[Dict[str, Any]] = []
+        deps: List[List[int]] = []
+        hard_deps: List[List[int]] = []
+        resources: List[Dict[str, str]] = []
+        index_by_step = {}
+        status: List[str] = []
+        errors: List[Optional[str]] = []
+        results: List[Any] = []
+        times: List[tuple] = []
+        stream_error = None
+
+        wall_start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="step") as pool:
+            producer = threading.Thread(target=produce, name="step-producer", daemon=True)
+            producer.start()
+            producing, running = True, 0
+            while producing or running:
+                kind, payload = events.get()
+                if kind == "step":
+                    i = len(steps)
+                    steps.append(payload)
+                    index_by_step.setdefault(payload.get("step", i + 1), i)
+                    resources.append(step_resources(payload))
+                    parents, hard = _step_dependencies(i, steps, resources, index_by_step)
+                    deps.append(parents)
+                    hard_deps.append(hard)
+                    status.append("pending")
+                    errors.append(None)
+                    results.append(None)
+                    times.append((0.0, 0.0))
+                elif kind == "done":
+                    i, (ok, results[i], errors[i], start, end) = payload
+                    status[i] = "done" if ok else "failed"
+                    times[i] = (start - wall_start, end - wall_start)
+                    running -= 1
+                elif kind == "error":
+                    stream_error = payload
+                    print(f"步骤流读取出错: {payload}")
+                else:
+                    producing = False
+
+                for i in range(len(steps)):
+                    if status[i] != "pending":
+                        continue
+                    if any(status[j] in ("failed", "skipped") for j in hard_deps[i]):
+                        status[i] = "skipped"
+                        print(f">> 前置步骤未成功，跳过步骤 {steps[i].get('step', i + 1)}。")
+                    elif (
+                        all(status[j] in ("done", "failed", "skipped") for j in deps[i])
+                        and running < self.max_workers
+                    ):
+                        status[i] = "running"
+                        running += 1
+                        # 每个步骤在调用方上下文的副本中运行，contextvar 标签（如模型调用统计的
+                        # 指令标签）随之传递到执行线程
+                        future = pool.submit(contextvars.copy_context().run, self._run_step, steps[i])
+                        future.add_done_callback(
+                            lambda f, i=i: events.put(("done", (i, f.result())))
+                        )
+        wall_time = time.perf_counter() - wall_start
+
+        durations = [end - start for start, end in times]
+        path, path_time = critical_path(deps, durations)
+        return {
+            "steps": [
+                {
+                    "step": steps[i].get("step", i + 1),
+                    "status": status[i],
+                    "result": results[i],
+                    "error": errors[i],
+                    "depends_on": [steps[j].get("step", j + 1) for j in deps[i]],
+                    "start": times[i][0],
+                    "duration": durations[i],
+                }
+                for i in range(len(steps))
+            ],
+            "wall_time": wall_time,
+            "serial_time": sum(durations),
+            "critical_path": [steps[i].get("step", i + 1) for i in path],
+            "critical_path_time": path_time,
+            "stream_error": stream_error,
+        }
+
+
+def format_schedule(report: Dict[str, Any]) -> str:
+    path = " -> ".join(str(s) for s in report["critical_path"]) or "-"
+    return (
+        f"步骤总耗时 {report['wall_time']:.2f}s（串行累计 {report['serial_time']:.2f}s），"
+        f"关键路径 {path}（{report['critical_path_time']:.2f}s）"
+    )
+
+
+if __name__ == "__main__":
+    demo_steps = [
+        {"step": 1, "action": "打开应用", "app": "diskmgmt.msc", "agent_type": "default"},
+        {"step": 2, "action": "打开应用", "app": "calc.exe", "agent_type": "default"},
+        {"step": 3, "action": "打开应用", "app": "notepad.exe", "agent_type": "notebook"},
+        {"step": 4, "action": "输入文本123", "app": "notepad.exe", "agent_type": "notebook"},
+        {"step": 5, "action": "创建事件: summary=团建; filename=meeting.ics", "app": "calendar",
+         "agent_type": "calendar"},
+    ]
+
+    def fake_execute(step):
+        time.sleep(0.2)
+        return True
+
+    demo_report = StepScheduler(fake_execute).run(demo_steps)
+    for item in demo_report["steps"]:
+        print(item)
+    print(format_schedule(demo_report))
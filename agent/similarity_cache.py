@@ -0,0 +1,251 @@
+import json
+import re
+import threading
+import unicodedata
+from typing import Any, List, Optional
+
+import numpy as np
+
+from .app_mapping import keyword_table
+from .plan_cache import normalize_instruction
+from .rule_parser import CLAUSE_SPLIT_RE, POLITE_PREFIX_RE, AhoCorasick, fold
+from .text_features import hash_vector
+
+# 可替换的字面量：引号内文本、输入动词后的文本（到子句分隔符或连接词为止）、数字
+_QUOTED_RE = re.compile(r"[\"“‘']([^\"”’']+)[\"”’']")
+_INPUT_TEXT_RE = re.compile(
+    r"(?:输入|键入|写入|录入)(?:文字|文本|内容)?[:：]?\s*(.+?)\s*(?=" + CLAUSE_SPLIT_RE.pattern + r"|$)"
+)
+_NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")
+LITERAL_PLACEHOLDER = "#"
+# 向量化前去掉的连接词和标点，它们不影响计划结构
+_CONNECTIVE_RE = re.compile(r"并且|然后|接着|之后|并|再|[，,。；;、]")
+# 子句内部的动作动词，“打开记事本输入#”算作两个子句
+_ACTION_VERB_RE = re.compile(r"(?=打开|启动|运行|开启|关闭|退出|输入|键入|写入|录入)")
+
+
+def extract_literals(instruction: str):
+    """
+    提取指令中的字面量，并返回用占位符替换字面量后的“模板”文本。
+
+    Returns:
+        (模板文本, [字面量, ...])，字面量按出现顺序排列
+    """
+    spans = []
+    for regex in (_QUOTED_RE, _INPUT_TEXT_RE, _NUMBER_RE):
+        for m in regex.finditer(instruction):
+            start, end = m.span(1) if regex.groups else m.span()
+            if any(start < e and s < end for s, e in spans):
+                continue  # 与已提取的字面量重叠
+            spans.append((start, end))
+    spans.sort()
+
+    literals = [instruction[s:e].strip() for s, e in spans]
+    template, last = [], 0
+    for s, e in spans:
+        template.append(instruction[last:s])
+        template.append(LITERAL_PLACEHOLDER)
+        last = e
+    template.append(instruction[last:])
+    return "".join(template), literals
+
+
+_APP_KEYWORDS = keyword_table()
+_APP_MATCHER = AhoCorasick(_APP_KEYWORDS)
+
+
+def _template_key(template: str) -> str:
+    # 字面量已替换为占位符，模板可以放心地做全半角和大小写折叠
+    return _CONNECTIVE_RE.sub("", unicodedata.normalize("NFKC", normalize_instruction(template)).lower())
+
+
+def app_signature(instruction: str) -> tuple:
+    """
+    原始指令中提到的应用集合。相似度再高，提到的应用不同也不能复用计划（如任务管理器/资源管理器）。
+    使用未替换字面量的指令，避免应用名被当作输入内容遮住。
+    """
+    return tuple(sorted({_APP_KEYWORDS[kw] for _, kw in _APP_MATCHER.find_all(fold(instruction)[0])}))
+
+
+def clause_count(template: str) -> int:
+    """模板（字面量已替换）中的子句数：按分隔符、连接词以及动作动词切分。子句数不同的指令不能复用计划。"""
+    return sum(
+        1
+        for part in CLAUSE_SPLIT_RE.split(template)
+        for piece in _ACTION_VERB_RE.split(POLITE_PREFIX_RE.sub("", part.strip()))
+        if piece.strip()
+    )
+
+
+def substitute_literals(plan: List[dict], old: List[str], new: List[str]) -> Optional[List[dict]]:
+    """
+    将计划 action 字段中的旧字面量替换为新字面量（app 等其他字段保持不变）。
+    旧字面量在计划中找不到时返回 None，表示无法安全复用该计划。
+    """
+    changed = [(o, n) for o, n in zip(old, new) if o != n]
+    result = json.loads(json.dumps(plan))
+    if not changed:
+        return result
+
+    found = set()
+
+    def replace(value: str) -> str:
+        # 先替换为临时标记再替换为新值，避免新字面量又被后续规则替换
+        for k, (o, _) in enumerate(changed):
+            if o in value:
+                found.add(k)
+                value = value.replace(o, f"\x00{k}\x00")
+        for k, (_, n) in enumerate(changed):
+            value = value.replace(f"\x00{k}\x00", n)
+        return value
+
+    for step in result:
+        if isinstance(step.get("action"), str):
+            step["action"] = replace(step["action"])
+    if len(found) != len(changed):
+        return None
+    return result
+
+
+class SimilarityPlanCache:
+    """
+    近似指令计划缓存：字符 n-gram 哈希向量 + 余弦最近邻。
+
+    指令先把字面量（数字、引号文本、输入内容）替换为占位符、去掉“帮我”和连接词再向量化，
+    因此 “打开记事本输入123” 与 “帮我打开记事本并输入456” 会命中同一个计划，
+    复用时再把计划中的旧字面量替换为新字面量。模板相同的指令只保留最新的一条计划。
+    完全在本地运行，不依赖嵌入模型。
+
+    Args:
+        threshold: 余弦相似度阈值，达到该值才复用计划
+        max_entries: 最大条目数，写满后覆盖最早的条目
+        dim: 哈希向量维度（指令很短，256 维已足够区分；10 万条约占 100 MiB）
+    """
+
+    def __init__(self, threshold: float = 0.85, max_entries: int = 100_000, dim: int = 256):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.dim = dim
+        self._matrix = np.zeros((min(1024, max_entries), dim), dtype=np.float32)
+        self._entries: List[Any] = []  # [(模板, 字面量, 计划, 应用集合, 子句数)]
+        self._rows = {}  # 模板 -> 行号
+        self._next = 0  # 写满后下一个被覆盖的位置
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0  # 相似度足够但字面量无法替换
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, instruction: str, plan: List[dict]):
+        template, literals = extract_literals(instruction)
+        clauses = clause_count(template)
+        template = _template_key(template)
+        apps = app_signature(instruction)
+        vec = hash_vector(template, dim=self.dim)
+        with self._lock:
+            row = self._rows.get(template)
+            if row is not None:
+                # 模板相同：用新计划覆盖
+                self._entries[row] = (template, literals, json.loads(json.dumps(plan)), apps, clauses)
+                return
+            if len(self._entries) < self.max_entries:
+                row = len(self._entries)
+                if row >= len(self._matrix):
+                    grown = np.zeros(
+                        (min(len(self._matrix) * 2, self.max_entries), self.dim), dtype=np.float32
+                    )
+                    grown[: len(self._matrix)] = self._matrix
+                    self._matrix = grown
+                self._entries.append(None)
+            else:
+                row = self._next
+                self._next = (self._next + 1) % self.max_entries
+                del self._rows[self._entries[row][0]]
+            self._matrix[row] = vec
+            self._entries[row] = (template, literals, json.loads(json.dumps(plan)), apps, clauses)
+            self._rows[template] = row
+
+    def lookup(self, instruction: str) -> Optional[List[dict]]:
+        """返回可复用的计划（已完成字面量替换），未命中返回 None。"""
+        template, literals = extract_literals(instruction)
+        clauses = clause_count(template)
+        template = _template_key(template)
+        vec = hash_vector(template, dim=self.dim)
+        with self._lock:
+            n = len(self._entries)
+            if n == 0:
+                self.misses += 1
+                return None
+            scores = self._matrix[:n] @ vec
+            best = int(np.argmax(scores))
+            score = float(scores[best])
+            _, cached_literals, plan, cached_apps, cached_clauses = self._entries[best]
+
+        if (
+            score < self.threshold
+            or len(cached_literals) != len(literals)
+            or cached_clauses != clauses
+            or cached_apps != app_signature(instruction)
+        ):
+            self.misses += 1
+            return None
+        reused = substitute_literals(plan, cached_literals, literals)
+        if reused is None:
+            self.rejected += 1
+            return None
+        self.hits += 1
+        return reused
+
+    def stats(self):
+        lookups = self.hits + self.misses + self.rejected
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "rejected": self.rejected,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+if __name__ == "__main__":
+    import random
+    import time
+
+    cache = SimilarityPlanCache()
+    cache.add(
+        "帮我打开记事本并输入123",
+        [
+            {"step": 1, "action": "打开应用", "app": "notepad.exe", "agent_type": "notebook"},
+            {"step": 2, "action": "输入文本123", "app": "notepad.exe", "agent_type": "notebook"},
+        ],
+    )
+    print(cache.lookup("打开记事本输入456"))
+    print(cache.lookup("打开记事本输入456然后打开计算器"))  # 多出一个步骤，不能复用
+    print(cache.lookup("打开记事本输入456再关闭"))
+
+    # 查找延迟基准：10k / 100k 条模板互不相同的缓存计划
+    random.seed(0)
+    verbs = ["打开", "启动", "运行", "关闭", "最小化", "切换到"]
+    alphabet = "记事本计算器任务管理资源控制面板注册表服务系统信息磁盘画图终端浏览邮件日历音乐视频"
+    plan = [{"step": 1, "action": "打开应用", "app": "x.exe", "agent_type": "default"}]
+    for size in (10_000, 100_000):
+        bench = SimilarityPlanCache(max_entries=size)
+        start = time.perf_counter()
+        while len(bench) < size:
+            name = "".join(random.choices(alphabet, k=random.randint(3, 8)))
+            bench.add(random.choice(verbs) + name, plan)
+        build = time.perf_counter() - start
+
+        latencies = []
+        for _ in range(200):
+            query = random.choice(verbs) + "".join(random.choices(alphabet, k=5))
+            t = time.perf_counter()
+            bench.lookup(query)
+            latencies.append(time.perf_counter() - t)
+        latencies.sort()
+        print(
+            f"{size:>7} 条: 构建 {build:.1f}s，查找 p50 {latencies[100] * 1000:.2f} ms，"
+            f"p95 {latencies[190] * 1000:.2f} ms，矩阵 {bench._matrix.nbytes / 2**20:.0f} MiB"
+        )
@@ -0,0 +1,12 @@
+from typing import List
+
+
+def percentile(values: List[float], p: float) -> float:
+    """线性插值计算分位数，p 取值 0~100。"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * p / 100
+    lo = int(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
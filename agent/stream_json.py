@@ -0,0 +1,131 @@
+import json
+from typing import Any, Iterable, Iterator, List
+
+
+class IncrementalArrayParser:
+    """
+    增量解析 JSON 数组：逐块喂入模型输出的 token，每当数组中的一个元素完整时立即返回。
+
+    - 数组开始前的内容（如 `<think>...</think>`、```json 代码块标记）会被跳过；
+    - 只跟踪字符串/转义状态和括号深度，不会重复扫描已处理的文本；
+    - 数组结束（遇到与开头匹配的 `]`）后的内容被忽略。
+    """
+
+    def __init__(self):
+        self._started = False
+        self._finished = False
+        self._prefix = ""  # 数组开始前的文本，用于跳过 <think> 块
+        self._buffer: List[str] = []  # 当前元素的字符
+        self._depth = 0  # 当前元素内部的括号深度
+        self._in_string = False
+        self._escape = False
+        self.items: List[Any] = []
+
+    @property
+    def finished(self) -> bool:
+        return self._finished
+
+    def _find_array_start(self, chunk: str) -> int:
+        """在数组开始前的文本中查找 `[`，忽略 <think> 块内的内容。返回 chunk 中的位置或 -1。"""
+        offset = len(self._prefix)
+        self._prefix += chunk
+        search_from = 0
+        think_start = self._prefix.find("<think>")
+        if think_start != -1:
+            think_end = self._prefix.find("</think>", think_start)
+            if think_end == -1:
+                return -1
+            search_from = think_end + len("</think>")
+        pos = self._prefix.find("[", max(search_from, 0))
+        if pos == -1:
+            return -1
+        return pos - offset if pos >= offset else -1
+
+    def feed(self, chunk: str) -> List[Any]:
+        """喂入一段文本，返回本次新完成的数组元素。"""
+        completed = []
+        if self._finished or not chunk:
+            return completed
+
+        i = 0
+        if not self._started:
+            start = self._find_array_start(chunk)
+            if start == -1:
+                return completed
+            self._started = True
+            i = start + 1
+
+        for ch in chunk[i:]:
+            if self._in_string:
+                self._buffer.append(ch)
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._buffer.append(ch)
+            elif ch in "{[":
+                self._depth += 1
+                self._buffer.append(ch)
+            elif ch in "}]":
+                if self._depth == 0:
+                    # 顶层数组结束
+                    self._flush(completed)
+                    self._finished = True
+                    break
+                self._depth -= 1
+                self._buffer.append(ch)
+                if self._depth == 0:
+                    self._flush(completed)
+            elif ch == "," and self._depth == 0:
+                self._flush(completed)
+            else:
+                self._buffer.append(ch)
+        return completed
+
+    def _flush(self, completed: List[Any]):
+        text = "".join(self._buffer).strip()
+        self._buffer = []
+        if not text:
+            return
+        item = json.loads(text)
+        self.items.append(item)
+        completed.append(item)
+
+
+def iter_array_items(chunks: Iterable[str]) -> Iterator[Any]:
+    """将文本块流转换为数组元素流。"""
+    parser = IncrementalArrayParser()
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+        if parser.finished:
+            return
+    if not parser.finished:
+        raise ValueError("模型输出的 JSON 数组不完整")
+
+
+if __name__ == "__main__":
+    # 用预先切分好的 token 流模拟模型的流式输出，检查每个步骤在完整时立即产出
+    scripted_tokens = [
+        "<think>\n[草稿]\n</think>\n\n```json\n",
+        '[{"step": 1, "action": "打开',
+        '应用", "app": "notepad.exe", "agent_type": "notebook"}',
+        ', {"step": 2, "action": "输入文本{a,b}\\"]\\"", ',
+        '"app": "notepad.exe", "agent_type": "notebook", "depends_on": [1]}',
+        "]\n```",
+    ]
+    parser = IncrementalArrayParser()
+    produced = []
+    for n, token in enumerate(scripted_tokens):
+        for item in parser.feed(token):
+            produced.append((n, item))
+            print(f"第 {n} 个 token 后产出步骤: {item}")
+    assert [n for n, _ in produced] == [2, 4], produced
+    assert produced[1][1]["action"] == '输入文本{a,b}"]"'
+    assert parser.finished
+    print("scripted token stream OK")
@@ -1,18 +1,43 @@
-from langchain_ollama import ChatOllama
 from langchain_core.prompts import ChatPromptTemplate
 
+from .llm_pool import get_llm
 
-def checkMode(context: str):
-    qwen = ChatOllama(base_url="http://localhost:11434", model="qwen3:0.6b")
+# 本地分类器置信度达到该值时直接采用，不再调用 LLM
+MODE_CONFIDENCE_THRESHOLD = 0.8
+
+
+def _check_mode_by_llm(context: str) -> str:
+    qwen = get_llm("mode")
     # 定义提示模板
     prompt = ChatPromptTemplate.from_template(
         "帮我判断一句话，找出用户是想用浏览器操作还是直接操作他脑软件，如果是只需要输出1，不是输出0，不要输出任何其他内容，接下来是用户说的内容：{content}。/no_think"
     )
     # 创建对话链：模板 -> 模型 -> 输出
-    chain = prompt | qwen
+    chain = (prompt | qwen).with_config(metadata={"agent": "mode"})
     # 调用链并生成回答
     result = chain.invoke({"content": context})
-    print(result.content)
+    return result.content.strip()
+
+
+def checkMode(context: str, threshold: float = MODE_CONFIDENCE_THRESHOLD):
+    """
+    判断用户是想用浏览器操作（"1"）还是直接操作电脑软件（"0"）。
+
+    优先使用本地分类器（微秒级），只有置信度低于 threshold 或分类器不可用（缺少 NumPy）时才调用 LLM。
+    """
+    try:
+        from .mode_classifier import get_classifier
+
+        label, confidence = get_classifier().predict(context)
+    except ImportError:
+        label, confidence = None, 0.0
+
+    if label is not None and confidence >= threshold:
+        mode = str(label)
+    else:
+        mode = _check_mode_by_llm(context)
+    print(mode)
+    return mode
 
 if __name__ == "__main__":
-    checkMode("打开记事本并输入文字123")
\ No newline at end of file
+    checkMode("打开记事本并输入文字123")
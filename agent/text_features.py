@@ -0,0 +1,44 @@
+import re
+import unicodedata
+import zlib
+
+import numpy as np
+
+DEFAULT_DIM = 1024
+DEFAULT_NGRAM_RANGE = (1, 3)
+
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """全角转半角、小写并去掉空白，字符 n-gram 对空白不敏感。"""
+    return _SPACE_RE.sub("", unicodedata.normalize("NFKC", text or "").lower())
+
+
+def ngram_hashes(text: str, ngram_range=DEFAULT_NGRAM_RANGE, dim: int = DEFAULT_DIM):
+    """返回文本全部字符 n-gram 的哈希桶下标（使用 crc32，跨进程稳定）。"""
+    text = normalize_text(text)
+    lo, hi = ngram_range
+    buckets = []
+    for n in range(lo, hi + 1):
+        for i in range(len(text) - n + 1):
+            buckets.append(zlib.crc32(text[i:i + n].encode("utf-8")) % dim)
+    return buckets
+
+
+def hash_vector(text: str, ngram_range=DEFAULT_NGRAM_RANGE, dim: int = DEFAULT_DIM) -> np.ndarray:
+    """将文本向量化为 L2 归一化的 float32 向量（字符 n-gram 特征哈希），无需任何模型。"""
+    vec = np.zeros(dim, dtype=np.float32)
+    buckets = ngram_hashes(text, ngram_range, dim)
+    if buckets:
+        np.add.at(vec, buckets, 1.0)
+        vec /= np.linalg.norm(vec)
+    return vec
+
+
+def hash_matrix(texts, ngram_range=DEFAULT_NGRAM_RANGE, dim: int = DEFAULT_DIM) -> np.ndarray:
+    """批量向量化，返回形状为 (len(texts), dim) 的矩阵。"""
+    matrix = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        matrix[row] = hash_vector(text, ngram_range, dim)
+    return matrix
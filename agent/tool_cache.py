@@ -0,0 +1,172 @@
+import functools
+import inspect
+import json
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, Optional
+
+
+class ToolCache:
+    """
+    工具结果缓存：只读工具（检查记事本、读取 ICS、当前时间等）的结果按参数缓存一段时间，
+    有副作用的工具执行后按规则使相关缓存失效。
+
+    装饰的是工具函数本身，因此 StructuredTool、StepDispatcher 直接调用以及各 agent 共用同一份缓存；
+    AgentExecutor 一次运行中重复的相同调用直接返回缓存结果。
+
+    用法：
+        @tool_cache.memoize("check_notepad_opened", ttl=2)
+        def check_notepad_opened(): ...
+
+        @tool_cache.invalidates("read_ics_file", args=lambda kw: {"filename": kw["filename"]})
+        def create_ics_tool(...): ...
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = {}  # 工具名 -> {参数键: (结果, 过期时间)}
+        self._keys: Dict[str, Callable] = {}  # 工具名 -> 由调用参数计算参数键的函数
+        self._generations = Counter()  # 工具名 -> 失效次数，防止执行期间被失效的旧结果写回缓存
+        self.ttls: Dict[str, float] = {}
+        self.hits = Counter()
+        self.misses = Counter()
+        self.invalidations = Counter()
+
+    @staticmethod
+    def _bind(func, args, kwargs) -> Dict[str, Any]:
+        bound = inspect.signature(func).bind(*args, **kwargs)
+        bound.apply_defaults()
+        return dict(bound.arguments)
+
+    @staticmethod
+    def _key(arguments: Dict[str, Any], normalize: Dict[str, Callable]) -> str:
+        arguments = {k: normalize[k](v) if k in normalize and v is not None else v for k, v in arguments.items()}
+        return json.dumps(arguments, ensure_ascii=False, sort_keys=True, default=str)
+
+    def memoize(
+        self,
+        name: str,
+        ttl: float,
+        normalize: Optional[Dict[str, Callable]] = None,
+        cache_if: Optional[Callable[[Any], bool]] = None,
+    ):
+        """
+        缓存只读工具的结果。
+
+        Args:
+            name: 工具名，失效规则按此名称引用
+            ttl: 有效期（秒），可通过 `ttls[name]` 或 `configure` 修改
+            normalize: 参数归一化函数（如把文件名转为绝对路径），使等价的调用命中同一条缓存
+            cache_if: 只缓存满足条件的结果（如 success 为 True），默认缓存所有未抛异常的结果
+        """
+        normalize = normalize or {}
+        self.ttls.setdefault(name, ttl)
+
+        def decorator(func):
+            self._keys[name] = lambda arguments: self._key(self._bind(func, (), arguments), normalize)
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                key = self._key(self._bind(func, args, kwargs), normalize)
+                now = time.monotonic()
+                with self._lock:
+                    entry = self._entries.get(name, {}).get(key)
+                    if entry is not None and entry[1] > now:
+                        self.hits[name] += 1
+                        return entry[0]
+                    self.misses[name] += 1
+                    generation = self._generations[name]
+                result = func(*args, **kwargs)
+                if cache_if is None or cache_if(result):
+                    with self._lock:
+                        if self._generations[name] == generation:
+                            self._entries.setdefault(name, {})[key] = (result, time.monotonic() + self.ttls[name])
+                return result
+
+            return wrapper
+
+        return decorator
+
+    def invalidates(self, *targets: str, args: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None):
+        """
+        工具执行后（无论成功与否）使 targets 的缓存失效。
+
+        Args:
+            targets: 失效的工具名
+            args: 由本次调用参数得到目标工具的参数，只使对应的那一条缓存失效；None 表示全部失效
+        """
+
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*call_args, **call_kwargs):
+                try:
+                    return func(*call_args, **call_kwargs)
+                finally:
+                    arguments = self._bind(func, call_args, call_kwargs) if args else None
+                    for target in targets:
+                        self.invalidate(target, args(arguments) if args else None)
+
+            return wrapper
+
+        return decorator
+
+    def invalidate(self, name: str, arguments: Optional[Dict[str, Any]] = None):
+        """使某个工具的缓存失效；arguments 给出时只删除这组参数对应的条目（未给出的参数按默认值）。"""
+        with self._lock:
+            self._generations[name] += 1
+            entries = self._entries.get(name)
+            if not entries:
+                return
+            if arguments is None:
+                removed = len(entries)
+                entries.clear()
+            else:
+                key = self._keys[name](arguments)
+                removed = 1 if entries.pop(key, None) is not None else 0
+            self.invalidations[name] += removed
+
+    def configure(self, **ttls: float):
+        """修改各工具的有效期，例如 configure(read_ics_file=10)。"""
+        self.ttls.update(ttls)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            names = sorted(set(self.hits) | set(self.misses))
+            return {
+                name: {
+                    "hits": self.hits[name],
+                    "misses": self.misses[name],
+                    "hit_rate": self.hits[name] / (self.hits[name] + self.misses[name]),
+                    "invalidations": self.invalidations[name],
+                }
+                for name in names
+            }
+
+
+# 进程内共享，所有 agent 和直接工具调用共用
+tool_cache = ToolCache()
+
+
+if __name__ == "__main__":
+    cache = ToolCache()
+    state = {"opened": False, "scans": 0}
+
+    @cache.memoize("check_notepad_opened", ttl=2)
+    def check_notepad_opened():
+        state["scans"] += 1
+        return state["opened"]
+
+    @cache.invalidates("check_notepad_opened")
+    def open_notebook():
+        state["opened"] = True
+        return True
+
+    print([check_notepad_opened() for _ in range(3)], "扫描次数:", state["scans"])
+    open_notebook()
+    print([check_notepad_opened() for _ in range(3)], "扫描次数:", state["scans"])
+    print(cache.stats())
@@ -1,15 +1,14 @@
-from langchain_ollama import ChatOllama
-from langchain_core.tools import tool
-from langchain_community.llms import Ollama
-from langchain_community.agent_toolkits.load_tools import load_tools
-from langchain_classic.agents import create_tool_calling_agent, AgentExecutor
+from langchain_classic.agents import create_tool_calling_agent
 from langchain_core.tools import StructuredTool
-import win32gui, win32process
-import os
-import json
-import re
-import asyncio
-import time
+
+from utils.launcher import get_launcher
+from utils.text_input import get_injector
+from utils.ui_driver import get_driver
+
+from .dispatcher import INPUT_ACTION_RE, OPEN_ACTION_RE, input_text
+from .guarded_executor import GuardedAgentExecutor, tools_goal
+from .llm_pool import get_cascade
+from .tool_cache import tool_cache
 
 
 def get_app_by_description(app: str) -> str:
@@ -26,6 +25,8 @@ def get_app_by_description(app: str) -> str:
     return app.lower().strip()
 
 
+# 启动应用后记事本的打开状态可能变化
+@tool_cache.invalidates("check_notepad_opened", "open_notebook")
 def open_app(app: str = "记事本"):
     """
     打开指定的应用程序
@@ -45,10 +46,13 @@ def open_app(app: str = "记事本"):
             print(f"不支持打开的应用程序: {app}")
             return False
 
-        asyncio.run(open_exec_by_name(exe_name))
-
-
-        time.sleep(5)
+        # 常驻启动服务：多个步骤同时打开应用时并行启动、并行等待就绪（最多 5 秒）
+        handle = get_launcher().launch(exe_name, timeout=5)
+        if not handle.ok:
+            print(f"启动 {exe_name} 失败: {handle.error}")
+            return False
+        ready = handle.ready
+        print(f"成功打开应用程序: {exe_name}，就绪: {ready.ready}（{ready.reason}，{handle.elapsed:.2f}s）")
         return True
 
     except Exception as e:
@@ -56,33 +60,6 @@ def open_app(app: str = "记事本"):
         return False
 
 
-async def open_exec_by_name(exe_name: str):
-    from pywinauto.application import Application
-
-    type = "uia"
-    match exe_name:
-        case "services.msc":
-            type = "process"
-        case "diskmgmt.msc":
-            type = "process"
-        case "msinfo32.exe":
-            type = "process"
-        # case "notepad.exe":
-        # case "calc.exe":
-        # case "taskmgr.exe":
-        # case "explorer.exe":
-        case _:
-            type = "uia"
-
-    match type:
-        case "uia":
-            Application(backend="uia").start(exe_name)
-            print(f"成功打开应用程序: {exe_name}")
-        case "process":
-            os.system("start " + exe_name)  # 使用start命令打开
-            print(f"成功start应用: {exe_name}")
-
-
 openApp = StructuredTool.from_function(
     func=open_app,
     name="OpenApp",
@@ -97,20 +74,13 @@ openApp = StructuredTool.from_function(
 def keyboard_input(
     text: str,
 ):
-    from pywinauto.application import Application
-    from pywinauto.keyboard import send_keys
-
-    hwnd = win32gui.GetForegroundWindow()
-    _, pid = win32process.GetWindowThreadProcessId(hwnd)
+    driver = get_driver()
+    pid = driver.foreground_pid()
     print(f"Foreground PID: {pid}")
-    try:
-        Application().connect(process=pid)
-    except Exception as e:
-        print(f"Warning: Could not connect to process {pid}: {e}. Trying to send keys anyway.")
-    
-    send_keys(text, with_spaces=True)
-
-    return True
+    # 长文本和含特殊字符的文本通过剪贴板粘贴（见 utils/text_input.py）
+    result = get_injector().inject(text, pid=pid)
+    print(f"输入方式: {result.strategy}，{result.chars} 字符，{result.elapsed:.2f}s，校验: {result.verified}")
+    return result.ok
 
 
 keyboardInput = StructuredTool.from_function(
@@ -120,11 +90,19 @@ keyboardInput = StructuredTool.from_function(
 )
 
 
+WINAUTO_GOAL = tools_goal(
+    [
+        (OPEN_ACTION_RE, ["OpenApp"]),
+        (INPUT_ACTION_RE, ["keyboardInput"], lambda m: {"text": input_text(m)}),
+    ]
+)
+
+
 class WinAutoAgent:
     def __init__(self):
         from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 
-        llm = ChatOllama(base_url="http://localhost:11434", model="qwen3:4b")
+        llm = get_cascade("agent", label="winauto")
         prompt_chat_custom_1 = ChatPromptTemplate.from_messages(
             [
                 (
@@ -167,9 +145,12 @@ class WinAutoAgent:
         agent_custom_chat_1 = create_tool_calling_agent(
             llm=llm, tools=tools, prompt=prompt_chat_custom_1
         )
-        self.agent_custom_chat_executor_1 = AgentExecutor(
+        self.agent_custom_chat_executor_1 = GuardedAgentExecutor(
             agent=agent_custom_chat_1,
             tools=tools,
+            max_iterations=5,
+            label="winauto",
+            goal_check=WINAUTO_GOAL,
         )
 
     def execute(self, content: str):
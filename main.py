@@ -3,79 +3,180 @@ import os
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from agent import WinAutoAgent, NLPParserAgent
-import importlib
-from pathlib import Path
-import os
+from agent.registry import AgentRegistry
+from agent.pipeline import PipelinedRunner, format_timing
+from agent.scheduler import StepScheduler, format_schedule
+from agent.call_tags import tag_calls
+from agent.dispatcher import StepDispatcher, dispatch_note
+import json
+
+# 全局常驻 agent 注册表：名称索引只建立一次，agent 实例跨步骤、跨指令复用
+agent_registry = AgentRegistry()
+# 结构完整的步骤直接调用工具，不经过 LLM；设为 None 时全部交给 agent
+step_dispatcher = StepDispatcher()
 
 
-def get_agent_instance(agent_type: str, default_agent: WinAutoAgent):
-    """根据 agent_type 动态加载并返回对应的 agent 实例。
+def get_agent_instance(agent_type: str, default_agent):
+    """根据 agent_type 返回对应的常驻 agent 实例。
 
-    改进规则：
-    - 扫描 `agent/` 目录中所有以 `_agent.py` 结尾的文件，生成候选模块列表。
+    规则（由 `AgentRegistry` 实现）：
+    - 扫描 `agent/` 目录中所有以 `_agent.py` 结尾的文件，生成候选模块列表（只扫描一次）。
     - 首先尝试精确匹配（agent_type -> 文件名前缀），然后尝试别名映射，最后尝试包含/前缀匹配。
     - 类名通过将文件名前缀从 snake_case 转为 PascalCase 并添加 `Agent`（例如 `calendar` -> `CalendarAgent`）来推断。
+    - 实例在首次使用时构造并缓存，后续步骤直接复用。
     - 找不到匹配时，返回 default_agent（通常为 WinAutoAgent）并打印提示。
     """
-    if not agent_type:
-        return default_agent
-
-    normalized = agent_type.lower().strip()
-    agent_dir = Path(__file__).parent / "agent"
-
-    # 列出 agent 目录下所有 *_agent.py 文件并提取候选前缀
-    files = [p for p in agent_dir.glob("*_agent.py") if p.is_file()]
-    candidates = [f.name[:-len("_agent.py")] for f in files]
-
-    # 1) 精确匹配
-    mod_key = None
-    if normalized in candidates:
-        mod_key = normalized
-
-    # 2) 常见别名映射
-    if mod_key is None:
-        alias_map = {
-            "notebook": "notebook",
-            "calendar": "calendar",
-            "winauto": "winauto",
-            "win_auto": "winauto",
-            "default": "winauto",
-        }
-        mapped = alias_map.get(normalized)
-        if mapped and mapped in candidates:
-            mod_key = mapped
-
-    # 3) 包含/前缀匹配（更宽松的匹配规则）
-    if mod_key is None:
-        for c in candidates:
-            if c.startswith(normalized) or normalized in c or c in normalized:
-                mod_key = c
-                break
-
-    if mod_key is None:
-        print(f"未找到匹配的 agent (type={agent_type})，回退到 WinAutoAgent。候选: {candidates}")
-        return default_agent
-
-    module_name = f"agent.{mod_key}_agent"
+    return agent_registry.get(agent_type, default_agent)
+
+
+def execute_step(step, default_agent):
+    """执行单个步骤，返回 {"success": 是否成功, "agent": 执行该步骤的 agent 类名}。
+
+    结构完整的步骤由 `step_dispatcher` 直接调用工具，此时 agent 为 "direct:<工具名>"。
+    """
+    agent_type = step.get("agent_type", "default")
+    step_str = json.dumps(step, ensure_ascii=False)
+
+    print(f"\n执行步骤 {step.get('step')}: {step.get('action')}")
+
+    if step_dispatcher is not None:
+        dispatched = step_dispatcher.dispatch(step)
+        if dispatched is not None:
+            print(f">> 直接调用工具 {dispatched['tool']}: {dispatched['output']}")
+            result = {"success": dispatched["success"], "agent": f"direct:{dispatched['tool']}"}
+            if dispatched["success"]:
+                from langchain_core.messages import AIMessage
+
+                # 写入对应 agent 的对话历史，后续交给它的步骤知道记事本已打开、已输入了什么
+                agent_registry.remember(agent_type, AIMessage(content=dispatch_note(step, dispatched)))
+            else:
+                result["message"] = str(dispatched["output"])
+            return result
+
+    # 动态获取对应 agent（若不存在则回退到 default_agent）
+    agent_instance = get_agent_instance(agent_type, default_agent)
 
+    if agent_instance is None:
+        print(f">> 未找到可用的 agent，跳过步骤 {step.get('step')}。")
+        return {"success": False, "agent": None}
+
+    agent_name = agent_instance.__class__.__name__
+    print(f">> 调用 {agent_name} 执行...")
     try:
-        module = importlib.import_module(module_name)
-        # 将 snake_case 转为 PascalCase 作为类名
-        class_name = "".join(part.capitalize() for part in mod_key.split("_")) + "Agent"
-        AgentClass = getattr(module, class_name, None)
-        if AgentClass is None:
-            print(f"模块 '{module_name}' 中未找到类 '{class_name}'，回退到 WinAutoAgent。")
-            return default_agent
-        return AgentClass()
+        with tag_calls(agent=agent_type, step=step.get("step")):
+            agent_instance.execute(step_str)
+        return {"success": True, "agent": agent_name}
     except Exception as e:
-        print(f"加载 agent '{module_name}' 失败: {e}. 回退到 WinAutoAgent。")
-        return default_agent
+        print(f"{agent_name} 执行出错: {e}")
+        return {"success": False, "agent": agent_name, "message": str(e)}
 
 
-import json
+def execute_steps(steps, default_agent, max_workers: int = 4):
+    """按依赖图执行一条指令解析出的全部步骤：互不依赖的步骤并发执行，并报告关键路径。
+
+    steps 可以是完整的步骤列表，也可以是流式解析产出步骤的迭代器。
+    """
+    agent_registry.begin_command()
+    scheduler = StepScheduler(lambda step: execute_step(step, default_agent), max_workers)
+    report = scheduler.run(steps)
+    print(f"\n{format_schedule(report)}")
+    return report
+
+
+import argparse
 
 if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="pyautogui-agent")
+    arg_parser.add_argument(
+        "--import-report",
+        action="store_true",
+        help="输出冷启动导入耗时报告（python -X importtime 摘要）后退出",
+    )
+    arg_parser.add_argument("--import-report-top", type=int, default=15, help="报告中列出的模块数量")
+    arg_parser.add_argument("--no-pipeline", action="store_true", help="关闭流水线，逐条解析并执行")
+    arg_parser.add_argument("--queue-size", type=int, default=2, help="流水线中预先解析的指令数量上限")
+    arg_parser.add_argument(
+        "--step-workers", type=int, default=4, help="同一指令内并发执行步骤的数量上限，1 表示串行"
+    )
+    arg_parser.add_argument(
+        "--batch", metavar="PATH", help="批量执行指令文件（.jsonl 或每行一条的文本，'-' 表示标准输入）"
+    )
+    arg_parser.add_argument(
+        "--output",
+        metavar="PATH",
+        help="批量模式下逐条写出结果的 JSONL 文件，'-' 表示标准输出（此时日志写到标准错误）",
+    )
+    arg_parser.add_argument("--parse-workers", type=int, default=4, help="批量模式下并发解析的线程数")
+    arg_parser.add_argument("--no-plan-cache", action="store_true", help="关闭解析计划缓存")
+    arg_parser.add_argument("--no-rules", action="store_true", help="关闭本地规则解析，全部交给 LLM")
+    arg_parser.add_argument(
+        "--similarity-cache", action="store_true", help="启用近似指令计划缓存（需要 NumPy）"
+    )
+    arg_parser.add_argument(
+        "--stream", action="store_true", help="流式解析：每个步骤一生成就开始执行，不等待完整计划"
+    )
+    llm_backend = arg_parser.add_mutually_exclusive_group()
+    llm_backend.add_argument("--record", metavar="CASSETTE", help="调用 Ollama 的同时把请求/响应录制到该文件")
+    llm_backend.add_argument("--replay", metavar="CASSETTE", help="不连接 Ollama，从录制文件回放模型响应")
+    arg_parser.add_argument(
+        "--replay-latency", default="0", help='回放时每次模型调用的人为延迟（秒），或 "recorded" 使用录制时的耗时'
+    )
+    arg_parser.add_argument(
+        "--no-direct", action="store_true", help="关闭直接工具调用，所有步骤都交给 agent（经过 LLM）"
+    )
+    arg_parser.add_argument(
+        "--no-cascade", action="store_true", help="关闭模型级联，解析器和 agent 各自只使用单一模型"
+    )
+    arg_parser.add_argument("--llm-metrics", metavar="PATH", help="把每次模型调用的耗时与 token 数写入该 JSONL 文件")
+    arg_parser.add_argument(
+        "--simulate-desktop",
+        action="store_true",
+        help="使用内存中的模拟桌面代替真实的窗口与键盘操作（可配合 --replay 在 Linux 上运行）",
+    )
+    args = arg_parser.parse_args()
+
+    # --output - 时标准输出只写 JSONL 记录，其余日志和统计全部改写到标准错误
+    records_stream = None
+    if args.batch and args.output == "-":
+        records_stream = sys.stdout
+        sys.stdout = sys.stderr
+
+    if args.import_report:
+        from utils.importtime import import_time_report
+
+        print(import_time_report(top=args.import_report_top))
+        sys.exit(0)
+
+    if args.record or args.replay:
+        from agent import llm_pool
+
+        llm_pool.configure(
+            backend="record" if args.record else "replay",
+            cassette=args.record or args.replay,
+            replay_latency=args.replay_latency,
+        )
+
+    if args.no_direct:
+        step_dispatcher = None
+
+    if args.no_cascade:
+        from agent import llm_pool
+
+        llm_pool.configure(cascade="off")
+
+    if args.llm_metrics:
+        from agent.llm_metrics import get_metrics
+
+        get_metrics().open_sink(args.llm_metrics)
+
+    if args.simulate_desktop:
+        from utils.ui_driver import SimulatedDesktop, set_driver
+
+        set_driver(SimulatedDesktop())
+
+    # agent 包为延迟加载，只在这里才真正导入解析器和默认 agent
+    from agent import WinAutoAgent, NLPParserAgent
+
     # 测试不同的应用程序
     test_commands = [
         "帮我打开记事本并输入文字123",
@@ -85,34 +186,82 @@ if __name__ == "__main__":
     ]
 
     # 初始化静态 agent
-    nlp_parser = NLPParserAgent()
+    nlp_parser = NLPParserAgent(
+        cache=not args.no_plan_cache, rules=not args.no_rules, similarity=args.similarity_cache
+    )
     win_agent = WinAutoAgent()
+    agent_registry.register("winauto", win_agent)
 
     # 示例命令（可以替换为录音转写结果）
     # command = "帮我添加一个日历事件，下周五下午2点到5点，在市中心公园举行公司团建活动，并且导入"
-    for command in test_commands:
-        print(f"\n=== 处理指令: {command} ===")
 
-        # 使用 NLP 解析器将自然语言指令解析为结构化步骤
-        steps = nlp_parser.parse_instruction(command)
+    def parse_command(command: str):
+        # 使用 NLP 解析器将自然语言指令解析为结构化步骤（在解析线程中运行）
+        with tag_calls(command=command):
+            return nlp_parser.parse_instruction(command)
+
+    def run_command(command: str, steps):
+        print(f"\n=== 处理指令: {command} ===")
         print(f"解析结果: {json.dumps(steps, ensure_ascii=False, indent=2)}")
+        with tag_calls(command=command):
+            return execute_steps(steps, win_agent, args.step_workers)
+
+    if args.batch:
+        from agent.batch import BatchRunner, read_commands, format_summary
+
+        commands = read_commands(args.batch)
+        batch = BatchRunner(parse_command, run_command, parse_workers=args.parse_workers).run(
+            commands, output=records_stream or args.output
+        )
+        print(f"\n{format_summary(batch['summary'])}")
+    elif args.stream:
+        for command in test_commands:
+            print(f"\n=== 处理指令（流式）: {command} ===")
+            with tag_calls(command=command):
+                execute_steps(nlp_parser.parse_instruction_stream(command), win_agent, args.step_workers)
+    elif args.no_pipeline:
+        for command in test_commands:
+            run_command(command, parse_command(command))
+    else:
+        # 解析下一条指令的同时执行当前指令的步骤
+        report = PipelinedRunner(parse_command, run_command, queue_size=args.queue_size).run(
+            test_commands
+        )
+        print(f"\n{format_timing(report['timing'])}")
+
+    print(f"\nagent 注册表统计: {agent_registry.stats()}")
+    print(f"规则解析命中: {nlp_parser.rule_hits}")
+    if step_dispatcher is not None:
+        print(f"直接工具调用统计: {step_dispatcher.stats()}")
+    if nlp_parser.cache is not None:
+        print(f"解析计划缓存统计: {nlp_parser.cache.stats()}")
+    if nlp_parser.similarity is not None:
+        print(f"近似指令缓存统计: {nlp_parser.similarity.stats()}")
+    from agent.tool_cache import tool_cache
+
+    print(f"工具结果缓存统计: {tool_cache.stats()}")
+    from utils.process_index import get_process_index
+
+    print(f"进程索引统计: {get_process_index().stats()}")
+    from utils.app_connections import get_connection_cache
+
+    print(f"窗口连接缓存统计: {get_connection_cache().stats()}")
+    from utils.text_input import get_injector
+
+    print(f"文本输入统计: {get_injector().stats()}")
+    if args.simulate_desktop:
+        from utils.ui_driver import get_driver
+
+        print(f"模拟桌面统计: {get_driver().stats()}")
 
-        if steps:
-            for step in steps:
-                agent_type = step.get("agent_type", "default")
-                step_str = json.dumps(step, ensure_ascii=False)
+    from agent.llm_metrics import format_llm_summary, get_metrics
 
-                print(f"\n执行步骤 {step.get('step')}: {step.get('action')}")
+    print(f"\n{format_llm_summary(get_metrics().summary())}")
+    if not args.no_cascade:
+        from agent.model_router import format_router_stats, router_stats
 
-                # 动态获取对应 agent（若不存在则回退到 win_agent）
-                agent_instance = get_agent_instance(agent_type, win_agent)
+        print(format_router_stats(router_stats.summary()))
 
-                if agent_instance is None:
-                    print(f">> 未找到可用的 agent，跳过步骤 {step.get('step')}。")
-                    continue
+    from agent.guarded_executor import format_guard_stats, guard_stats
 
-                print(f">> 调用 {agent_instance.__class__.__name__} 执行...")
-                try:
-                    agent_instance.execute(step_str)
-                except Exception as e:
-                    print(f"{agent_instance.__class__.__name__} 执行出错: {e}")
+    print(format_guard_stats(guard_stats.summary()))
@@ -1,4 +1,24 @@
 # Init
-from .asr import transcribe_audio, transcribe_recorded_audio
-from .record import record_until_silence
+import importlib
+
+# 延迟加载：录音依赖 pyaudio/webrtcvad/plyer，只在真正使用时导入
+_LAZY_ATTRS = {
+    "transcribe_audio": ".asr",
+    "transcribe_recorded_audio": ".asr",
+    "record_until_silence": ".record",
+}
+
 __all__ = ["transcribe_audio", "transcribe_recorded_audio", "record_until_silence"]
+
+
+def __getattr__(name):
+    module_name = _LAZY_ATTRS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
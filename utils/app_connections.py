@@ -0,0 +1,196 @@
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+def _pywinauto_connect(pid: int, backend: str):
+    from pywinauto.application import Application
+
+    return Application(backend=backend).connect(process=pid)
+
+
+def _create_time(pid: int) -> Optional[float]:
+    """进程的创建时间，进程已退出时返回 None；用于区分被复用的 pid。"""
+    import psutil
+
+    try:
+        return psutil.Process(pid).create_time()
+    except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+        return None
+
+
+def _is_window(hwnd: int) -> bool:
+    import win32gui
+
+    return bool(win32gui.IsWindow(hwnd))
+
+
+@dataclass
+class _Connection:
+    app: Any
+    token: Any  # 连接时的进程创建时间
+    connected_at: float
+
+
+@dataclass
+class _Window:
+    hwnd: Optional[int]
+    wrapper: Any
+
+
+class ConnectionCache:
+    """
+    pywinauto 连接与窗口控件的缓存，替代每次输入都 `Application().connect(process=pid)`。
+
+    - 连接按 (pid, backend) 缓存，取用时检查进程仍存在且创建时间未变（pid 未被复用），否则重新连接；
+    - 窗口控件（如记事本编辑区）按 (pid, backend) 缓存并记录所属顶层窗口句柄，
+      窗口已销毁或前台切换到该进程的另一个窗口时重新查找；
+    - 使用缓存的对象出错时调用方 `invalidate(pid)` 后重试。
+
+    Args:
+        connect: (pid, backend) -> Application，默认使用 pywinauto
+        process_token: pid -> 进程标识（创建时间），进程不存在时返回 None
+        window_alive: hwnd -> 窗口是否仍存在
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[int, str], Any] = _pywinauto_connect,
+        process_token: Callable[[int], Any] = _create_time,
+        window_alive: Callable[[int], bool] = _is_window,
+    ):
+        self._connect = connect
+        self._process_token = process_token
+        self._window_alive = window_alive
+        self._lock = threading.RLock()
+        self._connections: Dict[Tuple[int, str], _Connection] = {}
+        self._windows: Dict[Tuple[int, str], _Window] = {}
+        self.hits = 0
+        self.connects = 0
+        self.connect_seconds = 0.0
+        self.window_hits = 0
+        self.window_lookups = 0
+        self.exited = 0
+        self.refocused = 0
+
+    def application(self, pid: int, backend: str = "win32"):
+        """已连接到 pid 的 Application；进程已退出时抛出 ProcessLookupError。"""
+        with self._lock:
+            token = self._process_token(pid)
+            key = (pid, backend)
+            entry = self._connections.get(key)
+            if token is None:
+                if any(k[0] == pid for k in self._connections):
+                    self.exited += 1
+                self._drop(pid)
+                raise ProcessLookupError(f"进程 {pid} 已退出")
+            if entry is not None and entry.token == token:
+                self.hits += 1
+                return entry.app
+            if entry is not None:
+                # pid 被新进程复用
+                self.exited += 1
+                self._drop(pid)
+
+            start = time.perf_counter()
+            app = self._connect(pid, backend)
+            self.connect_seconds += time.perf_counter() - start
+            self.connects += 1
+            self._connections[key] = _Connection(app, token, time.monotonic())
+            return app
+
+    def window(self, pid: int, build: Callable[[Any], Tuple[Optional[int], Any]], hwnd: Optional[int] = None, backend: str = "uia"):
+        """
+        pid 的窗口控件。build(app) -> (顶层窗口句柄, 控件)，只在缓存失效时调用。
+
+        Args:
+            hwnd: 当前应使用的顶层窗口（通常为前台窗口）；与缓存记录的不同时重新查找，None 表示不限定
+        """
+        with self._lock:
+            app = self.application(pid, backend)
+            key = (pid, backend)
+            entry = self._windows.get(key)
+            if entry is not None:
+                if hwnd is not None and entry.hwnd != hwnd:
+                    self.refocused += 1
+                elif entry.hwnd is None or self._window_alive(entry.hwnd):
+                    self.window_hits += 1
+                    return entry.wrapper
+            window_hwnd, wrapper = build(app)
+            self.window_lookups += 1
+            self._windows[key] = _Window(window_hwnd, wrapper)
+            return wrapper
+
+    def _drop(self, pid: int):
+        for cache in (self._connections, self._windows):
+            for key in [k for k in cache if k[0] == pid]:
+                del cache[key]
+
+    def invalidate(self, pid: Optional[int] = None):
+        """丢弃 pid（None 表示全部）的连接和窗口控件。"""
+        with self._lock:
+            if pid is None:
+                self._connections.clear()
+                self._windows.clear()
+            else:
+                self._drop(pid)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "connections": len(self._connections),
+                "hits": self.hits,
+                "connects": self.connects,
+                "connect_seconds": round(self.connect_seconds, 3),
+                "window_hits": self.window_hits,
+                "window_lookups": self.window_lookups,
+                "exited": self.exited,
+                "refocused": self.refocused,
+            }
+
+
+_cache: Optional[ConnectionCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_connection_cache() -> ConnectionCache:
+    """WinAutoAgent 与 NotebookAgent 的输入工具（经 WindowsUIDriver）共用的连接缓存。"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ConnectionCache()
+        return _cache
+
+
+if __name__ == "__main__":
+    # 用固定耗时模拟 pywinauto 连接（实测单次 connect 通常为数十到上百毫秒）
+    CONNECT_COST = 0.08
+    alive = {100: 1.0}
+
+    def fake_connect(pid, backend):
+        time.sleep(CONNECT_COST)
+        return object()
+
+    cache = ConnectionCache(fake_connect, alive.get, lambda hwnd: True)
+    steps = 10
+
+    start = time.perf_counter()
+    for _ in range(steps):
+        fake_connect(100, "win32")
+    uncached = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(steps):
+        cache.application(100)
+    cached = time.perf_counter() - start
+    print(f"{steps} 次输入步骤的连接耗时：每次重新连接 {uncached:.3f}s，使用缓存 {cached:.3f}s")
+
+    alive[100] = 2.0  # pid 被新进程复用
+    cache.application(100)
+    del alive[100]  # 进程退出
+    try:
+        cache.application(100)
+    except ProcessLookupError as e:
+        print(e)
+    print(cache.stats())
@@ -1,8 +1,8 @@
-import pyautogui
+from .ui_driver import get_driver
 
 def execute_hotkey(hotkey_str: str, interval: float = 0.1) -> bool:
     """
-    Execute a hotkey combination using pyautogui.
+    Execute a hotkey combination through the UI driver (pyautogui on Windows).
     
     Args:
         hotkey_str: Hotkey string, e.g., "ctrl+c", "alt+tab", "win+r".
@@ -25,8 +25,7 @@ def execute_hotkey(hotkey_str: str, interval: float = 0.1) -> bool:
         # Common mappings: 'win' -> 'winleft' (usually safer on Windows)
         keys = ['winleft' if k == 'win' else k for k in keys]
         
-        pyautogui.hotkey(*keys, interval=interval)
-        return True
+        return get_driver().send_hotkey(keys, interval=interval)
         
     except Exception as e:
         print(f"Error executing hotkey '{hotkey_str}': {e}")
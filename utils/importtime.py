@@ -0,0 +1,71 @@
+import os
+import subprocess
+import sys
+from typing import List, Optional, Sequence, Tuple
+
+# 默认统计 main.py 真实的冷启动路径：模块级导入加上参数解析，agent 包是否延迟加载直接体现在结果中
+DEFAULT_COMMAND = ("main.py", "--help")
+
+
+def collect_import_times(
+    command: Sequence[str] = DEFAULT_COMMAND, cwd: Optional[str] = None
+) -> List[Tuple[int, int, str]]:
+    """
+    在新的解释器中以 `python -X importtime <command>` 运行，收集各模块的导入耗时。
+
+    Args:
+        command: 解释器参数，例如 ("main.py", "--help") 或 ("-c", "import agent.nlp_parser_agent")
+        cwd: 子进程工作目录，默认为项目根目录
+
+    Returns:
+        [(self_us, cumulative_us, module_name), ...]，按输出顺序排列
+    """
+    cwd = cwd or os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", *command],
+        cwd=cwd,
+        capture_output=True,
+        text=True,
+    )
+    records = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3:
+            continue
+        self_us, cumulative_us, name = fields
+        try:
+            records.append((int(self_us), int(cumulative_us), name.rstrip()))
+        except ValueError:
+            # 表头行 "self [us] | cumulative | imported package"
+            continue
+    if proc.returncode != 0:
+        print(f"导入失败（returncode={proc.returncode}）: {proc.stderr.strip().splitlines()[-1:]}")
+    return records
+
+
+def import_time_report(command: Sequence[str] = DEFAULT_COMMAND, top: int = 15) -> str:
+    """生成导入耗时摘要：总耗时、累计耗时最高的顶层包以及自身耗时最高的模块。"""
+    records = collect_import_times(command)
+    label = " ".join(command)
+    if not records:
+        return f"未收集到导入耗时数据: {label}"
+
+    # 顶层导入（缩进最少）的累计耗时之和即为总导入耗时
+    top_level = [r for r in records if not r[2].startswith("  ")]
+    total_us = sum(r[1] for r in top_level)
+
+    lines = [f"导入耗时报告: python -X importtime {label}", f"总耗时: {total_us / 1000:.1f} ms（{len(records)} 个模块）"]
+    lines.append(f"\n累计耗时 Top {top}（顶层包）:")
+    for _, cumulative_us, name in sorted(top_level, key=lambda r: r[1], reverse=True)[:top]:
+        lines.append(f"  {cumulative_us / 1000:9.1f} ms  {name.strip()}")
+    lines.append(f"\n自身耗时 Top {top}:")
+    for self_us, _, name in sorted(records, key=lambda r: r[0], reverse=True)[:top]:
+        lines.append(f"  {self_us / 1000:9.1f} ms  {name.strip()}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    # 例如: python -m utils.importtime -c "import agent.nlp_parser_agent"
+    print(import_time_report(sys.argv[1:] or DEFAULT_COMMAND))
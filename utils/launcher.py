@@ -0,0 +1,205 @@
+import asyncio
+import os
+import subprocess
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, List, Optional, Sequence
+
+from . import readiness
+from .process_index import get_process_index
+from .ui_driver import get_driver
+
+# 需要由 shell 文件关联打开的程序（原来通过 os.system("start ...") 启动）
+SHELL_LAUNCH = {"services.msc", "diskmgmt.msc", "msinfo32.exe"}
+SHELL_SUFFIXES = (".msc", ".cpl")
+
+
+@dataclass
+class LaunchHandle:
+    """一次启动的结果。pid 只在直接创建进程时可知；ready 为就绪等待结果（未等待时为 None）。"""
+
+    exe_name: str
+    method: str = ""
+    pid: Optional[int] = None
+    process: Any = None
+    ready: Optional[readiness.Readiness] = None
+    error: Optional[str] = None
+    started_at: float = field(default_factory=time.time)
+    elapsed: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def spawn(exe_name: str, args: Sequence[str] = ()) -> LaunchHandle:
+    """
+    WindowsUIDriver.launch 的实现：直接启动应用，不经过 cmd：.msc/.cpl 等依赖文件关联的用 os.startfile，其余用 subprocess.Popen。
+    立即返回，不等待窗口出现。
+    """
+    handle = LaunchHandle(exe_name)
+    startfile = getattr(os, "startfile", None)
+    try:
+        if startfile is not None and (exe_name in SHELL_LAUNCH or exe_name.endswith(SHELL_SUFFIXES)):
+            startfile(exe_name)
+            handle.method = "shell"
+        else:
+            try:
+                handle.process = subprocess.Popen([exe_name, *args], close_fds=True)
+            except OSError:
+                # 需要提权（taskmgr.exe）或不在 PATH 中的程序交给 shell 处理
+                if startfile is None or args:
+                    raise
+                startfile(exe_name)
+                handle.method = "shell"
+                return handle
+            handle.pid = handle.process.pid
+            handle.method = "process"
+    except Exception as e:
+        handle.error = f"{type(e).__name__}: {e}"
+    return handle
+
+
+class Launcher:
+    """
+    常驻的应用启动服务：一个后台事件循环加一个线程池，替代每次 `asyncio.run` 新建事件循环。
+
+    - `submit` 立即返回 Future，多个应用可以同时启动并各自等待就绪；
+    - 启动和就绪等待都是阻塞调用，在线程池中执行，互不阻塞；
+    - `reap` 回收已结束的启动任务和已退出的子进程。
+
+    Args:
+        max_workers: 同时进行的启动数
+        ready_timeout: 默认的就绪等待时间（秒）
+        driver: UI 驱动（负责创建进程和就绪检测），默认使用全局驱动 `ui_driver.get_driver()`
+    """
+
+    def __init__(self, max_workers: int = 4, ready_timeout: float = 5.0, driver=None):
+        self.ready_timeout = ready_timeout
+        self.driver = driver
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="launch")
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="launcher-loop", daemon=True)
+        self._thread.start()
+        self._lock = threading.Lock()
+        self._inflight: List[Future] = []
+        self._children: List[subprocess.Popen] = []
+        self.launched = 0
+        self.failed = 0
+
+    async def _launch(self, exe_name: str, args: Sequence[str], wait_ready: bool, timeout: float) -> LaunchHandle:
+        loop = asyncio.get_running_loop()
+        driver = self.driver or get_driver()
+        start = time.perf_counter()
+        before = await loop.run_in_executor(self._executor, readiness.snapshot, exe_name, driver)
+        handle = await loop.run_in_executor(self._executor, driver.launch, exe_name, args)
+        if handle.ok:
+            get_process_index().invalidate()
+            if handle.process is not None:
+                with self._lock:
+                    self._children.append(handle.process)
+            if wait_ready:
+                handle.ready = await loop.run_in_executor(
+                    self._executor, readiness.wait_until_ready, before, timeout, driver, True, handle.pid
+                )
+        handle.elapsed = time.perf_counter() - start
+        with self._lock:
+            self.launched += handle.ok
+            self.failed += not handle.ok
+        return handle
+
+    def submit(
+        self, exe_name: str, args: Sequence[str] = (), wait_ready: bool = True, timeout: Optional[float] = None
+    ) -> Future:
+        """提交一次启动，返回 concurrent.futures.Future[LaunchHandle]。"""
+        self.reap()
+        timeout = self.ready_timeout if timeout is None else timeout
+        future = asyncio.run_coroutine_threadsafe(self._launch(exe_name, args, wait_ready, timeout), self._loop)
+        with self._lock:
+            self._inflight.append(future)
+        return future
+
+    def launch(self, exe_name: str, args: Sequence[str] = (), wait_ready: bool = True, timeout: Optional[float] = None):
+        """启动并等待完成（包括就绪等待），返回 LaunchHandle。"""
+        return self.submit(exe_name, args, wait_ready, timeout).result()
+
+    def launch_many(self, exe_names: Sequence[str], wait_ready: bool = True, timeout: Optional[float] = None):
+        """同时启动多个应用，全部就绪（或超时）后按输入顺序返回。"""
+        futures = [self.submit(name, wait_ready=wait_ready, timeout=timeout) for name in exe_names]
+        return [f.result() for f in futures]
+
+    def reap(self) -> int:
+        """清理已完成的启动任务和已退出的子进程，返回清理的数量。"""
+        with self._lock:
+            done = [f for f in self._inflight if f.done()]
+            self._inflight = [f for f in self._inflight if not f.done()]
+            exited = [p for p in self._children if p.poll() is not None]
+            self._children = [p for p in self._children if p.returncode is None]
+        return len(done) + len(exited)
+
+    def pending(self) -> int:
+        with self._lock:
+            return sum(not f.done() for f in self._inflight)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "launched": self.launched,
+                "failed": self.failed,
+                "pending": sum(not f.done() for f in self._inflight),
+                "children": len(self._children),
+            }
+
+    def shutdown(self):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=1)
+        self._executor.shutdown(wait=False)
+
+
+_launcher: Optional[Launcher] = None
+_launcher_lock = threading.Lock()
+
+
+def get_launcher() -> Launcher:
+    """所有 agent 和直接工具调用共用的启动服务。"""
+    global _launcher
+    with _launcher_lock:
+        if _launcher is None:
+            _launcher = Launcher()
+        return _launcher
+
+
+if __name__ == "__main__":
+    from .ui_driver import WindowsUIDriver
+
+    class DemoDriver(WindowsUIDriver):
+        """用子进程模拟应用：进程被发现 0.3 秒后视为窗口出现。"""
+
+        def __init__(self):
+            self.seen = {}
+
+        def windows(self, pid):
+            first = self.seen.setdefault(pid, time.monotonic())
+            return [pid] if time.monotonic() - first >= 0.3 else []
+
+        def foreground(self):
+            return None, None
+
+    launcher = Launcher(driver=DemoDriver())
+    apps = ["sleep"] * 3
+
+    start = time.perf_counter()
+    for app in apps:
+        launcher.launch(app, ("2",))
+    serial = time.perf_counter() - start
+
+    start = time.perf_counter()
+    handles = [f.result() for f in [launcher.submit(app, ("2",)) for app in apps]]
+    parallel = time.perf_counter() - start
+
+    print(f"依次启动 {len(apps)} 个应用: {serial:.2f}s，同时启动: {parallel:.2f}s")
+    print([(h.pid, h.method, h.ready.reason if h.ready else None) for h in handles])
+    print(launcher.stats())
+    launcher.shutdown()
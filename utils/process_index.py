@@ -0,0 +1,201 @@
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+# 索引有效期：同一步骤内多个工具的查询共用一次刷新
+DEFAULT_TTL = 0.5
+# 增量刷新无法发现 pid 被复用的情况，每隔一段时间做一次完整扫描
+FULL_SCAN_INTERVAL = 30.0
+
+
+def _psutil_pids() -> List[int]:
+    import psutil
+
+    return psutil.pids()
+
+
+def _psutil_names(pids: Optional[Iterable[int]]) -> Dict[int, str]:
+    """pids 为 None 时一次遍历全部进程（process_iter 预取 name）；否则只查询这些 pid。"""
+    import psutil
+
+    names = {}
+    if pids is None:
+        for process in psutil.process_iter(["name"]):
+            names[process.pid] = process.info.get("name") or ""
+        return names
+    for pid in pids:
+        try:
+            names[pid] = psutil.Process(pid).name()
+        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+            continue
+    return names
+
+
+class ProcessIndex:
+    """
+    进程名 -> pid 的共享索引，替代各工具里逐个调用 `process.name()` 的完整扫描。
+
+    - 首次查询时用 process_iter 预取进程名，一次遍历建立索引；
+    - 索引在 ttl 秒内直接复用；过期后只比较 pid 列表，仅查询新出现进程的名称并删除已退出的进程；
+    - 每隔 full_scan_interval 秒做一次完整扫描，纠正 pid 复用造成的偏差。
+
+    Args:
+        ttl: 索引有效期（秒）
+        full_scan_interval: 完整扫描的间隔（秒）
+        list_pids / get_names: 系统接口，默认基于 psutil，测试时可替换
+    """
+
+    def __init__(
+        self,
+        ttl: float = DEFAULT_TTL,
+        full_scan_interval: float = FULL_SCAN_INTERVAL,
+        list_pids: Callable[[], Iterable[int]] = _psutil_pids,
+        get_names: Callable[[Optional[Iterable[int]]], Dict[int, str]] = _psutil_names,
+    ):
+        self.ttl = ttl
+        self.full_scan_interval = full_scan_interval
+        self._list_pids = list_pids
+        self._get_names = get_names
+        self._lock = threading.Lock()
+        self._names: Dict[int, str] = {}  # pid -> 小写进程名
+        self._by_name: Dict[str, Set[int]] = {}
+        self._refreshed_at = None
+        self._full_scan_at = None
+        self.hits = 0
+        self.full_scans = 0
+        self.incremental = 0
+        self.added = 0
+        self.removed = 0
+
+    def _add(self, pid: int, name: str):
+        name = name.lower()
+        self._names[pid] = name
+        self._by_name.setdefault(name, set()).add(pid)
+
+    def _remove(self, pid: int):
+        name = self._names.pop(pid, None)
+        if name is not None:
+            pids = self._by_name.get(name)
+            if pids is not None:
+                pids.discard(pid)
+                if not pids:
+                    del self._by_name[name]
+
+    def _full_scan(self, now: float):
+        self._names.clear()
+        self._by_name.clear()
+        for pid, name in self._get_names(None).items():
+            self._add(pid, name)
+        self.full_scans += 1
+        self._full_scan_at = now
+
+    def _incremental(self):
+        current = set(self._list_pids())
+        known = set(self._names)
+        for pid in known - current:
+            self._remove(pid)
+        new = current - known
+        for pid, name in self._get_names(new).items() if new else ():
+            self._add(pid, name)
+        self.added += len(new)
+        self.removed += len(known - current)
+        self.incremental += 1
+
+    def refresh(self, max_age: Optional[float] = None):
+        """索引超过 max_age（默认 ttl）秒时刷新；max_age=0 表示强制刷新（增量）。"""
+        max_age = self.ttl if max_age is None else max_age
+        with self._lock:
+            now = time.monotonic()
+            if self._refreshed_at is not None and now - self._refreshed_at < max_age:
+                self.hits += 1
+                return
+            if self._full_scan_at is None or now - self._full_scan_at >= self.full_scan_interval:
+                self._full_scan(now)
+            else:
+                self._incremental()
+            self._refreshed_at = now
+
+    def pids(self, name: str, max_age: Optional[float] = None) -> List[int]:
+        """名为 name（不区分大小写）的进程 pid，按 pid 排序。"""
+        self.refresh(max_age)
+        with self._lock:
+            return sorted(self._by_name.get(name.lower(), ()))
+
+    def first(self, name: str, max_age: Optional[float] = None) -> Optional[int]:
+        pids = self.pids(name, max_age)
+        return pids[0] if pids else None
+
+    def all_pids(self, max_age: Optional[float] = None) -> Set[int]:
+        self.refresh(max_age)
+        with self._lock:
+            return set(self._names)
+
+    def name(self, pid: int, max_age: Optional[float] = None) -> Optional[str]:
+        self.refresh(max_age)
+        with self._lock:
+            return self._names.get(pid)
+
+    def invalidate(self):
+        """启动或关闭了进程后调用，下一次查询时刷新索引。"""
+        with self._lock:
+            self._refreshed_at = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                "processes": len(self._names),
+                "hits": self.hits,
+                "full_scans": self.full_scans,
+                "incremental": self.incremental,
+                "added": self.added,
+                "removed": self.removed,
+            }
+
+
+_index: Optional[ProcessIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_process_index() -> ProcessIndex:
+    """所有工具和 agent 共用的进程索引。"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = ProcessIndex()
+        return _index
+
+
+if __name__ == "__main__":
+    import psutil
+
+    def scan(name):
+        # 原工具中的写法：逐个进程调用 name()
+        found = []
+        for process in psutil.process_iter():
+            try:
+                if process.name().lower() == name:
+                    found.append(process.pid)
+            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                pass
+        return found
+
+    rounds = 50
+    start = time.perf_counter()
+    for _ in range(rounds):
+        scan("notepad.exe")
+    scan_ms = (time.perf_counter() - start) / rounds * 1000
+
+    index = ProcessIndex()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        index.pids("notepad.exe", max_age=0)
+    forced_ms = (time.perf_counter() - start) / rounds * 1000
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        index.pids("notepad.exe")
+    cached_ms = (time.perf_counter() - start) / rounds * 1000
+
+    print(f"{len(psutil.pids())} 个进程")
+    print(f"完整扫描: {scan_ms:.3f} ms/次，增量刷新: {forced_ms:.3f} ms/次，TTL 内查询: {cached_ms:.4f} ms/次")
+    print(index.stats())
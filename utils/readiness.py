@@ -0,0 +1,299 @@
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+
+# 轮询间隔：从 INITIAL_INTERVAL 开始每次乘以 BACKOFF_FACTOR，最多 MAX_INTERVAL
+INITIAL_INTERVAL = 0.05
+BACKOFF_FACTOR = 1.5
+MAX_INTERVAL = 0.25
+
+# 启动后实际运行的进程名与启动命令不同的情况（.msc 由 mmc.exe 承载）
+HOST_PROCESSES = {".msc": "mmc.exe"}
+
+
+def process_name_for(exe_name: str) -> str:
+    exe_name = exe_name.lower().strip()
+    for suffix, host in HOST_PROCESSES.items():
+        if exe_name.endswith(suffix):
+            return host
+    return exe_name
+
+
+class ReadinessBackend:
+    """
+    就绪检测使用的系统接口。默认实现基于 psutil + win32gui（utils.ui_driver 的驱动均实现了该接口）；
+    测试时可替换为 `FakeReadinessBackend`。
+    时钟和 sleep 也放在后端上，假后端可以用虚拟时间跑完超时逻辑。
+    """
+
+    def pids(self, process_name: str) -> Set[int]:
+        raise NotImplementedError
+
+    def all_pids(self) -> Optional[Set[int]]:
+        """全部进程的 pid，用于判断前台窗口的进程是否为新启动的；不支持时返回 None。"""
+        return None
+
+    def windows(self, pid: int) -> List[int]:
+        """进程的可见顶层窗口句柄。"""
+        raise NotImplementedError
+
+    def foreground(self) -> Tuple[Optional[int], Optional[int]]:
+        """(前台窗口句柄, 所属进程 pid)。"""
+        raise NotImplementedError
+
+    def monotonic(self) -> float:
+        return time.monotonic()
+
+    def sleep(self, seconds: float):
+        time.sleep(seconds)
+
+
+class WindowsReadinessBackend(ReadinessBackend):
+    def pids(self, process_name: str) -> Set[int]:
+        from .process_index import get_process_index
+
+        # 轮询时强制增量刷新：只查询新出现的 pid，不必每次遍历全部进程
+        return set(get_process_index().pids(process_name, max_age=0))
+
+    def all_pids(self) -> Optional[Set[int]]:
+        from .process_index import get_process_index
+
+        return get_process_index().all_pids(max_age=0)
+
+    def windows(self, pid: int) -> List[int]:
+        import win32gui
+        import win32process
+
+        handles = []
+
+        def collect(hwnd, _):
+            if win32gui.IsWindowVisible(hwnd) and win32gui.GetWindowText(hwnd):
+                if win32process.GetWindowThreadProcessId(hwnd)[1] == pid:
+                    handles.append(hwnd)
+            return True
+
+        win32gui.EnumWindows(collect, None)
+        return handles
+
+    def foreground(self) -> Tuple[Optional[int], Optional[int]]:
+        import win32gui
+        import win32process
+
+        hwnd = win32gui.GetForegroundWindow()
+        if not hwnd:
+            return None, None
+        return hwnd, win32process.GetWindowThreadProcessId(hwnd)[1]
+
+
+class FakeReadinessBackend(ReadinessBackend):
+    """
+    虚拟时间的假后端：`launch(name, pid, window_after=...)` 登记一个在指定虚拟时间后出现窗口的进程，
+    sleep 只推进虚拟时钟，不真正等待。
+    """
+
+    def __init__(self):
+        self.now = 0.0
+        self._processes: Dict[int, Tuple[str, float]] = {}  # pid -> (进程名, 窗口出现时间)
+        self._foreground: Tuple[Optional[int], Optional[int]] = (None, None)
+        self._pending_focus: Optional[Tuple[int, float]] = None  # (pid, 获得焦点的时间)
+
+    def launch(self, process_name: str, pid: int, window_after: float = 0.0, focus: bool = True):
+        self._processes[pid] = (process_name.lower(), self.now + window_after)
+        if focus and window_after <= 0:
+            self._foreground = (pid * 10, pid)
+        elif focus:
+            self._pending_focus = (pid, self.now + window_after)
+
+    def pids(self, process_name: str) -> Set[int]:
+        return {pid for pid, (name, _) in self._processes.items() if name == process_name}
+
+    def all_pids(self) -> Optional[Set[int]]:
+        return set(self._processes)
+
+    def windows(self, pid: int) -> List[int]:
+        entry = self._processes.get(pid)
+        return [pid * 10] if entry is not None and self.now >= entry[1] else []
+
+    def foreground(self) -> Tuple[Optional[int], Optional[int]]:
+        pending = self._pending_focus
+        if pending is not None and self.now >= pending[1]:
+            self._foreground = (pending[0] * 10, pending[0])
+            self._pending_focus = None
+        return self._foreground
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.now += seconds
+
+
+@dataclass
+class Readiness:
+    """等待结果：ready 为 False 表示超时。"""
+
+    ready: bool
+    pid: Optional[int] = None
+    hwnd: Optional[int] = None
+    elapsed: float = 0.0
+    polls: int = 0
+    reason: str = ""
+
+
+@dataclass
+class LaunchSnapshot:
+    """启动前的状态，用于区分新启动的进程/窗口与原有的。"""
+
+    process_name: str
+    pids: Set[int] = field(default_factory=set)
+    foreground: Tuple[Optional[int], Optional[int]] = (None, None)
+    all_pids: Optional[Set[int]] = None  # 全部进程，后端不支持时为 None
+
+
+# 正在等待就绪的启动：多个应用同时启动时，前台窗口无法确定属于哪一个
+_waiting: List[LaunchSnapshot] = []
+_waiting_lock = threading.Lock()
+
+
+_default_backend: Optional[ReadinessBackend] = None
+
+
+def get_backend() -> ReadinessBackend:
+    """默认使用全局 UI 驱动（utils.ui_driver），它同时实现了 ReadinessBackend。"""
+    if _default_backend is not None:
+        return _default_backend
+    from .ui_driver import get_driver
+
+    return get_driver()
+
+
+def set_backend(backend: Optional[ReadinessBackend]):
+    """单独替换就绪检测后端（测试使用），None 恢复为全局 UI 驱动。"""
+    global _default_backend
+    _default_backend = backend
+
+
+def snapshot(exe_name: str, backend: Optional[ReadinessBackend] = None) -> LaunchSnapshot:
+    """在启动应用前调用，记录已有的同名进程和前台窗口。"""
+    backend = backend or get_backend()
+    process_name = process_name_for(exe_name)
+    try:
+        return LaunchSnapshot(process_name, backend.pids(process_name), backend.foreground(), backend.all_pids())
+    except Exception as e:
+        print(f"记录启动前状态失败: {e}")
+        return LaunchSnapshot(process_name)
+
+
+def _foreground_is_ours(before: LaunchSnapshot, pid: Optional[int]) -> bool:
+    """
+    前台窗口所属进程是否可以认定为这次启动的结果：必须是快照之后新出现的进程，
+    且没有其他正在等待的启动——否则无法区分是哪个应用的窗口，等其他启动按进程名就绪（或超时）后再判断。
+    """
+    if pid is None or pid == before.foreground[1]:
+        return False
+    if before.all_pids is not None and pid in before.all_pids:
+        return False
+    with _waiting_lock:
+        return all(s is before for s in _waiting)
+
+
+def wait_until_ready(
+    before: LaunchSnapshot,
+    timeout: float = 5.0,
+    backend: Optional[ReadinessBackend] = None,
+    require_window: bool = True,
+    pid: Optional[int] = None,
+) -> Readiness:
+    """
+    轮询（间隔指数退避）直到新启动的应用就绪，最多等待 timeout 秒：
+
+    - 启动时已知的进程 pid 出现了可见窗口；
+    - 出现了启动前没有的同名进程，且该进程已有可见窗口（require_window=False 时只要求进程存在）；
+    - 或前台窗口切换到了快照之后新出现的进程（calc.exe 这类启动器会拉起其他进程名的应用窗口）。
+      同时有多个启动在等待时不采用该信号，见 `_foreground_is_ours`。
+
+    Args:
+        before: 启动前的 `snapshot` 结果
+        timeout: 超时时间（秒），超时返回 ready=False，由调用方决定是否继续
+        backend: 默认使用全局后端
+        require_window: 是否要求主窗口已出现
+        pid: 启动器已知的进程 pid（直接创建进程时）
+    """
+    backend = backend or get_backend()
+    start = backend.monotonic()
+    interval = INITIAL_INTERVAL
+    polls = 0
+    with _waiting_lock:
+        _waiting.append(before)
+    try:
+        while True:
+            polls += 1
+            try:
+                candidates = sorted(backend.pids(before.process_name) - before.pids)
+                if pid is not None and pid not in candidates:
+                    candidates.insert(0, pid)
+                for candidate in candidates:
+                    if not require_window:
+                        return Readiness(True, candidate, None, backend.monotonic() - start, polls, "process")
+                    handles = backend.windows(candidate)
+                    if handles:
+                        return Readiness(True, candidate, handles[0], backend.monotonic() - start, polls, "window")
+                hwnd, fg_pid = backend.foreground()
+                if hwnd and hwnd != before.foreground[0] and _foreground_is_ours(before, fg_pid):
+                    return Readiness(True, fg_pid, hwnd, backend.monotonic() - start, polls, "foreground")
+            except Exception as e:
+                print(f"检查应用就绪状态时出现错误: {e}")
+
+            elapsed = backend.monotonic() - start
+            if elapsed >= timeout:
+                return Readiness(False, elapsed=elapsed, polls=polls, reason="timeout")
+            backend.sleep(min(interval, timeout - elapsed))
+            interval = min(interval * BACKOFF_FACTOR, MAX_INTERVAL)
+    finally:
+        with _waiting_lock:
+            _waiting.remove(before)
+
+
+if __name__ == "__main__":
+    fake = FakeReadinessBackend()
+    fake.launch("notepad.exe", 100)  # 已经打开的记事本
+    before = snapshot("notepad.exe", fake)
+    fake.launch("notepad.exe", 200, window_after=0.42, focus=False)
+    print("新记事本窗口 0.42s 后出现:", wait_until_ready(before, timeout=2, backend=fake))
+
+    before = snapshot("calc.exe", fake)
+    fake.launch("calculatorapp.exe", 300, window_after=0.3)
+    print("计算器由其他进程承载:", wait_until_ready(before, timeout=2, backend=fake))
+
+    before = snapshot("diskmgmt.msc", fake)
+    print("始终未就绪:", wait_until_ready(before, timeout=1, backend=fake))
+
+    # 同时等待两个启动：计算器的窗口先出现在前台，不能被当作磁盘管理已就绪
+    import concurrent.futures
+
+    class RealtimeFake(FakeReadinessBackend):
+        def __init__(self):
+            super().__init__()
+            self.start = time.monotonic()
+
+        @property
+        def now(self):
+            return time.monotonic() - self.start
+
+        @now.setter
+        def now(self, value):
+            pass
+
+        def sleep(self, seconds):
+            time.sleep(seconds)
+
+    fake = RealtimeFake()
+    disk_before, calc_before = snapshot("diskmgmt.msc", fake), snapshot("calc.exe", fake)
+    fake.launch("mmc.exe", 100, window_after=1.0, focus=False)
+    fake.launch("calculatorapp.exe", 200, window_after=0.2)
+    with concurrent.futures.ThreadPoolExecutor(2) as pool:
+        disk = pool.submit(wait_until_ready, disk_before, 3, fake)
+        calc = pool.submit(wait_until_ready, calc_before, 3, fake)
+        print("同时启动 磁盘管理:", disk.result())
+        print("同时启动 计算器:", calc.result())
@@ -0,0 +1,265 @@
+import os
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+from .ui_driver import SEND_KEYS_SPECIAL, UIDriver, get_driver
+
+KEYS = "keys"  # 逐字符发送按键
+PASTE = "paste"  # 写入剪贴板后 Ctrl+V
+
+# 达到该长度的文本改用粘贴；可用 PYAUTOGUI_AGENT_PASTE_THRESHOLD 调整，0 表示总是逐字输入
+PASTE_THRESHOLD = 32
+# 超长文本分块粘贴，避免单次剪贴板数据过大时目标程序卡顿
+CHUNK_CHARS = 4000
+# 每次粘贴后等待目标程序读取剪贴板，再写入下一块或恢复原内容
+PASTE_SETTLE = 0.05
+# 输入后窗口文本还没有变化时继续轮询的时长，目标程序可能稍后才处理完粘贴
+VERIFY_TIMEOUT = 0.5
+
+
+def choose_strategy(text: str, threshold: int = PASTE_THRESHOLD) -> str:
+    """
+    长文本、多行文本以及含 send_keys 特殊字符（`{}+^%~()[]`）的文本用粘贴，其余逐字输入。
+    threshold <= 0 时总是逐字输入。
+    """
+    if threshold <= 0 or not text:
+        return KEYS
+    if len(text) >= threshold or "\n" in text or "\t" in text:
+        return PASTE
+    return PASTE if any(c in SEND_KEYS_SPECIAL for c in text) else KEYS
+
+
+def split_chunks(text: str, size: int = CHUNK_CHARS) -> List[str]:
+    """按 size 分块，尽量在换行处断开。"""
+    chunks = []
+    while len(text) > size:
+        cut = text.rfind("\n", 0, size) + 1
+        if cut <= size // 2:
+            cut = size
+        chunks.append(text[:cut])
+        text = text[cut:]
+    if text or not chunks:
+        chunks.append(text)
+    return chunks
+
+
+def _normalize(text: str) -> str:
+    # 记事本会把 \n 保存为 \r\n
+    return text.replace("\r\n", "\n")
+
+
+@dataclass
+class InjectionResult:
+    """
+    一次输入的结果。verified 为 None 表示无法读取窗口文本、未校验；
+    fallback 为 True 表示写剪贴板或粘贴时出错，已改为逐字输入。
+    """
+
+    strategy: str
+    chars: int
+    chunks: int = 1
+    elapsed: float = 0.0
+    verified: Optional[bool] = None
+    fallback: bool = False
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and self.verified is not False
+
+
+class TextInjector:
+    """
+    文本输入引擎：按长度和内容在逐字按键与剪贴板粘贴之间选择。
+
+    - 逐字输入由驱动负责转义 send_keys 特殊字符，适合短文本；
+    - 粘贴前保存剪贴板文本，按 chunk_chars 分块粘贴后恢复（非文本内容无法恢复，会被清空）；
+    - 写剪贴板或粘贴出错（剪贴板被占用等）时改为逐字输入一次；
+    - verify=True 且已知目标进程时，比较输入前后的窗口文本确认文本已写入。文本没有变化时
+      在 verify_timeout 内轮询，仍未变化则报告 verified=False，不再重新输入，
+      避免粘贴稍后生效或窗口文本读不到变化时重复输入。
+
+    Args:
+        driver: UI 驱动，默认使用全局驱动
+        paste_threshold: 见 `choose_strategy`
+        chunk_chars: 每次粘贴的最大字符数
+        verify: 是否校验输入结果
+        settle: 每次粘贴后的等待时间（秒），也是校验时的轮询间隔
+        verify_timeout: 校验时等待窗口文本变化的最长时间（秒）
+    """
+
+    def __init__(
+        self,
+        driver: Optional[UIDriver] = None,
+        paste_threshold: int = PASTE_THRESHOLD,
+        chunk_chars: int = CHUNK_CHARS,
+        verify: bool = True,
+        settle: float = PASTE_SETTLE,
+        verify_timeout: float = VERIFY_TIMEOUT,
+    ):
+        self.driver = driver
+        self.paste_threshold = paste_threshold
+        self.chunk_chars = chunk_chars
+        self.verify = verify
+        self.settle = settle
+        self.verify_timeout = verify_timeout
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def _record(self, result: InjectionResult):
+        with self._lock:
+            s = self._stats.setdefault(
+                result.strategy, {"calls": 0, "chars": 0, "seconds": 0.0, "fallbacks": 0, "unverified": 0, "failed": 0}
+            )
+            s["calls"] += 1
+            s["chars"] += result.chars
+            s["seconds"] += result.elapsed
+            s["fallbacks"] += result.fallback
+            s["unverified"] += result.verified is None
+            s["failed"] += not result.ok
+
+    def _paste(self, driver: UIDriver, chunks: List[str], pasted: List[str]):
+        """依次粘贴 chunks，已粘贴的块追加到 pasted，出错时调用方据此只逐字输入剩余部分。"""
+        saved = driver.get_clipboard()
+        try:
+            for chunk in chunks:
+                driver.set_clipboard(chunk)
+                driver.paste()
+                pasted.append(chunk)
+                driver.sleep(self.settle)
+        finally:
+            try:
+                driver.set_clipboard(saved)
+            except Exception as e:
+                print(f"恢复剪贴板失败: {e}")
+
+    def _read(self, driver: UIDriver, pid: Optional[int]) -> Optional[str]:
+        if not self.verify or pid is None:
+            return None
+        try:
+            text = driver.read_text(pid)
+        except Exception as e:
+            print(f"读取窗口文本失败: {e}")
+            return None
+        return _normalize(text) if text is not None else None
+
+    def _read_changed(self, driver: UIDriver, pid: Optional[int], before: Optional[str]) -> Optional[str]:
+        """读取输入后的窗口文本；与输入前相同时轮询到 verify_timeout。"""
+        after = self._read(driver, pid)
+        if before is None:
+            return after
+        deadline = driver.monotonic() + self.verify_timeout
+        while after == before and driver.monotonic() < deadline:
+            driver.sleep(self.settle)
+            after = self._read(driver, pid)
+        return after
+
+    def inject(self, text: str, pid: Optional[int] = None, strategy: Optional[str] = None) -> InjectionResult:
+        """
+        输入文本，返回 `InjectionResult`。
+
+        Args:
+            text: 要输入的文本
+            pid: 目标进程（用于连接进程和校验），按键和粘贴都发送到前台窗口
+            strategy: 强制使用 KEYS 或 PASTE，默认由 `choose_strategy` 决定
+        """
+        driver = self.driver or get_driver()
+        strategy = strategy or choose_strategy(text, self.paste_threshold)
+        result = InjectionResult(strategy, len(text))
+        start = driver.monotonic()
+        before = self._read(driver, pid)
+
+        remaining = text
+        if strategy == PASTE:
+            chunks = split_chunks(text, self.chunk_chars)
+            pasted: List[str] = []
+            result.chunks = len(chunks)
+            try:
+                self._paste(driver, chunks, pasted)
+            except Exception as e:
+                print(f"剪贴板粘贴失败，剩余部分改为逐字输入: {e}")
+                result.fallback = True
+                remaining = "".join(chunks[len(pasted):])
+                strategy = KEYS
+            else:
+                after = self._read_changed(driver, pid, before)
+        if strategy == KEYS:
+            try:
+                if not driver.send_text(remaining, pid=pid):
+                    result.error = "send_text 返回 False"
+            except Exception as e:
+                result.error = f"{type(e).__name__}: {e}"
+            after = self._read_changed(driver, pid, before) if result.error is None else None
+
+        if result.error is None and before is not None and after is not None:
+            expected = _normalize(text)
+            result.verified = expected in after and len(after) - len(before) >= len(expected)
+        result.elapsed = driver.monotonic() - start
+        self._record(result)
+        return result
+
+    def stats(self):
+        """按策略统计调用次数、字符数和吞吐（字符/秒）。"""
+        with self._lock:
+            return {
+                strategy: {**s, "seconds": round(s["seconds"], 3), "cps": round(s["chars"] / s["seconds"]) if s["seconds"] else 0}
+                for strategy, s in sorted(self._stats.items())
+            }
+
+
+_injector: Optional[TextInjector] = None
+_injector_lock = threading.Lock()
+
+
+def get_injector() -> TextInjector:
+    """各 agent 的 keyboardInput 工具共用的输入引擎。"""
+    global _injector
+    with _injector_lock:
+        if _injector is None:
+            threshold = int(os.environ.get("PYAUTOGUI_AGENT_PASTE_THRESHOLD", PASTE_THRESHOLD))
+            _injector = TextInjector(paste_threshold=threshold)
+        return _injector
+
+
+def benchmark(driver: UIDriver, sizes: Sequence[int] = (20, 200, 2000, 20000), sample: Optional[str] = None):
+    """
+    在新打开的记事本中分别用两种策略输入不同长度的文本，返回
+    [(策略, 字符数, 耗时, 字符/秒, 是否校验通过)]。
+    """
+    from . import readiness
+
+    sample = sample or "今天完成了 50% 的报告{草稿}，明天继续 (A+B)^2。\n"
+    injector = TextInjector(driver)
+    before = readiness.snapshot("notepad.exe", driver)
+    handle = driver.launch("notepad.exe")
+    ready = readiness.wait_until_ready(before, timeout=5, backend=driver)
+    pid = ready.pid or handle.pid
+
+    rows = []
+    for size in sizes:
+        text = (sample * (size // len(sample) + 1))[:size]
+        for strategy in (KEYS, PASTE):
+            result = injector.inject(text, pid=pid, strategy=strategy)
+            cps = result.chars / result.elapsed if result.elapsed else float("inf")
+            rows.append((strategy, size, result.elapsed, cps, result.verified))
+    return rows
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from .ui_driver import SimulatedDesktop
+
+    parser = argparse.ArgumentParser(description="逐字输入与剪贴板粘贴的速度对比")
+    parser.add_argument("--windows", action="store_true", help="在真实桌面上测试（会打开记事本并输入文本）")
+    parser.add_argument("--sizes", default="20,200,2000,20000")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",")]
+    # 模拟桌面使用虚拟时钟，耗时由 SIMULATED_LATENCIES 推算
+    driver = get_driver() if args.windows else SimulatedDesktop(realtime=False)
+    print(f"{'策略':<6}{'字符数':>8}{'耗时(s)':>10}{'字符/秒':>12}  校验")
+    for strategy, size, elapsed, cps, verified in benchmark(driver, sizes):
+        print(f"{strategy:<6}{size:>8}{elapsed:>10.3f}{cps:>12.0f}  {verified}")
+    print("策略选择示例:", {t: choose_strategy(t) for t in ("123", "a+b", "第一行\n第二行", "很长的文本" * 10)})
@@ -0,0 +1,392 @@
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .readiness import ReadinessBackend, WindowsReadinessBackend, process_name_for
+
+
+class UIDriver(ReadinessBackend):
+    """
+    界面操作接口：启动应用、切换焦点、查询前台/窗口、输入文本、发送快捷键。
+
+    同时实现 ReadinessBackend，就绪等待与启动服务使用同一个驱动。各工具通过 `get_driver()` 获取，
+    不直接调用 pywinauto / pyautogui / win32gui，因此可以换成 `SimulatedDesktop` 在 Linux 上运行和计时。
+    """
+
+    def launch(self, exe_name: str, args: Sequence[str] = ()):
+        """启动应用，立即返回 utils.launcher.LaunchHandle，不等待窗口出现。"""
+        raise NotImplementedError
+
+    def find_processes(self, process_name: str) -> List[int]:
+        """工具查询进程用（允许使用短时间缓存）；pids() 供就绪轮询使用，总是最新结果。"""
+        return sorted(self.pids(process_name))
+
+    def focus(self, pid: int) -> bool:
+        raise NotImplementedError
+
+    def foreground_pid(self) -> Optional[int]:
+        return self.foreground()[1]
+
+    def send_text(self, text: str, pid: Optional[int] = None) -> bool:
+        """输入文本。pid 为目标进程：Windows 实现中用于连接进程，按键发送到前台窗口。"""
+        raise NotImplementedError
+
+    def send_hotkey(self, keys: Sequence[str], interval: float = 0.1) -> bool:
+        raise NotImplementedError
+
+    def get_clipboard(self) -> Optional[str]:
+        """剪贴板中的文本，没有文本内容时返回 None。"""
+        raise NotImplementedError
+
+    def set_clipboard(self, text: Optional[str]):
+        """写入文本；None 表示清空剪贴板。"""
+        raise NotImplementedError
+
+    def paste(self) -> bool:
+        return self.send_hotkey(["ctrl", "v"], interval=0.02)
+
+    def read_text(self, pid: int) -> Optional[str]:
+        """读取进程主窗口中编辑区的文本，用于校验输入结果；不支持时返回 None。"""
+        return None
+
+
+# pywinauto send_keys 中有特殊含义的字符，按字面输入时需要用花括号转义
+SEND_KEYS_SPECIAL = set("+^%~(){}[]")
+
+
+def escape_send_keys(text: str) -> str:
+    return "".join("{" + c + "}" if c in SEND_KEYS_SPECIAL else c for c in text)
+
+
+class WindowsUIDriver(WindowsReadinessBackend, UIDriver):
+    """
+    当前的 Windows 实现：psutil + win32gui 查询，pywinauto 输入文本，pyautogui 发送快捷键。
+    pywinauto 连接和编辑区控件由全局 `ConnectionCache` 缓存，各 agent 共用。
+    """
+
+    def launch(self, exe_name: str, args: Sequence[str] = ()):
+        from .launcher import spawn
+
+        return spawn(exe_name, args)
+
+    def find_processes(self, process_name: str) -> List[int]:
+        from .process_index import get_process_index
+
+        return get_process_index().pids(process_name)
+
+    def focus(self, pid: int) -> bool:
+        import win32gui
+
+        handles = self.windows(pid)
+        if not handles:
+            return False
+        win32gui.SetForegroundWindow(handles[0])
+        return True
+
+    def send_text(self, text: str, pid: Optional[int] = None) -> bool:
+        from pywinauto.keyboard import send_keys
+
+        from .app_connections import get_connection_cache
+
+        if pid is not None:
+            try:
+                # 同一进程的连接在多次输入之间复用（见 utils/app_connections.py）
+                get_connection_cache().application(pid)
+            except Exception as e:
+                print(f"Warning: Could not connect to process {pid}: {e}. Trying to send keys anyway.")
+        send_keys(escape_send_keys(text), with_spaces=True, with_tabs=True, with_newlines=True)
+        return True
+
+    def send_hotkey(self, keys: Sequence[str], interval: float = 0.1) -> bool:
+        import pyautogui
+
+        pyautogui.hotkey(*keys, interval=interval)
+        return True
+
+    @staticmethod
+    def _open_clipboard(retries: int = 5):
+        import win32clipboard
+
+        # 其他程序占用剪贴板时稍后重试
+        for attempt in range(retries):
+            try:
+                win32clipboard.OpenClipboard()
+                return win32clipboard
+            except Exception:
+                if attempt == retries - 1:
+                    raise
+                time.sleep(0.01 * (attempt + 1))
+
+    def get_clipboard(self) -> Optional[str]:
+        import win32con
+
+        clipboard = self._open_clipboard()
+        try:
+            if clipboard.IsClipboardFormatAvailable(win32con.CF_UNICODETEXT):
+                return clipboard.GetClipboardData(win32con.CF_UNICODETEXT)
+            return None
+        finally:
+            clipboard.CloseClipboard()
+
+    def set_clipboard(self, text: Optional[str]):
+        import win32con
+
+        clipboard = self._open_clipboard()
+        try:
+            clipboard.EmptyClipboard()
+            if text is not None:
+                clipboard.SetClipboardData(win32con.CF_UNICODETEXT, text)
+        finally:
+            clipboard.CloseClipboard()
+
+    @staticmethod
+    def _find_editor(app):
+        window = app.top_window()
+        hwnd = window.wrapper_object().handle
+        # 经典记事本的编辑区为 Edit，Windows 11 记事本为 Document
+        for control_type in ("Edit", "Document"):
+            control = window.child_window(control_type=control_type, found_index=0)
+            if control.exists(timeout=0):
+                return hwnd, control.wrapper_object()
+        return hwnd, None
+
+    def read_text(self, pid: int) -> Optional[str]:
+        from .app_connections import get_connection_cache
+
+        cache = get_connection_cache()
+        hwnd, foreground_pid = self.foreground()
+        error = None
+        for _ in range(2):
+            try:
+                editor = cache.window(pid, self._find_editor, hwnd=hwnd if foreground_pid == pid else None)
+                if editor is None:
+                    return None
+                return editor.get_value() if hasattr(editor, "get_value") else editor.window_text()
+            except ProcessLookupError:
+                return None
+            except Exception as e:
+                # 缓存的控件已失效，重新连接并查找一次
+                cache.invalidate(pid)
+                error = e
+        print(f"读取窗口文本失败: {error}")
+        return None
+
+
+# 模拟桌面的默认耗时（秒）
+SIMULATED_LATENCIES = {
+    "spawn": 0.02,  # 创建进程
+    "window": 0.3,  # 进程创建后主窗口出现
+    "focus": 0.01,
+    "keystroke": 0.008,  # 每个字符
+    "hotkey": 0.03,
+    "clipboard": 0.002,  # 读写剪贴板
+    "paste_char": 0.00002,  # 粘贴时目标程序处理每个字符
+    "query": 0.0002,  # 进程/窗口查询
+}
+
+
+@dataclass
+class SimulatedProcess:
+    pid: int
+    name: str
+    window_at: float
+    shown: bool = False
+    text: str = ""
+    hotkeys: List[str] = field(default_factory=list)
+
+
+class SimulatedDesktop(UIDriver):
+    """
+    内存中的模拟桌面：进程、窗口、焦点和每个窗口的文本缓冲区，各操作按配置的耗时等待。
+
+    - 启动的进程在 latencies["window"] 秒后出现窗口并获得焦点；
+    - send_text 写入目标进程（默认前台进程）的文本缓冲区，耗时与字符数成正比；
+    - realtime=False 时使用虚拟时钟，sleep 只推进时间，适合单元测试。
+
+    Args:
+        latencies: 覆盖 SIMULATED_LATENCIES 中的耗时
+        realtime: 是否真实等待
+    """
+
+    def __init__(self, latencies: Optional[Dict[str, float]] = None, realtime: bool = True):
+        self.latencies = {**SIMULATED_LATENCIES, **(latencies or {})}
+        self.realtime = realtime
+        self._lock = threading.RLock()
+        self._now = 0.0
+        self._next_pid = 1000
+        self._processes: Dict[int, SimulatedProcess] = {}
+        self._focused: Optional[int] = None
+        self.clipboard: Optional[str] = None
+        self.counters = {"launches": 0, "chars": 0, "hotkeys": 0, "queries": 0, "pastes": 0}
+
+    # ---- 时钟 ----
+
+    def monotonic(self) -> float:
+        return time.monotonic() if self.realtime else self._now
+
+    def sleep(self, seconds: float):
+        if seconds <= 0:
+            return
+        if self.realtime:
+            time.sleep(seconds)
+        else:
+            with self._lock:
+                self._now += seconds
+
+    def _wait(self, kind: str, times: float = 1):
+        self.sleep(self.latencies.get(kind, 0.0) * times)
+
+    def _update(self):
+        """窗口出现时间已到的进程显示窗口，最后出现的获得焦点。"""
+        now = self.monotonic()
+        for process in sorted(self._processes.values(), key=lambda p: p.window_at):
+            if not process.shown and process.window_at <= now:
+                process.shown = True
+                self._focused = process.pid
+
+    # ---- 进程与窗口 ----
+
+    def launch(self, exe_name: str, args: Sequence[str] = ()):
+        from .launcher import LaunchHandle
+
+        self._wait("spawn")
+        with self._lock:
+            pid = self._next_pid
+            self._next_pid += 4
+            self._processes[pid] = SimulatedProcess(
+                pid, process_name_for(exe_name), self.monotonic() + self.latencies["window"]
+            )
+            self.counters["launches"] += 1
+        return LaunchHandle(exe_name, method="simulated", pid=pid)
+
+    def close(self, pid: int):
+        with self._lock:
+            self._processes.pop(pid, None)
+            if self._focused == pid:
+                self._focused = None
+
+    def pids(self, process_name: str):
+        self._wait("query")
+        with self._lock:
+            self.counters["queries"] += 1
+            return {p.pid for p in self._processes.values() if p.name == process_name.lower()}
+
+    def all_pids(self):
+        with self._lock:
+            return set(self._processes)
+
+    def windows(self, pid: int) -> List[int]:
+        with self._lock:
+            self._update()
+            process = self._processes.get(pid)
+            return [pid * 16] if process is not None and process.shown else []
+
+    def foreground(self) -> Tuple[Optional[int], Optional[int]]:
+        with self._lock:
+            self._update()
+            if self._focused is None:
+                return None, None
+            return self._focused * 16, self._focused
+
+    def focus(self, pid: int) -> bool:
+        self._wait("focus")
+        with self._lock:
+            self._update()
+            process = self._processes.get(pid)
+            if process is None or not process.shown:
+                return False
+            self._focused = pid
+            return True
+
+    # ---- 输入 ----
+
+    def send_text(self, text: str, pid: Optional[int] = None) -> bool:
+        self._wait("keystroke", len(text))
+        with self._lock:
+            self._update()
+            process = self._processes.get(pid if pid is not None else self._focused)
+            if process is None:
+                return False
+            process.text += text
+            self.counters["chars"] += len(text)
+            return True
+
+    def send_hotkey(self, keys: Sequence[str], interval: float = 0.1) -> bool:
+        self._wait("hotkey")
+        pasted = [k.lower() for k in keys] == ["ctrl", "v"] and self.clipboard
+        if pasted:
+            self._wait("paste_char", len(self.clipboard))
+        with self._lock:
+            self._update()
+            self.counters["hotkeys"] += 1
+            process = self._processes.get(self._focused)
+            if process is not None:
+                process.hotkeys.append("+".join(keys))
+                if pasted:
+                    process.text += self.clipboard
+                    self.counters["pastes"] += 1
+            return True
+
+    def get_clipboard(self) -> Optional[str]:
+        self._wait("clipboard")
+        return self.clipboard
+
+    def set_clipboard(self, text: Optional[str]):
+        self._wait("clipboard")
+        self.clipboard = text
+
+    def read_text(self, pid: int) -> Optional[str]:
+        self._wait("query")
+        with self._lock:
+            process = self._processes.get(pid)
+            return process.text if process is not None else None
+
+    def text(self, pid: int) -> str:
+        with self._lock:
+            process = self._processes.get(pid)
+            return process.text if process is not None else ""
+
+    def stats(self):
+        with self._lock:
+            return {**self.counters, "processes": len(self._processes), "focused": self._focused}
+
+
+_driver: Optional[UIDriver] = None
+_driver_lock = threading.Lock()
+
+
+def get_driver() -> UIDriver:
+    """
+    全局 UI 驱动。默认为 Windows 实现；PYAUTOGUI_AGENT_UI_DRIVER=simulated 时使用模拟桌面，
+    配合录制回放（--replay）可以在没有 Windows 和 Ollama 的机器上跑完整流程。
+    """
+    global _driver
+    with _driver_lock:
+        if _driver is None:
+            kind = os.environ.get("PYAUTOGUI_AGENT_UI_DRIVER", "windows").lower()
+            _driver = SimulatedDesktop() if kind in ("sim", "simulated") else WindowsUIDriver()
+        return _driver
+
+
+def set_driver(driver: Optional[UIDriver]):
+    """替换全局驱动，None 表示下次按环境变量重新创建。"""
+    global _driver
+    with _driver_lock:
+        _driver = driver
+
+
+if __name__ == "__main__":
+    from . import readiness
+
+    desktop = SimulatedDesktop(realtime=False)
+    before = readiness.snapshot("notepad.exe", desktop)
+    handle = desktop.launch("notepad.exe")
+    print("就绪:", readiness.wait_until_ready(before, timeout=2, backend=desktop))
+    start = desktop.monotonic()
+    desktop.send_text("今天天气很好，适合出门散步。" * 5)
+    desktop.send_hotkey(["ctrl", "s"])
+    print(f"输入与保存耗时（虚拟时间）: {desktop.monotonic() - start:.3f}s")
+    print(desktop.text(handle.pid))
+    print(desktop.stats())